@@ -0,0 +1,143 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import bcrypt
+import grpc
+from proto import chat_pb2
+
+# Default maximum number of RPCs in flight at once
+DEFAULT_MAX_IN_FLIGHT = 64
+
+
+def hash_for_create(password):
+    """
+    Hash a password with a new salt (as ChatClient.generate_hashed_password_for_create).
+    Runs in a worker process.
+
+    :param password: Password
+    :return: Hashed password
+    """
+    return bcrypt.hashpw(password.encode(), bcrypt.gensalt()).decode()
+
+
+def hash_for_login(password, bcrypt_prefix):
+    """
+    Hash a password with the account's prefix (as ChatClient.get_hashed_password_for_login).
+    Runs in a worker process.
+
+    :param password: Password
+    :param bcrypt_prefix: The account's bcrypt prefix
+    :return: Hashed password
+    """
+    return bcrypt.hashpw(password.encode(), bcrypt_prefix.encode()).decode()
+
+
+class BulkAccounts:
+    """
+    Creates or logs into many accounts at once, for provisioning and load tests.
+
+    Passwords are hashed across a process pool (bcrypt holds a core for a quarter of
+    a second per hash), and each hash is sent as soon as it is ready over the client's
+    channel, with at most max_in_flight calls outstanding. The client's own session
+    is not touched.
+    """
+
+    def __init__(self, client, processes=None, max_in_flight=DEFAULT_MAX_IN_FLIGHT):
+        """
+        :param client: The ChatClient whose channel is used
+        :param processes: Number of hashing processes (default: one per CPU)
+        :param max_in_flight: Maximum number of RPCs outstanding at once
+        """
+        self.client = client
+        self.processes = processes or os.cpu_count()
+        self.max_in_flight = max_in_flight
+
+    def create_accounts(self, accounts):
+        """
+        Create accounts.
+
+        :param accounts: List of (username, password) pairs
+        :return: Dict of username -> session key (None if creation failed)
+        """
+        with self.pool() as pool:
+            hashes = {pool.submit(hash_for_create, password): username
+                      for username, password in accounts}
+            responses = self.call_bounded("CreateAccount", (
+                (hashes[future], chat_pb2.LoginCreateRequest(username=hashes[future], password_hash=future.result()))
+                for future in as_completed(hashes)))
+        return self.session_keys(accounts, responses, "created")
+
+    def login(self, accounts):
+        """
+        Log into accounts (looking up their bcrypt prefixes first).
+
+        :param accounts: List of (username, password) pairs
+        :return: Dict of username -> session key (None if login failed)
+        """
+        lookups = self.call_bounded("AccountLookup", (
+            (username, chat_pb2.AccountLookupRequest(username=username)) for username, _ in accounts))
+        with self.pool() as pool:
+            hashes = {}
+            for username, password in accounts:
+                lookup = lookups.get(username)
+                if lookup is not None and lookup.exists:
+                    hashes[pool.submit(hash_for_login, password, lookup.bcrypt_prefix)] = username
+            responses = self.call_bounded("Login", (
+                (hashes[future], chat_pb2.LoginCreateRequest(username=hashes[future], password_hash=future.result()))
+                for future in as_completed(hashes)))
+        return self.session_keys(accounts, responses, "logged in")
+
+    def pool(self):
+        """
+        :return: A process pool for hashing. Workers are spawned rather than forked,
+            since forking a process with gRPC threads running is unsafe.
+        """
+        return ProcessPoolExecutor(self.processes, mp_context=multiprocessing.get_context("spawn"))
+
+    def call_bounded(self, method, requests):
+        """
+        Make one call per request, keeping at most max_in_flight outstanding.
+        Requests are drawn lazily, so they can be produced while earlier calls run.
+
+        :param method: RPC name
+        :param requests: Iterable of (key, request message)
+        :return: Dict of key -> response (missing for failed calls)
+        """
+        rpc = getattr(self.client.stub, method)
+        slots = threading.BoundedSemaphore(self.max_in_flight)
+        lock = threading.Lock()  # Guards responses
+        responses = {}
+
+        def done(key, call):
+            try:
+                response = call.result()
+                with lock:
+                    responses[key] = response
+            except grpc.RpcError as e:
+                self.client.log_error(f"{method} for {key} failed ({e.code()})")
+            finally:
+                slots.release()
+
+        for key, request in requests:
+            slots.acquire()
+            call = rpc.future(request, timeout=self.client.deadlines[method])
+            call.add_done_callback(lambda call, key=key: done(key, call))
+        # Wait for the last calls to finish
+        for _ in range(self.max_in_flight):
+            slots.acquire()
+        return responses
+
+    def session_keys(self, accounts, responses, action):
+        """
+        :param accounts: List of (username, password) pairs
+        :param responses: Dict of username -> LoginCreateResponse
+        :param action: What was done, for the summary
+        :return: Dict of username -> session key (None on failure)
+        """
+        keys = {}
+        for username, _ in accounts:
+            response = responses.get(username)
+            keys[username] = response.session_key if response is not None and response.success else None
+        print(f"[BULK] {sum(key is not None for key in keys.values())}/{len(keys)} accounts {action}")
+        return keys
@@ -1,15 +1,232 @@
+import base64
+import gzip
+import threading
+import zlib
 import grpc
 
+# Every gRPC message is prefixed with a 1-byte compressed flag and a 4-byte length
+GRPC_MESSAGE_PREFIX_SIZE = 5
+# Every HTTP/2 frame has a 9-byte frame header
+HTTP2_FRAME_HEADER_SIZE = 9
+# HPACK counts each header field as name + value + 32 bytes (RFC 7541, section 4.1)
+HPACK_ENTRY_OVERHEAD = 32
+# grpc-encoding header value of each compression algorithm
+COMPRESSION_ENCODINGS = {
+    grpc.Compression.Gzip: "gzip",
+    grpc.Compression.Deflate: "deflate",
+}
 
-class BytesTrackingInterceptor(grpc.UnaryUnaryClientInterceptor):
-    def __init__(self, client):
+
+def method_name(client_call_details):
+    """
+    Get the short RPC name (e.g., "SendMessage") from the call details.
+
+    :param client_call_details: The client call details.
+    :return: The RPC name.
+    """
+    method = client_call_details.method
+    if isinstance(method, bytes):
+        method = method.decode()
+    return method.rsplit("/", 1)[-1]
+
+
+def metadata_size(metadata):
+    """
+    Size of the metadata attached to a call (keys and values, without header overhead).
+
+    :param metadata: Iterable of (key, value) pairs.
+    :return: Size in bytes.
+    """
+    return sum(len(key) + len(value) for key, value in metadata or ())
+
+
+def compressed_size(data, compression):
+    """
+    Estimate the size of a message body as gRPC sends it with the call's compression
+    (gRPC sends a message uncompressed if compressing does not make it smaller).
+
+    :param data: Serialized message.
+    :param compression: grpc.Compression of the call (None for the channel default, i.e., none).
+    :return: Size in bytes.
+    """
+    if compression == grpc.Compression.Gzip:
+        return min(len(gzip.compress(data)), len(data))
+    if compression == grpc.Compression.Deflate:
+        return min(len(zlib.compress(data)), len(data))
+    return len(data)
+
+
+def headers_size(headers):
+    """
+    Estimate the size of a header block (before HPACK compression).
+
+    :param headers: Iterable of (key, value) pairs.
+    :return: Size in bytes.
+    """
+    size = 0
+    for key, value in headers or ():
+        if isinstance(value, bytes):
+            # Binary ("-bin") values are base64-encoded on the wire
+            value = base64.b64encode(value)
+        size += len(key) + len(value) + HPACK_ENTRY_OVERHEAD
+    return size
+
+
+class CountingResponseIterator:
+    """
+    Wraps a streaming call so every response is counted as it is read.
+    Everything else (cancel, code, add_done_callback, ...) is forwarded to the call.
+    """
+
+    def __init__(self, call, on_response):
+        self.call = call
+        self.on_response = on_response
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        response = next(self.call)
+        self.on_response(response)
+        return response
+
+    def __getattr__(self, name):
+        return getattr(self.call, name)
+
+
+class BytesTrackingInterceptor(grpc.UnaryUnaryClientInterceptor, grpc.UnaryStreamClientInterceptor,
+                               grpc.StreamUnaryClientInterceptor, grpc.StreamStreamClientInterceptor):
+    def __init__(self, client, wire_bytes=False, target=""):
         """
         Initializes the interceptor with a reference to the ChatClient instance.
 
         :param client: The ChatClient instance.
+        :param wire_bytes: Also count gRPC message prefixes, HTTP/2 frame headers and
+            (uncompressed) header/trailer metadata, and count compressed requests at their
+            compressed size, approximating bytes on the wire.
+        :param target: The channel target, used as the :authority header size.
         """
         self.client = client  # Reference to the ChatClient instance
+        self.wire_bytes = wire_bytes
+        self.target = target
+        self.lock = threading.Lock()  # Guards the counters below and on the client
+        self.method_stats = {}  # RPC name -> {"calls", "bytes_sent", "bytes_received"}
+
+    ### ACCOUNTING ###
+    def record(self, method, sent=0, received=0, calls=0):
+        """
+        Add to the counters for a method and to the client's totals.
+
+        :param method: The RPC name.
+        :param sent: Bytes sent.
+        :param received: Bytes received.
+        :param calls: Number of calls started.
+        """
+        with self.lock:
+            stats = self.method_stats.setdefault(
+                method, {"calls": 0, "bytes_sent": 0, "bytes_received": 0})
+            stats["calls"] += calls
+            stats["bytes_sent"] += sent
+            stats["bytes_received"] += received
+            self.client.bytes_sent += sent
+            self.client.bytes_received += received
+
+    def get_method_stats(self):
+        """
+        Get a snapshot of the per-method counters.
+
+        :return: Dict of RPC name -> {"calls", "bytes_sent", "bytes_received"}
+        """
+        with self.lock:
+            return {method: dict(stats) for method, stats in self.method_stats.items()}
+
+    def message_size(self, message, compression=None):
+        """
+        Size of one message, including its framing (and compression) if counting wire bytes.
+
+        :param message: The protobuf message.
+        :param compression: grpc.Compression the message is sent with, if any.
+        :return: Size in bytes.
+        """
+        if not self.wire_bytes:
+            return message.ByteSize()
+        if compression in (grpc.Compression.Gzip, grpc.Compression.Deflate):
+            size = compressed_size(message.SerializeToString(), compression)
+        else:
+            size = message.ByteSize()
+        return size + GRPC_MESSAGE_PREFIX_SIZE + HTTP2_FRAME_HEADER_SIZE
 
+    def start_call(self, method, client_call_details):
+        """
+        Count a new call and its metadata (with all request headers, if counting wire bytes).
+
+        :param method: The RPC name.
+        :param client_call_details: The client call details.
+        """
+        # Metadata attached to the call (e.g., the session) is sent like the request itself
+        sent = metadata_size(client_call_details.metadata)
+        if self.wire_bytes:
+            headers = [(":method", "POST"), (":scheme", "http"),
+                       (":path", client_call_details.method), (":authority", self.target),
+                       ("content-type", "application/grpc"), ("te", "trailers"),
+                       ("grpc-accept-encoding", "identity,deflate,gzip"),
+                       ("user-agent", f"grpc-python/{grpc.__version__}")]
+            if client_call_details.compression in COMPRESSION_ENCODINGS:
+                headers.append(("grpc-encoding", COMPRESSION_ENCODINGS[client_call_details.compression]))
+            if client_call_details.timeout is not None:
+                headers.append(("grpc-timeout", "%dm" %
+                               (client_call_details.timeout * 1000)))
+            sent = headers_size(headers) + headers_size(client_call_details.metadata) + \
+                HTTP2_FRAME_HEADER_SIZE
+        self.record(method, sent=sent, calls=1)
+
+    def finish_call(self, method, call):
+        """
+        Done callback: count the unary response (if any) and, if counting wire bytes,
+        the response headers and trailers. Runs without blocking the caller.
+
+        :param method: The RPC name.
+        :param call: The completed call.
+        """
+        received = 0
+        if not call.cancelled() and call.exception() is None:
+            response = call.result()
+            # Streaming calls return an iterator here; their responses are counted as read
+            if hasattr(response, "ByteSize"):
+                received += self.message_size(response)
+        if self.wire_bytes:
+            code = call.code() or grpc.StatusCode.UNKNOWN
+            headers = [(":status", "200"), ("content-type", "application/grpc"),
+                       ("grpc-status", str(code.value[0]))]
+            if call.details():
+                headers.append(("grpc-message", call.details()))
+            received += headers_size(headers) + headers_size(call.initial_metadata()) + \
+                headers_size(call.trailing_metadata()) + 2 * HTTP2_FRAME_HEADER_SIZE
+        self.record(method, received=received)
+
+    def count_requests(self, method, request_iterator):
+        """
+        Wrap a request iterator so every request is counted as it is sent.
+
+        :param method: The RPC name.
+        :param request_iterator: The request iterator.
+        """
+        for request in request_iterator:
+            self.record(method, sent=self.message_size(request))
+            yield request
+
+    def count_responses(self, method, call):
+        """
+        Wrap a streaming call so every response is counted as it is read.
+
+        :param method: The RPC name.
+        :param call: The streaming call.
+        :return: The wrapped call.
+        """
+        return CountingResponseIterator(
+            call, lambda response: self.record(method, received=self.message_size(response)))
+
+    ### INTERCEPTORS ###
     def intercept_unary_unary(self, continuation, client_call_details, request):
         """
         Intercepts unary-unary RPC calls to measure bytes sent and received.
@@ -19,20 +236,99 @@ class BytesTrackingInterceptor(grpc.UnaryUnaryClientInterceptor):
         :param request: The request message.
         :return: The response object (future or not).
         """
-        request_size = request.ByteSize()
-        self.client.bytes_sent += request_size
+        method = method_name(client_call_details)
+        self.start_call(method, client_call_details)
+        self.record(method, sent=self.message_size(request, client_call_details.compression))
 
         # Get the response (this may be a future)
         response_future = continuation(client_call_details, request)
 
-        # If the response is a future, we extract the actual response
-        response = response_future.result() if hasattr(
-            response_future, "result") else response_future
-
-        # Measure response size if it's available
-        if response and hasattr(response, "ByteSize"):
-            response_size = response.ByteSize()
-            self.client.bytes_received += response_size
+        # Measure the response once it arrives, without blocking
+        # (so .future() calls, e.g. long polls, stay asynchronous and cancellable)
+        response_future.add_done_callback(
+            lambda call: self.finish_call(method, call))
 
         # Return the original response object (future or not)
         return response_future
+
+    def intercept_unary_stream(self, continuation, client_call_details, request):
+        """
+        Intercepts unary-stream RPC calls (e.g., SubscribeMessages).
+
+        :param continuation: The continuation function to invoke the next interceptor in the chain.
+        :param client_call_details: The client call details.
+        :param request: The request message.
+        :return: The call, wrapped to count responses.
+        """
+        method = method_name(client_call_details)
+        self.start_call(method, client_call_details)
+        self.record(method, sent=self.message_size(request, client_call_details.compression))
+
+        call = continuation(client_call_details, request)
+        call.add_done_callback(lambda done: self.finish_call(method, done))
+        return self.count_responses(method, call)
+
+    def intercept_stream_unary(self, continuation, client_call_details, request_iterator):
+        """
+        Intercepts stream-unary RPC calls.
+
+        :param continuation: The continuation function to invoke the next interceptor in the chain.
+        :param client_call_details: The client call details.
+        :param request_iterator: The request iterator.
+        :return: The response object (future or not).
+        """
+        method = method_name(client_call_details)
+        self.start_call(method, client_call_details)
+
+        response_future = continuation(
+            client_call_details, self.count_requests(method, request_iterator))
+        response_future.add_done_callback(
+            lambda call: self.finish_call(method, call))
+        return response_future
+
+    def intercept_stream_stream(self, continuation, client_call_details, request_iterator):
+        """
+        Intercepts stream-stream RPC calls (e.g., Session).
+
+        :param continuation: The continuation function to invoke the next interceptor in the chain.
+        :param client_call_details: The client call details.
+        :param request_iterator: The request iterator.
+        :return: The call, wrapped to count responses.
+        """
+        method = method_name(client_call_details)
+        self.start_call(method, client_call_details)
+
+        call = continuation(client_call_details,
+                            self.count_requests(method, request_iterator))
+        call.add_done_callback(lambda done: self.finish_call(method, done))
+        return self.count_responses(method, call)
+
+
+class AsyncBytesTrackingInterceptor(grpc.aio.UnaryUnaryClientInterceptor):
+    def __init__(self, client):
+        """
+        Initializes the interceptor with a reference to the AsyncChatClient instance.
+
+        :param client: The AsyncChatClient instance.
+        """
+        self.client = client  # Reference to the AsyncChatClient instance
+
+    async def intercept_unary_unary(self, continuation, client_call_details, request):
+        """
+        Intercepts unary-unary grpc.aio calls to measure bytes sent and received.
+        Awaiting the call yields to the event loop rather than blocking a thread.
+
+        :param continuation: The continuation coroutine to invoke the next interceptor in the chain.
+        :param client_call_details: The client call details.
+        :param request: The request message.
+        :return: The call object.
+        """
+        self.client.bytes_sent += request.ByteSize()
+
+        call = await continuation(client_call_details, request)
+        response = await call
+
+        if response and hasattr(response, "ByteSize"):
+            self.client.bytes_received += response.ByteSize()
+
+        return call
@@ -0,0 +1,54 @@
+import grpc
+from SessionMetadataInterceptor import ClientCallDetails
+
+# Supported algorithms by config name ("none" disables compression)
+COMPRESSION_ALGORITHMS = {
+    "gzip": grpc.Compression.Gzip,
+    "deflate": grpc.Compression.Deflate,
+    "none": grpc.Compression.NoCompression,
+}
+# Requests smaller than this (serialized bytes) are sent uncompressed by default:
+# below about a kilobyte the savings do not pay for the CPU time
+DEFAULT_COMPRESSION_THRESHOLD = 1024
+
+
+class CompressionInterceptor(grpc.UnaryUnaryClientInterceptor, grpc.UnaryStreamClientInterceptor):
+    """
+    Compresses the request of a call only if it is at least `threshold` bytes, so
+    polls and other small requests skip the compression cost.
+
+    Only calls with a single request are handled: gRPC Python sets compression per
+    call, not per message, so streaming requests are left uncompressed.
+    Responses are compressed (or not) by the server, which applies its own threshold;
+    the client always advertises gzip and deflate as accepted encodings.
+    """
+
+    def __init__(self, algorithm=grpc.Compression.Gzip, threshold=DEFAULT_COMPRESSION_THRESHOLD):
+        """
+        :param algorithm: grpc.Compression used for large requests
+        :param threshold: Minimum serialized request size (bytes) to compress
+        """
+        self.algorithm = algorithm
+        self.threshold = threshold
+        self.compressed_calls = 0  # Number of calls sent compressed
+
+    def with_compression(self, client_call_details, request):
+        """
+        Choose the call's compression from the request size (unless already set).
+
+        :param client_call_details: The client call details.
+        :param request: The request message.
+        :return: The client call details to use.
+        """
+        if client_call_details.compression is not None or request.ByteSize() < self.threshold:
+            return client_call_details
+        self.compressed_calls += 1
+        return ClientCallDetails(client_call_details.method, client_call_details.timeout,
+                                 client_call_details.metadata, client_call_details.credentials,
+                                 client_call_details.wait_for_ready, self.algorithm)
+
+    def intercept_unary_unary(self, continuation, client_call_details, request):
+        return continuation(self.with_compression(client_call_details, request), request)
+
+    def intercept_unary_stream(self, continuation, client_call_details, request):
+        return continuation(self.with_compression(client_call_details, request), request)
@@ -0,0 +1,56 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+import grpc
+from proto import chat_pb2, chat_pb2_grpc
+
+# Maximum time (seconds) to wait for an endpoint to connect and answer a probe
+PROBE_TIMEOUT_S = 2
+# Probe calls per endpoint; the fastest one is taken as its round-trip time
+PROBE_CALLS = 2
+
+
+def probe_endpoint(target, timeout=PROBE_TIMEOUT_S):
+    """
+    Measure an endpoint's round-trip time with AccountLookup calls on a fresh channel
+    (after it has connected, so the handshake is not counted).
+
+    :param target: Endpoint ("host:port")
+    :param timeout: Seconds to wait for the connection and for each call
+    :return: Round-trip time in seconds, or None if the endpoint is unhealthy
+    """
+    channel = grpc.insecure_channel(target)
+    try:
+        grpc.channel_ready_future(channel).result(timeout=timeout)
+        stub = chat_pb2_grpc.ChatServiceStub(channel)
+        rtt = None
+        for _ in range(PROBE_CALLS):
+            started = time.perf_counter()
+            stub.AccountLookup(chat_pb2.AccountLookupRequest(username=""), timeout=timeout)
+            elapsed = time.perf_counter() - started
+            rtt = elapsed if rtt is None else min(rtt, elapsed)
+        return rtt
+    except (grpc.FutureTimeoutError, grpc.RpcError):
+        return None
+    finally:
+        channel.close()
+
+
+def rank_endpoints(targets, timeout=PROBE_TIMEOUT_S):
+    """
+    Probe endpoints in parallel and order them fastest first.
+
+    :param targets: List of endpoints ("host:port")
+    :param timeout: Seconds to wait for each endpoint
+    :return: List of (endpoint, round-trip time in seconds), healthy ones by RTT, then
+        unhealthy ones (RTT None) in their original order
+    """
+    if not targets:
+        return []
+    with ThreadPoolExecutor(max_workers=len(targets)) as pool:
+        rtts = list(pool.map(lambda target: probe_endpoint(target, timeout), targets))
+    healthy = sorted((rtt, index) for index, rtt in enumerate(rtts) if rtt is not None)
+    ranked = [(targets[index], rtt) for rtt, index in healthy]
+    ranked += [(target, None) for target, rtt in zip(targets, rtts) if rtt is None]
+    for target, rtt in ranked:
+        print(f"[PROBE] {target}: " + (f"{rtt * 1000:.1f} ms" if rtt is not None else "unreachable"))
+    return ranked
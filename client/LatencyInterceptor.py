@@ -0,0 +1,283 @@
+import bisect
+import json
+import os
+import threading
+import time
+import grpc
+from BytesTrackingInterceptor import method_name
+
+# Histogram bucket upper bounds (seconds): 25 per decade from 10us to 100s, so the
+# memory used per (method, status) pair is fixed and percentiles are within ~10%
+BUCKET_BOUNDS = [10 ** (exponent / 25) for exponent in range(-125, 51)]
+# Percentiles reported in snapshots and exports
+PERCENTILES = (50, 90, 99)
+
+
+class LatencyHistogram:
+    """
+    Fixed-memory latency histogram with logarithmic buckets.
+    Percentiles are reported as the upper bound of the bucket holding that rank
+    (capped at the largest latency seen).
+    """
+
+    def __init__(self):
+        self.buckets = [0] * (len(BUCKET_BOUNDS) + 1)  # Last bucket is overflow
+        self.count = 0  # Number of observations
+        self.sum = 0.0  # Total of all observations (seconds)
+        self.max = 0.0  # Largest observation (seconds)
+
+    def observe(self, seconds):
+        """
+        Add one observation.
+
+        :param seconds: Latency in seconds
+        """
+        self.buckets[bisect.bisect_left(BUCKET_BOUNDS, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        self.max = max(self.max, seconds)
+
+    def percentile(self, percent):
+        """
+        Estimate a percentile.
+
+        :param percent: Percentile (0-100)
+        :return: Latency in seconds (0 if there are no observations)
+        """
+        if self.count == 0:
+            return 0.0
+        rank = max(1, round(self.count * percent / 100))
+        seen = 0
+        for index, bucket in enumerate(self.buckets):
+            seen += bucket
+            if seen >= rank:
+                if index == len(BUCKET_BOUNDS):
+                    return self.max
+                return min(BUCKET_BOUNDS[index], self.max)
+        return self.max
+
+
+class RpcMetrics:
+    """
+    Per-RPC latency histograms, keyed by method and status code, with JSON and
+    Prometheus text exports.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()  # Guards histograms
+        self.histograms = {}  # (method, status name) -> LatencyHistogram
+        self.export_thread = None  # Thread writing the Prometheus file, if any
+        self.export_stop = threading.Event()  # Wakes the export thread on stop
+
+    def observe(self, method, code, seconds):
+        """
+        Record one completed call.
+
+        :param method: The RPC name
+        :param code: grpc.StatusCode the call finished with
+        :param seconds: Latency in seconds
+        """
+        with self.lock:
+            histogram = self.histograms.get((method, code.name))
+            if histogram is None:
+                histogram = self.histograms[(method, code.name)] = LatencyHistogram()
+            histogram.observe(seconds)
+
+    def percentile(self, method, percent, code=grpc.StatusCode.OK):
+        """
+        Estimate a latency percentile for one method and status code.
+
+        :param method: The RPC name
+        :param percent: Percentile (0-100)
+        :param code: grpc.StatusCode of the calls to consider
+        :return: (latency in seconds, number of calls observed)
+        """
+        with self.lock:
+            histogram = self.histograms.get((method, code.name))
+            if histogram is None:
+                return 0.0, 0
+            return histogram.percentile(percent), histogram.count
+
+    def snapshot(self):
+        """
+        Summarize every method.
+
+        :return: Dict of RPC name -> {"calls", "errors", "p50", "p90", "p99", "max",
+            "by_status": {status name -> the same fields without "errors"}}, in milliseconds
+        """
+        with self.lock:
+            by_method = {}
+            for (method, status), histogram in self.histograms.items():
+                by_method.setdefault(method, {})[status] = histogram
+            snapshot = {}
+            for method, by_status in sorted(by_method.items()):
+                merged = LatencyHistogram()
+                for histogram in by_status.values():
+                    merged.buckets = [a + b for a, b in zip(
+                        merged.buckets, histogram.buckets)]
+                    merged.count += histogram.count
+                    merged.sum += histogram.sum
+                    merged.max = max(merged.max, histogram.max)
+                summary = self.summarize(merged)
+                summary["errors"] = sum(histogram.count for status, histogram in by_status.items()
+                                        if status != grpc.StatusCode.OK.name)
+                summary["by_status"] = {status: self.summarize(histogram)
+                                        for status, histogram in sorted(by_status.items())}
+                snapshot[method] = summary
+            return snapshot
+
+    def summarize(self, histogram):
+        """
+        Summarize one histogram.
+
+        :param histogram: LatencyHistogram
+        :return: Dict with "calls", the percentiles and "max" (milliseconds)
+        """
+        summary = {"calls": histogram.count}
+        for percent in PERCENTILES:
+            summary[f"p{percent}"] = round(
+                histogram.percentile(percent) * 1000, 3)
+        summary["max"] = round(histogram.max * 1000, 3)
+        return summary
+
+    def to_json(self):
+        """
+        :return: The snapshot as a JSON string
+        """
+        return json.dumps(self.snapshot(), indent=2)
+
+    def to_prometheus(self):
+        """
+        Render the histograms in the Prometheus text exposition format
+        (as summaries, since the bucket layout is internal).
+
+        :return: Text to serve or write to a textfile collector
+        """
+        name = "chat_client_rpc_latency_seconds"
+        lines = [f"# HELP {name} Latency of chat RPCs by method and status code.",
+                 f"# TYPE {name} summary"]
+        max_lines = [f"# HELP {name}_max Largest latency seen by method and status code.",
+                     f"# TYPE {name}_max gauge"]
+        with self.lock:
+            for (method, status), histogram in sorted(self.histograms.items()):
+                labels = f'method="{method}",code="{status}"'
+                for percent in PERCENTILES:
+                    lines.append(
+                        f'{name}{{{labels},quantile="{percent / 100}"}} {histogram.percentile(percent):.6f}')
+                lines.append(f"{name}_sum{{{labels}}} {histogram.sum:.6f}")
+                lines.append(f"{name}_count{{{labels}}} {histogram.count}")
+                max_lines.append(f"{name}_max{{{labels}}} {histogram.max:.6f}")
+        return "\n".join(lines + max_lines) + "\n"
+
+    def write_prometheus(self, path):
+        """
+        Write the Prometheus text to a file, replacing it atomically so a
+        collector never reads a partial file.
+
+        :param path: File to write
+        """
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w") as f:
+            f.write(self.to_prometheus())
+        os.replace(temp_path, path)
+
+    def start_export(self, path, interval=15):
+        """
+        Start a thread that rewrites the Prometheus file periodically.
+
+        :param path: File to write
+        :param interval: Seconds between writes
+        """
+        if self.export_thread is not None:
+            return
+        self.export_stop = threading.Event()
+        self.export_thread = threading.Thread(
+            target=self.export_loop, args=(path, interval, self.export_stop), daemon=True)
+        self.export_thread.start()
+
+    def export_loop(self, path, interval, stop_event):
+        """
+        Write the Prometheus file every interval until stopped (and once more on stop).
+
+        :param path: File to write
+        :param interval: Seconds between writes
+        :param stop_event: Event that ends the loop
+        """
+        while True:
+            stopped = stop_event.wait(interval)
+            try:
+                self.write_prometheus(path)
+            except OSError as e:
+                print(f"[ERROR] Could not write metrics to {path}: {e}")
+            if stopped:
+                return
+
+    def stop_export(self):
+        """
+        Stop the export thread, after a final write.
+        """
+        if self.export_thread is not None:
+            self.export_stop.set()
+            self.export_thread.join()
+            self.export_thread = None
+
+
+def status_of(call):
+    """
+    Get the status code of a finished call.
+
+    :param call: The finished call (or outcome)
+    :return: grpc.StatusCode
+    """
+    if call.cancelled():
+        return grpc.StatusCode.CANCELLED
+    exception = call.exception()
+    # Errors raised before the call completed are wrapped in an outcome reporting
+    # INTERNAL, so prefer the code carried by the error itself
+    if exception is not None and hasattr(exception, "code"):
+        return exception.code() or grpc.StatusCode.UNKNOWN
+    return call.code() or grpc.StatusCode.UNKNOWN
+
+
+class LatencyInterceptor(grpc.UnaryUnaryClientInterceptor, grpc.UnaryStreamClientInterceptor,
+                         grpc.StreamUnaryClientInterceptor, grpc.StreamStreamClientInterceptor):
+    """
+    Times every call from start to completion into RpcMetrics.
+    Streaming calls are timed over their whole lifetime.
+    """
+
+    def __init__(self, metrics):
+        """
+        :param metrics: The RpcMetrics to record into.
+        """
+        self.metrics = metrics
+
+    def track(self, client_call_details, call, started):
+        """
+        Record the call's latency once it completes, without blocking.
+
+        :param client_call_details: The client call details.
+        :param call: The call (future, outcome or stream).
+        :param started: time.perf_counter() when the call started.
+        :return: The call.
+        """
+        method = method_name(client_call_details)
+        call.add_done_callback(lambda done: self.metrics.observe(
+            method, status_of(done), time.perf_counter() - started))
+        return call
+
+    def intercept_unary_unary(self, continuation, client_call_details, request):
+        started = time.perf_counter()
+        return self.track(client_call_details, continuation(client_call_details, request), started)
+
+    def intercept_unary_stream(self, continuation, client_call_details, request):
+        started = time.perf_counter()
+        return self.track(client_call_details, continuation(client_call_details, request), started)
+
+    def intercept_stream_unary(self, continuation, client_call_details, request_iterator):
+        started = time.perf_counter()
+        return self.track(client_call_details, continuation(client_call_details, request_iterator), started)
+
+    def intercept_stream_stream(self, continuation, client_call_details, request_iterator):
+        started = time.perf_counter()
+        return self.track(client_call_details, continuation(client_call_details, request_iterator), started)
@@ -0,0 +1,156 @@
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+# Default maximum number of pages kept in memory
+DEFAULT_MAX_PAGES = 5
+
+
+class MessageHistory:
+    """
+    Pages backwards through the messages a user has received, loading pages on demand
+    with ListMessages.
+
+    Page 0 holds the newest messages, and page n is fetched below the oldest ID of
+    page n - 1. Only the boundary IDs of the pages seen so far and the max_pages most
+    recently used pages are kept, so a long history can be scrolled through in constant
+    memory; an evicted page is fetched again when it is revisited. Once a page has been
+    loaded, the next older one is prefetched in the background.
+    """
+
+    def __init__(self, client, page_size, max_pages=DEFAULT_MAX_PAGES):
+        """
+        :param client: The ChatClient whose session is used
+        :param page_size: Number of messages per page
+        :param max_pages: Maximum number of pages kept in memory
+        """
+        self.client = client
+        self.page_size = page_size
+        self.max_pages = max(2, max_pages)  # Room for the current page and the prefetched one
+        self.lock = threading.Lock()  # Guards all state below
+        self.offsets = [0]  # offsets[n]: ListMessages offset of page n (0 for the newest)
+        self.pages = OrderedDict()  # Page number -> messages (oldest first), least recently used first
+        self.loading = {}  # Page number -> Future of a fetch in flight, shared by all its callers
+        self.last_page = None  # Number of the oldest page, once a short page has been seen
+        self.generation = 0  # Bumped on reset, so fetches started before are not stored
+
+    def get_page(self, number):
+        """
+        Get a page, fetching it on the calling thread if it is not in memory, then
+        start prefetching the next older one.
+
+        :param number: Page number (0 for the newest messages)
+        :return: List of (id, sender, message), oldest first (empty past the oldest page)
+        """
+        page = self.request(number, prefetch=False).result()
+        self.prefetch(number + 1)
+        return page
+
+    def prefetch(self, number):
+        """
+        Fetch a page in the background, if it is known to exist and is not in memory.
+
+        :param number: Page number
+        """
+        if self.has_page(number):
+            self.request(number, prefetch=True)
+
+    def request(self, number, prefetch):
+        """
+        :param number: Page number
+        :param prefetch: Fetch on the client's executor rather than the calling thread
+        :return: Future of the page
+        """
+        with self.lock:
+            if number in self.pages:
+                self.pages.move_to_end(number)
+                future = Future()
+                future.set_result(self.pages[number])
+                return future
+            future = self.loading.get(number)
+            if future is not None:
+                return future
+            future = Future()
+            if number >= len(self.offsets):
+                # The previous page has not been seen, so there is nothing to fetch below
+                future.set_result([])
+                return future
+            self.loading[number] = future
+            args = (number, self.offsets[number], self.generation, future)
+        if prefetch:
+            self.client.submit(self.load, *args)
+        else:
+            self.load(*args)
+        return future
+
+    def load(self, number, offset, generation, future):
+        """
+        Fetch a page and keep it, evicting the least recently used page if needed.
+
+        :param number: Page number
+        :param offset: ID below which the page starts
+        :param generation: Generation the fetch was started in
+        :param future: Future resolved with the page (oldest first)
+        """
+        try:
+            messages = self.client.list_messages(offset, self.page_size)
+        except Exception as e:
+            with self.lock:
+                if self.loading.get(number) is future:
+                    del self.loading[number]
+            future.set_exception(e)
+            return
+        page = messages[::-1]
+        with self.lock:
+            if self.loading.get(number) is future:
+                del self.loading[number]
+            if generation == self.generation:
+                if number == 0 and (self.last_page == 0 or len(self.offsets) > 1 and (
+                        not messages or messages[-1][0] != self.offsets[1])):
+                    # New messages moved the newest page's boundary, so older pages no longer line up
+                    self.offsets = [0]
+                    self.pages.clear()
+                    self.loading.clear()
+                    self.last_page = None
+                    self.generation += 1
+                if len(messages) < self.page_size:
+                    # An empty page means the previous one was the oldest
+                    self.last_page = number if messages else max(number - 1, 0)
+                elif len(self.offsets) == number + 1:
+                    self.offsets.append(messages[-1][0])
+                self.pages[number] = page
+                self.pages.move_to_end(number)
+                while len(self.pages) > self.max_pages:
+                    self.pages.popitem(last=False)
+        future.set_result(page)
+
+    def has_page(self, number):
+        """
+        :param number: Page number
+        :return: False if the page is known to be past the oldest one
+        """
+        with self.lock:
+            return number < len(self.offsets) and (self.last_page is None or number <= self.last_page)
+
+    def refresh(self):
+        """
+        Drop the newest page, e.g. after new messages arrive, so it is fetched again.
+        Older pages are kept until the newest page is fetched and turns out to end at a
+        different message.
+        """
+        with self.lock:
+            self.pages.pop(0, None)
+            self.loading.pop(0, None)
+            self.generation += 1
+
+    def reset(self):
+        """
+        Forget all pages, e.g. after messages are deleted, so pages are fetched again
+        from the newest.
+        """
+        with self.lock:
+            self.offsets = [0]
+            self.pages.clear()
+            self.loading.clear()
+            self.last_page = None
+            self.generation += 1
@@ -0,0 +1,182 @@
+import threading
+import time
+from collections import deque
+import grpc
+from PollScheduler import PollScheduler
+from RpcScheduler import BACKGROUND
+from proto import chat_pb2
+
+# Default maximum number of messages fetched but not yet consumed
+DEFAULT_BUFFER_SIZE = 100
+
+
+class MessageIterator:
+    """
+    Iterates over received messages as they arrive, fetching them on a background thread
+    into a bounded buffer.
+
+    A fetch asks for at most the room left in the buffer, and the next one is only sent
+    once the consumer has emptied the buffer to half, so a slow consumer slows down
+    fetching instead of growing memory, while a fast one rarely waits for a round trip.
+
+    With the client's manual_ack, a message counts as handled once the consumer asks for
+    the next one, and handled messages are acknowledged before each fetch. Closing the
+    iterator acknowledges the last message yielded and has the buffered ones delivered again.
+    """
+
+    def __init__(self, client, buffer_size=DEFAULT_BUFFER_SIZE, follow=True, wait_ms=None):
+        """
+        :param client: The ChatClient whose session and channel are used
+        :param buffer_size: Maximum number of messages fetched but not yet consumed
+        :param follow: Keep waiting for new messages once the inbox is empty (otherwise stop there)
+        :param wait_ms: How long the server may hold an empty fetch open while following
+            (default: the client's long_poll_ms)
+        """
+        self.client = client
+        self.buffer_size = max(1, buffer_size)
+        self.follow = follow
+        self.wait_ms = client.long_poll_ms if wait_ms is None else wait_ms
+        self.inbox_version = client.inbox_version  # Last inbox version from the server
+        self.buffer = deque()  # Messages fetched but not yet consumed
+        self.condition = threading.Condition()  # Guards buffer, done and error; notified on changes
+        self.done = False  # Set when no more messages will be fetched
+        self.error = None  # grpc.RpcError that ended fetching, raised to the consumer
+        self.stop_event = threading.Event()  # Set on close
+        self.pending = None  # In-flight fetch, so close can cancel it
+        self.yielded = 0  # ID of the last message returned to the consumer
+        self.handled = 0  # ID of the last message the consumer has finished with
+        self.acked = 0  # ID of the last message acknowledged
+        self.fetched = False  # Whether any messages were fetched (so close has something to acknowledge)
+        self.thread = threading.Thread(target=self.fill, daemon=True)
+        self.thread.start()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        """
+        :return: The next message (id, sender, message), waiting for one if needed
+        """
+        with self.condition:
+            self.handled = self.yielded  # Asking for the next message means the last one was handled
+            while not self.buffer and not self.done:
+                self.condition.wait()
+            if self.buffer:
+                message = self.buffer.popleft()
+                self.yielded = message[0]
+                self.condition.notify_all()  # The fetcher may have room now
+                return message
+            if self.error is not None:
+                raise self.error
+            raise StopIteration
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """
+        Stop fetching, cancelling a fetch in flight. Messages still in the buffer are dropped
+        (with manual_ack, they are delivered again on the next fetch instead).
+        """
+        self.stop_event.set()
+        with self.condition:
+            self.done = True
+            self.condition.notify_all()
+        pending = self.pending
+        if pending:
+            pending.cancel()
+        self.thread.join(timeout=1)
+        if self.client.manual_ack and self.fetched:
+            self.client.try_ack_messages(self.yielded, rewind=True)
+
+    def fill(self):
+        """
+        Fetcher thread: keep the buffer topped up until closed or, when not following,
+        until the inbox is empty.
+        """
+        scheduler = PollScheduler(base_interval=1)  # Delays between empty fetches if the server does not hold them
+        while not self.stop_event.is_set():
+            with self.condition:
+                while len(self.buffer) > self.buffer_size // 2 and not self.stop_event.is_set():
+                    self.condition.wait()
+                room = self.buffer_size - len(self.buffer)
+            if self.stop_event.is_set():
+                return
+            if self.handled > self.acked:
+                self.acknowledge(self.handled)
+
+            wait_ms = self.wait_ms if self.follow else 0
+            started = time.monotonic()
+            try:
+                messages = self.fetch(room, wait_ms)
+            except grpc.RpcError as e:
+                if self.stop_event.is_set():
+                    return
+                if not self.follow:
+                    self.finish(e)
+                    return
+                self.client.log_error(f"Fetching messages failed ({e.code()}), retrying")
+                self.client.wait_to_reconnect(self.stop_event)
+                continue
+
+            if messages:
+                with self.condition:
+                    self.fetched = True
+                    self.buffer.extend(messages)
+                    self.condition.notify_all()
+            elif not self.follow:
+                self.finish()
+                return
+            elif (time.monotonic() - started) * 1000 < wait_ms / 2:
+                # The server answered right away rather than holding the fetch, so back off
+                self.stop_event.wait(scheduler.next_delay(0, room))
+
+    def fetch(self, maximum_number, wait_ms):
+        """
+        Fetch up to maximum_number messages (without passing them to the client's callback).
+
+        :param maximum_number: Maximum number of messages
+        :param wait_ms: How long the server may hold the fetch if there are none
+        :return: List of (id, sender, message)
+        """
+        request = chat_pb2.RequestMessagesRequest(
+            session_key=self.client.request_session_key(), maximum_number=maximum_number, wait_ms=wait_ms,
+            inbox_version=self.inbox_version, compact_sender=self.client.compact_sender,
+            manual_ack=self.client.manual_ack)
+        with self.client.scheduler.admit(BACKGROUND):
+            self.pending = self.client.stub.RequestMessages.future(
+                request, timeout=self.client.poll_timeout(wait_ms))
+            try:
+                response = self.pending.result()
+            except grpc.FutureCancelledError:
+                return []
+            finally:
+                self.pending = None
+        if response.unchanged:
+            return []
+        self.inbox_version = response.inbox_version
+        return self.client.convert_messages(response.messages)
+
+    def acknowledge(self, up_to_id):
+        """
+        Acknowledge the messages handled so far (with manual_ack). A failed
+        acknowledgement is retried before the next fetch.
+
+        :param up_to_id: ID of the last message handled
+        """
+        if self.client.manual_ack and self.client.try_ack_messages(up_to_id) is not None:
+            self.acked = up_to_id
+
+    def finish(self, error=None):
+        """
+        Mark fetching as over, so the consumer stops once the buffer is empty.
+
+        :param error: grpc.RpcError to raise to the consumer then, if fetching failed
+        """
+        with self.condition:
+            self.done = True
+            self.error = error
+            self.condition.notify_all()
@@ -0,0 +1,142 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+import grpc
+from SessionStream import SessionStreamError, status_code
+from proto import chat_pb2
+
+
+class Outbox:
+    """
+    Queues outgoing messages and sends them in the background, coalescing everything
+    queued within a short window into one SendMessages call.
+
+    A single flusher sends batches one at a time, in queue order, so messages to the
+    same recipient are stored (and delivered) in the order they were queued.
+    """
+
+    def __init__(self, client, flush_window=0.01, max_batch=500, max_queued=1000):
+        """
+        Initializes the outbox (the flusher starts on the first message).
+
+        :param client: The ChatClient whose session and stub are used
+        :param flush_window: Seconds to wait for more messages after the first one of a batch
+        :param max_batch: Maximum number of messages per SendMessages call
+        :param max_queued: Maximum number of unsent messages; submit blocks while full
+        """
+        self.client = client
+        self.flush_window = flush_window
+        self.max_batch = max_batch
+        self.queue = queue.Queue(maxsize=max_queued)  # (recipient, message, future); None stops
+        self.lock = threading.Lock()  # Guards starting and stopping the flusher
+        self.thread = None  # Flusher thread
+
+    def submit(self, recipient, message, timeout=None):
+        """
+        Queue a message.
+
+        :param recipient: Recipient
+        :param message: Message
+        :param timeout: Seconds to wait for room in a full outbox (None waits indefinitely)
+        :return: Future resolving to the message ID (or raising a grpc.RpcError)
+        """
+        future = Future()
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.flush_loop, daemon=True)
+                self.thread.start()
+        # Blocks while the outbox is full (raises queue.Full after timeout)
+        self.queue.put((recipient, message, future), timeout=timeout)
+        return future
+
+    def pending(self):
+        """
+        :return: Number of messages waiting to be sent
+        """
+        return self.queue.qsize()
+
+    def flush_loop(self):
+        """
+        Send queued messages until stopped, a batch at a time. Messages whose future was
+        cancelled before being taken from the queue are dropped. An unexpected error
+        fails its batch but does not stop the flusher.
+        """
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            batch = [item] if self.start(item) else []
+            # Coalesce whatever else arrives within the window
+            deadline = time.monotonic() + self.flush_window
+            stopping = False
+            while len(batch) < self.max_batch:
+                try:
+                    item = self.queue.get(
+                        timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                if self.start(item):
+                    batch.append(item)
+            if batch:
+                try:
+                    self.send_batch(batch)
+                except Exception as e:
+                    self.client.log_error(f"Failed to send {len(batch)} queued messages ({e})")
+                    for _, _, future in batch:
+                        if not future.done():
+                            future.set_exception(e)
+            if stopping:
+                return
+
+    def start(self, item):
+        """
+        Mark a queued message's future as running, so it can no longer be cancelled.
+
+        :param item: (recipient, message, future)
+        :return: False if the future was already cancelled (the message is not sent)
+        """
+        return item[2].set_running_or_notify_cancel()
+
+    def send_batch(self, batch):
+        """
+        Send one batch and complete its futures with the message IDs or errors.
+        A failed call fails every message in the batch; it is not retried, since
+        the messages may already have been stored.
+
+        :param batch: List of (recipient, message, future)
+        """
+        request = chat_pb2.SendMessagesRequest(session_key=self.client.request_session_key(), messages=[
+            chat_pb2.OutgoingMessage(recipient=recipient, message=message)
+            for recipient, message, _ in batch])
+        try:
+            response = self.client.call("SendMessages", request)
+        except grpc.RpcError as e:
+            self.client.log_error(
+                f"Failed to send {len(batch)} queued messages ({e.code()})")
+            for _, _, future in batch:
+                future.set_exception(e)
+            return
+        for (_, _, future), result in zip(batch, response.results):
+            if result.WhichOneof("result") == "id":
+                future.set_result(result.id)
+            else:
+                future.set_exception(SessionStreamError(
+                    status_code(result.error.code), result.error.description))
+        print(f"[MESSAGES SENT] Batch of {len(batch)}")
+
+    def close(self, timeout=None):
+        """
+        Send everything still queued, then stop the flusher.
+
+        :param timeout: Seconds to wait for the flusher to finish
+        """
+        with self.lock:
+            thread = self.thread
+            self.thread = None
+        if thread is not None:
+            self.queue.put(None)
+            thread.join(timeout)
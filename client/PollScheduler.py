@@ -0,0 +1,89 @@
+import math
+import random
+
+
+class PollScheduler:
+    """
+    Decides how long to wait between message polls.
+
+    - Full pages (as many messages as were requested) mean a backlog is waiting,
+      so the next poll goes out after drain_interval (immediately by default).
+    - Partial pages reset the delay to the base interval.
+    - Empty pages back off exponentially, up to max_interval.
+    Every delay is jittered per client so clients started together drift apart.
+    """
+
+    def __init__(self, base_interval=5, max_interval=30, backoff_factor=2, jitter=0.2, drain_interval=0, seed=None,
+                 rng=None):
+        """
+        Initializes the scheduler.
+
+        :param base_interval: Delay (seconds) after a poll that returned some messages
+        :param max_interval: Upper bound (seconds) for the idle backoff
+        :param backoff_factor: Multiplier applied to the delay after each empty poll
+        :param jitter: Fraction of the delay to randomize by (0.2 = +/-20%)
+        :param drain_interval: Delay (seconds) after a full page
+        :param seed: Optional seed for the per-client random generator
+        :param rng: random.Random to draw jitter from instead (shared by many schedulers to save memory)
+        """
+        self.base_interval = base_interval
+        self.max_interval = max(max_interval, base_interval)
+        self.backoff_factor = backoff_factor
+        self.jitter = jitter
+        self.drain_interval = drain_interval
+        self.random = rng or random.Random(seed)  # Per-client jitter source
+
+        self.interval = base_interval  # Un-jittered delay currently in use
+        self.last_delay = base_interval  # Jittered delay most recently returned
+
+    def reset(self):
+        """
+        Return to the base interval (e.g., after logging in).
+        """
+        self.interval = self.base_interval
+
+    def next_delay(self, num_received, max_number):
+        """
+        Compute the delay before the next poll based on the last poll's result.
+
+        :param num_received: Number of messages the last poll returned (None if it failed)
+        :param max_number: Maximum number of messages that were requested
+        :return: Delay in seconds
+        """
+        if num_received is None:
+            # Nothing learned about the inbox: keep the base cadence
+            self.interval = self.base_interval
+        elif max_number > 0 and num_received >= max_number:
+            # Full page: more messages are probably waiting
+            self.interval = self.drain_interval
+        elif num_received > 0:
+            self.interval = self.base_interval
+        else:
+            # Idle inbox: back off (starting from the base interval after a drain)
+            self.interval = min(max(self.interval, self.base_interval) * self.backoff_factor,
+                                self.max_interval)
+
+        self.last_delay = self.jittered(self.interval)
+        return self.last_delay
+
+    def jittered(self, interval):
+        """
+        Apply per-client jitter to an interval.
+
+        :param interval: Interval in seconds
+        :return: Jittered interval in seconds
+        """
+        if interval <= 0 or self.jitter <= 0:
+            return interval
+        return interval * self.random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    @property
+    def poll_rate(self):
+        """
+        Poll rate currently in use, in polls per second.
+
+        :return: Polls per second (math.inf while draining with no delay)
+        """
+        if self.last_delay <= 0:
+            return math.inf
+        return 1 / self.last_delay
@@ -0,0 +1,96 @@
+import json
+import os
+import threading
+
+# Default location of the cache file
+DEFAULT_PREFIX_CACHE_FILE = os.path.join(os.path.expanduser("~"), ".chat_client_prefixes.json")
+
+
+class PrefixCache:
+    """
+    On-disk cache of bcrypt prefixes (the salt part of a password hash) by server and
+    username, so logging in can hash the password without an AccountLookup first.
+
+    Prefixes are not secret (AccountLookup returns them to anyone), but may go stale
+    if an account is deleted and recreated; callers refresh them when a login fails.
+    """
+
+    def __init__(self, path=DEFAULT_PREFIX_CACHE_FILE, max_entries=100):
+        """
+        Load the cache (an unreadable or missing file starts it empty).
+
+        :param path: JSON file holding the cache
+        :param max_entries: Maximum number of prefixes kept (oldest are dropped first)
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.lock = threading.Lock()  # Guards prefixes and the file
+        self.prefixes = {}  # "server/username" -> prefix, oldest first
+        try:
+            with open(path, "r") as f:
+                prefixes = json.load(f)
+            if isinstance(prefixes, dict):
+                self.prefixes = {key: prefix for key, prefix in prefixes.items()
+                                 if isinstance(prefix, str)}
+        except (OSError, ValueError):
+            pass
+
+    @staticmethod
+    def key(server, username):
+        """
+        :param server: Server address ("host:port")
+        :param username: Username
+        :return: Cache key
+        """
+        return f"{server}/{username}"
+
+    def get(self, server, username):
+        """
+        :param server: Server address ("host:port")
+        :param username: Username
+        :return: The cached prefix, or None
+        """
+        with self.lock:
+            return self.prefixes.get(self.key(server, username))
+
+    def put(self, server, username, prefix):
+        """
+        Cache a prefix and save the file (if it changed).
+
+        :param server: Server address ("host:port")
+        :param username: Username
+        :param prefix: bcrypt prefix
+        """
+        key = self.key(server, username)
+        with self.lock:
+            if self.prefixes.get(key) == prefix:
+                return
+            self.prefixes.pop(key, None)
+            self.prefixes[key] = prefix
+            while len(self.prefixes) > self.max_entries:
+                del self.prefixes[next(iter(self.prefixes))]
+            self.save()
+
+    def remove(self, server, username):
+        """
+        Forget a prefix and save the file (if it was cached).
+
+        :param server: Server address ("host:port")
+        :param username: Username
+        """
+        with self.lock:
+            if self.prefixes.pop(self.key(server, username), None) is not None:
+                self.save()
+
+    def save(self):
+        """
+        Write the cache, replacing the file atomically. Failures are only logged,
+        since the cache is an optimization. Called with the lock held.
+        """
+        temp_path = f"{self.path}.tmp"
+        try:
+            with open(temp_path, "w") as f:
+                json.dump(self.prefixes, f)
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            print(f"[ERROR] Could not save bcrypt prefix cache to {self.path}: {e}")
@@ -0,0 +1,179 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from LatencyInterceptor import LatencyHistogram
+
+# Priority classes, highest first
+INTERACTIVE = "interactive"  # Calls a user is waiting on (send, search, delete, ...)
+BACKGROUND = "background"  # Calls nobody is waiting on (message polls)
+PRIORITIES = (INTERACTIVE, BACKGROUND)
+# Default maximum number of calls in flight per class
+DEFAULT_CONCURRENCY = {INTERACTIVE: 8, BACKGROUND: 2}
+# Default token bucket: sustained calls per second and burst size
+DEFAULT_RATE = 200
+DEFAULT_BURST = 100
+# Share of the bucket background calls leave for interactive ones
+DEFAULT_BACKGROUND_RESERVE = 0.25
+
+
+class TokenBucket:
+    """
+    Token bucket rate limit: holds up to burst tokens, refilled at rate per second.
+    Not thread-safe; RpcScheduler calls it with its lock held.
+    """
+
+    def __init__(self, rate, burst):
+        """
+        :param rate: Tokens added per second
+        :param burst: Maximum number of tokens held
+        """
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst  # Tokens available (fractional between refills)
+        self.updated = time.monotonic()  # Last refill
+
+    def take(self, minimum=1):
+        """
+        Take one token if at least minimum are available.
+
+        :param minimum: Tokens that must be available (at least 1)
+        :return: 0 if a token was taken, otherwise seconds until enough are available
+        """
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= minimum:
+            self.tokens -= 1
+            return 0
+        return (minimum - self.tokens) / self.rate
+
+
+class RpcScheduler:
+    """
+    Admission control for a client's calls: each call waits for a slot in its priority
+    class, then for a token from a shared rate limit, before it is sent.
+
+    Waiting calls are admitted in priority order, and in arrival order within a class,
+    with at most the class's concurrency cap in flight. Background calls only take a
+    token while the bucket holds more than its reserve, so polls never use up the
+    tokens a user's send needs. Callers block on their own thread; nothing is sent
+    by the scheduler itself.
+    """
+
+    def __init__(self, concurrency=None, rate=DEFAULT_RATE, burst=DEFAULT_BURST,
+                 background_reserve=DEFAULT_BACKGROUND_RESERVE):
+        """
+        :param concurrency: Dict of priority class -> maximum calls in flight, overriding DEFAULT_CONCURRENCY
+        :param rate: Calls per second allowed on average (None or 0 for no rate limit)
+        :param burst: Calls allowed at once after an idle period
+        :param background_reserve: Share of the burst only interactive calls may use
+        """
+        self.limits = dict(DEFAULT_CONCURRENCY, **(concurrency or {}))
+        self.bucket = TokenBucket(rate, burst) if rate else None
+        # Tokens needed for a background call, capped at what the bucket can hold so a
+        # small burst (e.g., 1) still lets background calls through once it refills
+        self.background_minimum = min(burst, 1 + background_reserve * burst)
+        self.condition = threading.Condition()  # Guards all state below; notified when a call may proceed
+        self.waiting = {priority: deque() for priority in PRIORITIES}  # Tickets of waiting calls, in arrival order
+        self.in_flight = {priority: 0 for priority in PRIORITIES}
+        self.admitted = {priority: 0 for priority in PRIORITIES}  # Calls admitted so far
+        self.wait_times = {priority: LatencyHistogram() for priority in PRIORITIES}  # Time spent waiting
+
+    @contextmanager
+    def admit(self, priority):
+        """
+        Hold a slot for one call (context manager), waiting for it first.
+
+        :param priority: Priority class (INTERACTIVE or BACKGROUND)
+        """
+        self.acquire(priority)
+        try:
+            yield
+        finally:
+            self.release(priority)
+
+    def acquire(self, priority):
+        """
+        Wait until a call of this class may be sent, and take its slot.
+
+        :param priority: Priority class
+        """
+        ticket = object()
+        enqueued = time.monotonic()
+        with self.condition:
+            queue = self.waiting[priority]
+            queue.append(ticket)
+            try:
+                while True:
+                    if self.next_ticket() is ticket:
+                        delay = self.take_token(priority)
+                        if delay == 0:
+                            break
+                        self.condition.wait(delay)
+                    else:
+                        self.condition.wait()
+            finally:
+                queue.remove(ticket)
+            self.in_flight[priority] += 1
+            self.admitted[priority] += 1
+            self.wait_times[priority].observe(time.monotonic() - enqueued)
+            self.condition.notify_all()  # The next call in line may be able to go too
+
+    def release(self, priority):
+        """
+        Free the slot of a finished call.
+
+        :param priority: Priority class
+        """
+        with self.condition:
+            self.in_flight[priority] -= 1
+            self.condition.notify_all()
+
+    def next_ticket(self):
+        """
+        Called with the lock held.
+
+        :return: The ticket of the call to admit next: the oldest one in the highest
+            priority class with a free slot (None if no call can go)
+        """
+        for priority in PRIORITIES:
+            queue = self.waiting[priority]
+            if queue and self.in_flight[priority] < self.limits[priority]:
+                return queue[0]
+        return None
+
+    def take_token(self, priority):
+        """
+        Called with the lock held.
+
+        :param priority: Priority class
+        :return: 0 if the call may go, otherwise seconds to wait for a token
+        """
+        if self.bucket is None:
+            return 0
+        return self.bucket.take(1 if priority == INTERACTIVE else self.background_minimum)
+
+    def stats(self):
+        """
+        Get queue depths, calls in flight and wait times per priority class.
+
+        :return: Dict of priority class -> {"queued", "in_flight", "admitted",
+            "wait_ms": {"p50", "p99", "max", "mean"}}
+        """
+        with self.condition:
+            stats = {}
+            for priority in PRIORITIES:
+                waits = self.wait_times[priority]
+                stats[priority] = {
+                    "queued": len(self.waiting[priority]),
+                    "in_flight": self.in_flight[priority],
+                    "admitted": self.admitted[priority],
+                    "wait_ms": {
+                        "p50": waits.percentile(50) * 1000,
+                        "p99": waits.percentile(99) * 1000,
+                        "max": waits.max * 1000,
+                        "mean": waits.sum / waits.count * 1000 if waits.count else 0.0,
+                    },
+                }
+            return stats
@@ -0,0 +1,74 @@
+import collections
+import uuid
+import grpc
+
+# Metadata key carrying the session token ("-bin" keys hold raw bytes)
+SESSION_METADATA_KEY = "session-bin"
+
+
+def session_token(session_key):
+    """
+    Compact binary form of a session key: the 16 bytes of its UUID
+    (instead of the 36-character string).
+
+    :param session_key: Session key string
+    :return: Token bytes
+    """
+    return uuid.UUID(session_key).bytes
+
+
+class ClientCallDetails(collections.namedtuple("ClientCallDetails", (
+        "method", "timeout", "metadata", "credentials", "wait_for_ready", "compression")),
+        grpc.ClientCallDetails):
+    pass
+
+
+class SessionMetadataInterceptor(grpc.UnaryUnaryClientInterceptor, grpc.UnaryStreamClientInterceptor,
+                                 grpc.StreamUnaryClientInterceptor, grpc.StreamStreamClientInterceptor):
+    """
+    Attaches the client's session to every call as binary metadata, so requests
+    can leave their session_key field empty. The server resolves it once per call.
+    Calls that already carry a session (e.g., from a SessionPool) are left alone.
+
+    (grpc.metadata_call_credentials would do the same, but gRPC only sends call
+    credentials over secure channels, and the chat server is plaintext.)
+    """
+
+    def __init__(self, client):
+        """
+        :param client: The ChatClient whose session_key is attached
+        """
+        self.client = client
+        self.cached = (None, None)  # (session key, its token), replaced as a whole
+
+    def with_session(self, client_call_details):
+        """
+        Add the session token to the call's metadata (if logged in).
+
+        :param client_call_details: The client call details.
+        :return: The client call details to use.
+        """
+        session_key = self.client.session_key
+        if not session_key or any(key == SESSION_METADATA_KEY for key, _ in client_call_details.metadata or ()):
+            return client_call_details
+        cached_key, token = self.cached
+        if session_key != cached_key:
+            token = session_token(session_key)
+            self.cached = (session_key, token)
+        metadata = list(client_call_details.metadata or ())
+        metadata.append((SESSION_METADATA_KEY, token))
+        return ClientCallDetails(client_call_details.method, client_call_details.timeout, metadata,
+                                 client_call_details.credentials, client_call_details.wait_for_ready,
+                                 client_call_details.compression)
+
+    def intercept_unary_unary(self, continuation, client_call_details, request):
+        return continuation(self.with_session(client_call_details), request)
+
+    def intercept_unary_stream(self, continuation, client_call_details, request):
+        return continuation(self.with_session(client_call_details), request)
+
+    def intercept_stream_unary(self, continuation, client_call_details, request_iterator):
+        return continuation(self.with_session(client_call_details), request_iterator)
+
+    def intercept_stream_stream(self, continuation, client_call_details, request_iterator):
+        return continuation(self.with_session(client_call_details), request_iterator)
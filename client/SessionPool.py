@@ -0,0 +1,285 @@
+import random
+import threading
+import time
+import grpc
+from PollScheduler import PollScheduler
+from RpcScheduler import BACKGROUND
+from SessionMetadataInterceptor import SESSION_METADATA_KEY, session_token
+from proto import chat_pb2
+
+
+class PooledSession:
+    """
+    Polling state of one session in a SessionPool.
+    """
+    __slots__ = ("session_key", "metadata", "callback", "scheduler", "inbox_version", "active")
+
+    def __init__(self, session_key, callback, scheduler):
+        """
+        :param session_key: Session key
+        :param callback: Called with each non-empty list of received messages
+        :param scheduler: PollScheduler deciding the delay between this session's polls
+        """
+        self.session_key = session_key
+        self.metadata = ((SESSION_METADATA_KEY, session_token(session_key)),)  # Sent with each poll
+        self.callback = callback
+        self.scheduler = scheduler
+        self.inbox_version = 0  # Last inbox version from the server (0 if none)
+        self.active = True  # Cleared when the session is removed
+
+
+class SessionPool:
+    """
+    Polls messages for many sessions over one ChatClient's channel, from one thread.
+
+    Sessions are kept in a timer wheel: a ring of slots, one per tick, where each
+    session waits in the slot of its next poll. Every tick the thread sends the due
+    polls without blocking; as each one completes, it is handed to the client's thread
+    pool, where the session's messages go to its callback (so neither the callback nor
+    a username lookup blocks a gRPC thread) and the session is put back in the wheel
+    after its PollScheduler delay. Adding,
+    removing and scheduling a session are O(1), so one process can poll tens of
+    thousands of sessions with a single thread and connection.
+
+    Sessions are identified to the server by call metadata, so the client's own
+    session is not used.
+    """
+
+    def __init__(self, client, tick=0.05, wheel_size=1024, max_in_flight=256, poll_interval=5, max_interval=30):
+        """
+        :param client: The ChatClient whose channel, deadlines and message settings are used
+        :param tick: Seconds per wheel slot (the scheduling resolution)
+        :param wheel_size: Number of slots; delays are capped at just under tick * wheel_size
+        :param max_in_flight: Maximum number of polls outstanding; further due polls wait a tick
+        :param poll_interval: Base polling interval of each session (see PollScheduler)
+        :param max_interval: Maximum idle polling interval of each session
+        """
+        self.client = client
+        self.tick = tick
+        self.slots = [[] for _ in range(wheel_size)]  # Sessions due in each tick
+        self.position = 0  # Number of ticks handled so far (the next slot is position % wheel_size)
+        self.max_in_flight = max_in_flight
+        self.in_flight = 0  # Polls outstanding
+        self.poll_interval = poll_interval
+        self.max_interval = min(max_interval, tick * (wheel_size - 1))
+        self.sessions = {}  # Session key -> PooledSession
+        self.random = random.Random()  # Jitter source shared by all sessions' schedulers
+        self.lock = threading.Lock()  # Guards slots, position, in_flight and sessions
+        self.stop_event = threading.Event()
+        self.thread = None  # Wheel thread (started with the first session)
+
+    def __len__(self):
+        return len(self.sessions)
+
+    def add(self, session_key, callback):
+        """
+        Start polling for a session (its first poll goes out on the next tick).
+
+        :param session_key: Session key
+        :param callback: Called with each non-empty list of (id, sender, message), from the client's thread pool
+        """
+        session = PooledSession(session_key, callback, PollScheduler(
+            base_interval=self.poll_interval, max_interval=self.max_interval, rng=self.random))
+        with self.lock:
+            previous = self.sessions.get(session_key)
+            if previous is not None:
+                previous.active = False
+            self.sessions[session_key] = session
+            self.schedule(session, 0)
+            if self.thread is None:
+                self.stop_event = threading.Event()
+                self.thread = threading.Thread(target=self.run, args=(self.stop_event,), daemon=True)
+                self.thread.start()
+
+    def remove(self, session_key):
+        """
+        Stop polling for a session. A poll already in flight is discarded.
+
+        :param session_key: Session key
+        """
+        with self.lock:
+            session = self.sessions.pop(session_key, None)
+        if session is not None:
+            session.active = False
+
+    def close(self):
+        """
+        Stop polling for every session and end the wheel thread.
+        """
+        with self.lock:
+            thread = self.thread
+            self.thread = None
+            for session in self.sessions.values():
+                session.active = False
+            self.sessions.clear()
+            self.slots = [[] for _ in self.slots]
+        self.stop_event.set()
+        if thread is not None:
+            thread.join()
+
+    def schedule(self, session, delay):
+        """
+        Put a session in the slot of its next poll. Called with the lock held.
+
+        :param session: PooledSession
+        :param delay: Seconds until the poll
+        """
+        ticks = min(max(1, -int(-delay // self.tick)), len(self.slots) - 1)
+        self.slots[(self.position + ticks - 1) % len(self.slots)].append(session)
+
+    def run(self, stop_event):
+        """
+        Wheel thread: every tick, send the polls that are due.
+        Ticks missed while busy are caught up without waiting.
+
+        :param stop_event: Event that ends the thread
+        """
+        started = time.monotonic()
+        while True:
+            with self.lock:
+                wait = started + (self.position + 1) * self.tick - time.monotonic()
+            if stop_event.wait(max(wait, 0)):
+                return
+            with self.lock:
+                index = self.position % len(self.slots)
+                due = self.slots[index]
+                self.slots[index] = []
+                self.position += 1
+                polls = []
+                for session in due:
+                    if not session.active:
+                        continue
+                    if self.in_flight >= self.max_in_flight:
+                        self.schedule(session, 0)  # Try again next tick
+                    else:
+                        self.in_flight += 1
+                        polls.append(session)
+            for session in polls:
+                self.poll(session)
+
+    def poll(self, session):
+        """
+        Send one session's poll; the result is handled when it completes.
+
+        :param session: PooledSession
+        """
+        request = chat_pb2.RequestMessagesRequest(
+            maximum_number=self.client.max_msg, inbox_version=session.inbox_version,
+            compact_sender=self.client.compact_sender, manual_ack=self.client.manual_ack)
+        call = self.client.stub.RequestMessages.future(
+            request, timeout=self.client.deadlines["RequestMessages"], metadata=session.metadata)
+        call.add_done_callback(lambda call: self.hand_off(session, call))
+
+    def hand_off(self, session, call):
+        """
+        gRPC done-callback of a poll: pass it to the client's thread pool, since handling
+        it runs the session's callback and may make calls.
+
+        :param session: PooledSession
+        :param call: The completed call
+        """
+        try:
+            self.client.submit(self.handle_poll, session, call)
+        except RuntimeError:
+            # The client's thread pool is shut down, so the pool is done too
+            with self.lock:
+                self.in_flight -= 1
+
+    def ack(self, session, up_to_id, rewind=False):
+        """
+        Acknowledge a session's messages once its callback has handled them, without
+        waiting for the answer (a failed acknowledgement is covered by the next one).
+        The call waits for a background slot in the client's scheduler, like its own acks.
+
+        :param session: PooledSession
+        :param up_to_id: ID of the last message handled
+        :param rewind: Also have the messages received after up_to_id delivered again
+        """
+        request = chat_pb2.AckMessagesRequest(up_to_id=up_to_id, rewind=rewind)
+        scheduler = self.client.scheduler
+        scheduler.acquire(BACKGROUND)
+        try:
+            call = self.client.stub.AckMessages.future(
+                request, timeout=self.client.deadlines["AckMessages"], metadata=session.metadata)
+        except Exception:
+            scheduler.release(BACKGROUND)
+            raise
+
+        def done(call):
+            scheduler.release(BACKGROUND)
+            if call.exception():
+                self.client.log_error(f"Pooled ack failed ({call.code()})")
+        call.add_done_callback(done)
+
+    def resolve_senders(self, session, messages):
+        """
+        Make sure the senders of a session's compact messages are in the client's username
+        cache, looking up any missing ones as that session (in a single call through the
+        client's scheduler).
+
+        :param session: PooledSession the messages were received for
+        :param messages: ChatMessages with sender_id set
+        """
+        client = self.client
+        missing = client.usernames.missing(message.sender_id for message in messages)
+        if not missing:
+            return
+        request = chat_pb2.LookupUsernamesRequest(id=missing)
+        try:
+            with client.scheduler.admit(client.priority("LookupUsernames")):
+                response = client.stub.LookupUsernames(
+                    request, timeout=client.deadlines["LookupUsernames"], metadata=session.metadata)
+        except grpc.RpcError as e:
+            # The messages are still delivered, with placeholder names
+            client.log_error(f"Pooled username lookup failed ({e.code()})")
+            return
+        client.usernames.update((account.id, account.username) for account in response.accounts)
+
+    def handle_poll(self, session, call):
+        """
+        Deliver a completed poll's messages and schedule the session's next poll
+        (on the client's thread pool). Compact senders are looked up as the session.
+        The inbox version is only updated once the callback succeeds; if it raises,
+        the session's cursor is rewound (with manual_ack) so the next poll gets the batch
+        again, like ChatClient.handle_received_messages. Sessions the server no longer
+        accepts are removed.
+
+        :param session: PooledSession
+        :param call: The completed call
+        """
+        num_received = None
+        try:
+            response = call.result()
+            if response.unchanged:
+                num_received = 0
+            elif session.active:
+                if self.client.compact_sender:
+                    self.resolve_senders(session, response.messages)
+                messages = [self.client.convert_message(message) for message in response.messages]
+                num_received = len(messages)
+                if messages:
+                    try:
+                        session.callback(messages)
+                    except Exception as e:
+                        self.client.log_error(f"Pooled message callback failed ({e})")
+                        if self.client.manual_ack:
+                            # Acknowledge none of the batch, and skip the "unchanged" reply
+                            session.inbox_version = 0
+                            self.ack(session, 0, rewind=True)
+                        return
+                    if self.client.manual_ack:
+                        self.ack(session, messages[-1][0])
+                session.inbox_version = response.inbox_version
+        except grpc.RpcError as e:
+            if e.code() == grpc.StatusCode.UNAUTHENTICATED:
+                self.client.log_error("Pooled session is no longer valid, removing it")
+                self.remove(session.session_key)
+            else:
+                self.client.log_error(f"Pooled poll failed ({e.code()})")
+        finally:
+            # Always reschedule, even if the callback raised
+            delay = session.scheduler.next_delay(num_received, self.client.max_msg)
+            with self.lock:
+                self.in_flight -= 1
+                if session.active:
+                    self.schedule(session, delay)
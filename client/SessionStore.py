@@ -0,0 +1,90 @@
+import json
+import os
+import threading
+import time
+
+# Default location of the saved sessions file
+DEFAULT_SESSION_FILE = os.path.join(os.path.expanduser("~"), ".chat_client_session.json")
+
+
+class SessionStore:
+    """
+    Saves the client's session (one per server) so a relaunched client can resume it
+    with ResumeSession instead of logging in again.
+
+    The file holds live session keys, so it is only readable by its owner.
+    """
+
+    def __init__(self, path=DEFAULT_SESSION_FILE):
+        """
+        :param path: JSON file holding the sessions
+        """
+        self.path = path
+        self.lock = threading.Lock()  # Guards reading and rewriting the file
+
+    def read(self):
+        """
+        :return: Dict of server -> {"username", "session_key", "expires_at_ms"}
+            (empty if the file is missing or unreadable)
+        """
+        try:
+            with open(self.path, "r") as f:
+                sessions = json.load(f)
+            return sessions if isinstance(sessions, dict) else {}
+        except (OSError, ValueError):
+            return {}
+
+    def write(self, sessions):
+        """
+        Replace the file atomically, creating it readable only by its owner.
+        Failures are only logged, since a saved session is an optimization.
+
+        :param sessions: Dict of server -> session
+        """
+        temp_path = f"{self.path}.tmp"
+        try:
+            fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, "w") as f:
+                json.dump(sessions, f)
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            print(f"[ERROR] Could not save session to {self.path}: {e}")
+
+    def load(self, server):
+        """
+        Get the saved session for a server, unless it has expired.
+
+        :param server: Server address ("host:port")
+        :return: (username, session key), or None
+        """
+        with self.lock:
+            session = self.read().get(server)
+        if not isinstance(session, dict) or session.get("expires_at_ms", 0) <= time.time() * 1000:
+            return None
+        return session.get("username"), session.get("session_key")
+
+    def save(self, server, username, session_key, expires_at_ms):
+        """
+        Save the session for a server.
+
+        :param server: Server address ("host:port")
+        :param username: Username
+        :param session_key: Session key
+        :param expires_at_ms: When the server expires the session (milliseconds since the epoch)
+        """
+        with self.lock:
+            sessions = self.read()
+            sessions[server] = {"username": username, "session_key": session_key,
+                                "expires_at_ms": expires_at_ms}
+            self.write(sessions)
+
+    def clear(self, server):
+        """
+        Forget the saved session for a server.
+
+        :param server: Server address ("host:port")
+        """
+        with self.lock:
+            sessions = self.read()
+            if sessions.pop(server, None) is not None:
+                self.write(sessions)
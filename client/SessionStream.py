@@ -0,0 +1,165 @@
+import itertools
+import queue
+import threading
+from concurrent.futures import Future, TimeoutError
+import grpc
+from proto import chat_pb2
+
+
+class SessionStreamError(grpc.RpcError):
+    """
+    Error returned for a single command on the session stream (or a single message
+    in a SendMessages batch).
+    Mirrors the code()/details() interface of a failed unary call.
+    """
+
+    def __init__(self, code, details):
+        """
+        :param code: grpc.StatusCode of the error
+        :param details: Error description
+        """
+        super().__init__(details)
+        self._code = code
+        self._details = details
+
+    def code(self):
+        return self._code
+
+    def details(self):
+        return self._details
+
+
+class SessionStreamClosed(Exception):
+    """
+    Raised when a command cannot be sent because the session stream has closed.
+    """
+
+
+class SessionStream:
+    """
+    Multiplexes commands over one long-lived bidirectional Session stream.
+    Each command is sent as a frame tagged with a correlation ID, and its result is
+    matched back to the waiting caller by that ID.
+    """
+
+    def __init__(self, client, session_key):
+        """
+        Opens the stream.
+
+        :param client: The ChatClient instance whose stub is used
+        :param session_key: Session key sent with the first frame to authenticate the stream
+        """
+        self.client = client
+        self.session_key = session_key
+        self.requests = queue.Queue()  # Frames waiting to be sent (None ends the stream)
+        self.pending = {}  # Correlation ID -> Future for the result
+        self.lock = threading.Lock()  # Guards pending, first_frame and open
+        self.correlation_ids = itertools.count(1)
+        self.first_frame = True
+        self.open = True
+
+        self.stream = client.stub.Session(self.request_iterator())
+        self.reader = threading.Thread(
+            target=self.read_responses, daemon=True)
+        self.reader.start()
+
+    def request_iterator(self):
+        """
+        Yields queued frames to gRPC until the stream is closed.
+        """
+        while True:
+            frame = self.requests.get()
+            if frame is None:
+                return
+            yield frame
+
+    def request(self, command, request, timeout=None):
+        """
+        Send a command and wait for its result.
+
+        :param command: Name of the command field (e.g., "send_message")
+        :param request: The request message for the command
+        :param timeout: Seconds to wait for the result (raises DEADLINE_EXCEEDED after)
+        :return: The response message for the command
+        """
+        future = Future()
+        with self.lock:
+            if not self.open:
+                raise SessionStreamClosed()
+            correlation_id = next(self.correlation_ids)
+            self.pending[correlation_id] = future
+            frame = chat_pb2.SessionRequest(
+                correlation_id=correlation_id, **{command: request})
+            if self.first_frame:
+                frame.session_key = self.session_key
+                self.first_frame = False
+            # Enqueue under the lock so the first frame is also the first sent
+            self.requests.put(frame)
+        try:
+            return future.result(timeout)
+        except TimeoutError:
+            # Give up on the command like a unary call past its deadline (a late result is dropped)
+            with self.lock:
+                self.pending.pop(correlation_id, None)
+            raise SessionStreamError(
+                grpc.StatusCode.DEADLINE_EXCEEDED, "Deadline Exceeded")
+
+    def read_responses(self):
+        """
+        Match results from the server to their pending commands.
+        """
+        try:
+            for response in self.stream:
+                with self.lock:
+                    future = self.pending.pop(response.correlation_id, None)
+                if future is None:
+                    continue
+                result = response.WhichOneof("result")
+                if result == "error":
+                    future.set_exception(SessionStreamError(
+                        status_code(response.error.code), response.error.description))
+                else:
+                    future.set_result(getattr(response, result))
+        except grpc.RpcError as e:
+            print(f"[ERROR] Session stream failed: {e.code()}")
+        finally:
+            self.fail_pending(SessionStreamClosed())
+
+    def fail_pending(self, error):
+        """
+        Mark the stream closed and fail every command still waiting for a result.
+        Callers then fall back to unary calls.
+
+        :param error: Exception to fail the pending commands with
+        """
+        with self.lock:
+            self.open = False
+            pending = list(self.pending.values())
+            self.pending.clear()
+        for future in pending:
+            future.set_exception(error)
+
+    def is_open(self):
+        return self.open
+
+    def close(self):
+        """
+        Close the stream.
+        """
+        with self.lock:
+            self.open = False
+        self.requests.put(None)
+        self.stream.cancel()
+
+
+def status_code(value):
+    """
+    Convert a numeric gRPC status code to a grpc.StatusCode.
+
+    :param value: Numeric status code
+    :return: grpc.StatusCode
+    """
+    for code in grpc.StatusCode:
+        if code.value[0] == value:
+            return code
+    return grpc.StatusCode.UNKNOWN
@@ -0,0 +1,55 @@
+import threading
+from collections import OrderedDict
+
+
+class UsernameCache:
+    """
+    Bounded LRU cache of account ID -> username.
+    Used to resolve message senders sent as IDs (compact_sender).
+    """
+
+    def __init__(self, capacity=1024):
+        """
+        :param capacity: Maximum number of usernames kept
+        """
+        self.capacity = capacity
+        self.names = OrderedDict()  # Account ID -> username, least recently used first
+        self.lock = threading.Lock()  # Guards names (filled from polling and UI threads)
+
+    def get(self, account_id):
+        """
+        Look up a username, marking it as recently used.
+
+        :param account_id: Account ID
+        :return: Username, or None if not cached
+        """
+        with self.lock:
+            username = self.names.get(account_id)
+            if username is not None:
+                self.names.move_to_end(account_id)
+            return username
+
+    def update(self, accounts):
+        """
+        Add usernames, evicting the least recently used beyond capacity.
+
+        :param accounts: Iterable of (account ID, username) pairs
+        """
+        with self.lock:
+            for account_id, username in accounts:
+                self.names[account_id] = username
+                self.names.move_to_end(account_id)
+            while len(self.names) > self.capacity:
+                self.names.popitem(last=False)
+
+    def missing(self, account_ids):
+        """
+        :param account_ids: Iterable of account IDs
+        :return: The IDs (without duplicates, in order) that are not cached
+        """
+        with self.lock:
+            return [account_id for account_id in dict.fromkeys(account_ids)
+                    if account_id not in self.names]
+
+    def __len__(self):
+        return len(self.names)
@@ -0,0 +1,491 @@
+import asyncio
+import threading
+import grpc
+from BytesTrackingInterceptor import AsyncBytesTrackingInterceptor
+from collections import deque
+from MessageIterator import DEFAULT_BUFFER_SIZE
+from network import (ChatClient, DEFAULT_DEADLINES, RECONNECT_BASE_S, RECONNECT_MAX_S, RECONNECT_SPREAD_S,
+                     SEND_BATCH_SIZE)
+from PollScheduler import PollScheduler
+from proto import chat_pb2, chat_pb2_grpc
+
+
+class AsyncChatClient():
+    """
+    Asyncio-native counterpart to ChatClient, implemented with grpc.aio.
+    Every operation is a coroutine, so one event loop can keep many calls in flight.
+    """
+
+    ### GENERAL FUNCTIONS ###
+
+    def __init__(self, host, port, max_msg, max_users, deadlines=None):
+        """
+        Initialize the client.
+        The channel is created lazily, since grpc.aio channels bind to the running event loop.
+
+        :param host: Server host
+        :param port: Server port
+        :param max_msg: Maximum number of messages to display
+        :param max_users: Maximum number of users to display
+        :param deadlines: Dict of RPC name -> deadline in seconds, overriding DEFAULT_DEADLINES
+            (as for ChatClient)
+        """
+        self.channel_str = f"{host}:{port}"
+        # Interceptor to track bytes sent/received
+        self.interceptor = AsyncBytesTrackingInterceptor(self)
+        self.channel = None  # grpc.aio channel (created on first use)
+        self.stub = None  # Stub bound to the channel
+
+        self.session_key = None  # Session key for authenticated requests
+        self.deadlines = dict(DEFAULT_DEADLINES, **(deadlines or {}))  # RPC name -> seconds
+        self.running = False  # Flag to control polling task
+        self.poll_task = None  # Task to poll for messages
+        self.poll_scheduler = None  # Adaptive delay between polls
+        self.reconnect_scheduler = PollScheduler(
+            base_interval=RECONNECT_BASE_S, max_interval=RECONNECT_MAX_S, jitter=0.5)  # Backoff after failed polls
+
+        self.max_msg = max_msg  # Maximum number of messages to display
+        self.max_users = max_users  # Maximum number of users to display
+
+        self.last_offset_account_id = 0  # Offset ID for pagination of accounts
+        self.username = None  # Username of the client
+        self.bcrypt_prefix = None  # Bcrypt prefix for password hashing
+        self.inbox_version = 0  # Last inbox version from the server (0 if none)
+        self.on_messages_updated = None  # Callback function to update messages
+
+        self.bytes_sent = 0  # Number of bytes sent
+        self.bytes_received = 0  # Number of bytes received
+
+        print("[INITIALIZED] Async client initialized")
+
+    def get_stub(self):
+        """
+        Get the stub, creating the channel on the running event loop if needed.
+
+        :return: Stub for the chat service
+        """
+        if self.stub is None:
+            self.channel = grpc.aio.insecure_channel(
+                self.channel_str, interceptors=[self.interceptor])
+            self.stub = chat_pb2_grpc.ChatServiceStub(self.channel)
+        return self.stub
+
+    async def close(self):
+        """
+        Stop polling and close the channel.
+        """
+        await self.stop_polling_messages()
+        if self.channel is not None:
+            await self.channel.close()
+            self.channel = None
+            self.stub = None
+
+    def set_message_update_callback(self, callback):
+        """
+        Set a callback function to update messages.
+
+        :param callback: Callback function (plain function or coroutine function)
+        """
+        self.on_messages_updated = callback
+
+    def start_polling_messages(self, poll_interval=5):
+        """
+        Start a task on the running event loop to poll for messages.
+
+        :param poll_interval: Base polling interval (see PollScheduler)
+        """
+        if not self.running:
+            self.running = True
+            self.poll_scheduler = PollScheduler(base_interval=poll_interval)
+            self.poll_task = asyncio.get_running_loop().create_task(
+                self.poll_messages(poll_interval))
+
+    async def poll_messages(self, poll_interval):
+        """
+        Poll for messages from the server, with the same adaptive delays as ChatClient.
+        Failed polls do not end the task; it waits for the channel to reconnect instead.
+
+        :param poll_interval: Base polling interval
+        """
+        scheduler = self.poll_scheduler or PollScheduler(
+            base_interval=poll_interval)
+        while self.running:
+            try:
+                messages = await self.request_messages()
+            except grpc.RpcError as e:
+                # Keep the task alive: wait for the server to come back, then poll again
+                self.log_error(f"Poll failed ({e.code()}), retrying")
+                await self.wait_to_reconnect()
+                continue
+            except Exception as e:
+                # A failing callback does not end the task either: back off and poll again
+                self.log_error(f"Message callback failed ({e}), retrying")
+                await self.wait_to_reconnect()
+                continue
+            self.reconnect_scheduler.reset()
+
+            # Sleep for the adaptive delay without blocking the loop
+            num_received = len(messages) if messages is not None else None
+            await asyncio.sleep(scheduler.next_delay(num_received, self.max_msg))
+
+    async def wait_to_reconnect(self):
+        """
+        Wait before polling again after a failed poll, like ChatClient.wait_to_reconnect:
+        with jittered exponential backoff while the channel is down, returning early
+        (after a small random spread) once it is READY again.
+        """
+        delay = self.reconnect_scheduler.next_delay(0, self.max_msg)
+        channel = self.channel
+        if channel is None or channel.get_state() == grpc.ChannelConnectivity.READY:
+            # The connection is fine, so the call itself failed: just back off
+            await asyncio.sleep(delay)
+            return
+
+        async def wait_until_ready():
+            state = channel.get_state(try_to_connect=True)
+            while state != grpc.ChannelConnectivity.READY:
+                await channel.wait_for_state_change(state)
+                state = channel.get_state(try_to_connect=True)
+
+        try:
+            await asyncio.wait_for(wait_until_ready(), delay)
+        except asyncio.TimeoutError:
+            return  # Try a poll anyway
+        self.reconnect_scheduler.reset()
+        await asyncio.sleep(self.reconnect_scheduler.random.uniform(0, RECONNECT_SPREAD_S))
+
+    async def stop_polling_messages(self):
+        """
+        Stop the polling task.
+        """
+        self.running = False
+        if self.poll_task:
+            self.poll_task.cancel()
+            try:
+                await self.poll_task
+            except asyncio.CancelledError:
+                pass
+            self.poll_task = None
+        print("[STOPPED] Polling messages")
+
+    # MAIN OPERATIONS
+    # (1) LOOKUP
+    async def account_lookup(self, username):
+        """
+        Lookup an account by username.
+
+        :param username: Username
+        :return: True if the account exists, False otherwise
+        """
+        request = chat_pb2.AccountLookupRequest(username=username)
+        response = await self.get_stub().AccountLookup(request, timeout=self.deadlines["AccountLookup"])
+        print(
+            f"[LOOKUP] Exists: {response.exists}, Prefix: {response.bcrypt_prefix}")
+        if response.exists:
+            self.bcrypt_prefix = response.bcrypt_prefix
+        return response.exists
+
+    # (2) LOGIN
+    async def login(self, username, password):
+        """
+        Login to the server.
+
+        :param username: Username
+        :param password: Password
+        :return: True + number of unread messages if login is successful, False otherwise
+        """
+        # bcrypt is CPU-bound, so hash off the event loop
+        hashed_password = await asyncio.get_running_loop().run_in_executor(
+            None, self.get_hashed_password_for_login, password)
+        request = chat_pb2.LoginCreateRequest(
+            username=username, password_hash=hashed_password)
+        response = await self.get_stub().Login(request, timeout=self.deadlines["Login"])
+
+        if response.success:  # If login is successful, store the session key and username
+            print(
+                f"[LOGIN] Session key: {response.session_key}, Unread messages: {response.unread_messages}")
+            self.session_key = response.session_key
+            self.username = username
+            self.inbox_version = 0
+            self.start_polling_messages()
+            return response.success, response.unread_messages
+        # Else, log the error and return False
+        return self.log_error("Login failed", False)
+
+    # (3) CREATE ACCOUNT
+    async def create_account(self, username, password):
+        """
+        Create an account on the server.
+
+        :param username: Username
+        :param password: Password
+        :return: True if account creation is successful, False otherwise
+        """
+        hashed_password = await asyncio.get_running_loop().run_in_executor(
+            None, self.generate_hashed_password_for_create, password)
+        request = chat_pb2.LoginCreateRequest(
+            username=username, password_hash=hashed_password)
+        response = await self.get_stub().CreateAccount(request, timeout=self.deadlines["CreateAccount"])
+        if response.success:
+            print(
+                f"[CREATE ACCOUNT] Success: {response.success}, Session key: {response.session_key}")
+            self.session_key = response.session_key
+            self.username = username
+            self.inbox_version = 0
+            self.start_polling_messages()
+        else:
+            self.log_error("Account creation failed")
+        return response.success
+
+    # (4) LIST ACCOUNTS
+    async def list_accounts(self, filter_text=""):
+        """
+        List accounts on the server.
+
+        :param filter_text: Filter text
+        :return: List of accounts
+        """
+        if not self.session_key:
+            return self.log_error("No session key available")
+
+        request = chat_pb2.ListAccountsRequest(
+            session_key=self.session_key, maximum_number=self.max_users, offset_account_id=self.last_offset_account_id, filter_text=filter_text)
+        response = await self.get_stub().ListAccounts(request, timeout=self.deadlines["ListAccounts"])
+        accounts = [(account.id, account.username)
+                    for account in response.accounts]
+        print(f"[LIST ACCOUNTS] Accounts: {accounts}")
+        return accounts
+
+    # (5) SEND MESSAGE
+    async def send_message(self, recipient, message):
+        """
+        Send a message to a recipient.
+
+        :param recipient: Recipient
+        :param message: Message
+        :return: True if message is sent successfully, False otherwise
+        """
+        if not self.session_key:
+            return self.log_error("No session key available")
+
+        request = chat_pb2.SendMessageRequest(
+            session_key=self.session_key, recipient=recipient, message=message)
+        response = await self.get_stub().SendMessage(request, timeout=self.deadlines["SendMessage"])
+        print(f"[MESSAGE SENT] ID: {response.id}")
+        return True
+
+    async def send_many(self, messages, batch_size=SEND_BATCH_SIZE):
+        """
+        Send many messages with few round trips, using batched SendMessages calls.
+
+        :param messages: List of (recipient, message) pairs
+        :param batch_size: Maximum number of messages per call
+        :return: List with the message ID of each sent message (None for failed ones), in order
+        """
+        if not self.session_key:
+            return self.log_error("No session key available")
+
+        ids = []
+        for start in range(0, len(messages), batch_size):
+            request = chat_pb2.SendMessagesRequest(session_key=self.session_key, messages=[
+                chat_pb2.OutgoingMessage(recipient=recipient, message=message)
+                for recipient, message in messages[start:start + batch_size]])
+            response = await self.get_stub().SendMessages(request, timeout=self.deadlines["SendMessages"])
+            ids += [result.id if result.WhichOneof("result") == "id" else None
+                    for result in response.results]
+        print(f"[MESSAGES SENT] {sum(id is not None for id in ids)}/{len(ids)}")
+        return ids
+
+    # (6) REQUEST MESSAGES
+    async def request_messages(self, wait_ms=0):
+        """
+        Request messages from the server.
+
+        :param wait_ms: If nonzero and there are no unread messages, how long the server
+            should wait for one before answering (long poll)
+        :return: List of messages
+        """
+        if not self.session_key:
+            return self.log_error("No session key available")
+
+        messages = await self.fetch_messages(self.max_msg, wait_ms)
+        if len(messages) > 0:
+            print(f"[RECEIVED MESSAGES] Messages: {messages}")
+            # send callback (awaiting it if it is a coroutine function)
+            if self.on_messages_updated:
+                result = self.on_messages_updated(messages)
+                if asyncio.iscoroutine(result):
+                    await result
+        return messages
+
+    async def fetch_messages(self, maximum_number, wait_ms=0):
+        """
+        Fetch messages from the server (without passing them to the callback).
+
+        :param maximum_number: Maximum number of messages
+        :param wait_ms: If nonzero and there are no unread messages, how long the server
+            should wait for one before answering (long poll)
+        :return: List of messages
+        """
+        request = chat_pb2.RequestMessagesRequest(
+            session_key=self.session_key, maximum_number=maximum_number, wait_ms=wait_ms, inbox_version=self.inbox_version)
+        response = await self.get_stub().RequestMessages(request, timeout=self.poll_timeout(wait_ms))
+        if response.unchanged:  # Nothing new since the last inbox version
+            return []
+        self.inbox_version = response.inbox_version
+        return [(message.id, message.sender,
+                 message.message) for message in response.messages]
+
+    async def iter_messages(self, buffer_size=DEFAULT_BUFFER_SIZE, follow=True, wait_ms=20000):
+        """
+        Async generator yielding received messages one at a time as they arrive, with the
+        same bounded buffering as ChatClient.iter_messages: the next fetch (for at most
+        the room left) is only started once the consumer has emptied the buffer to half,
+        and runs while the consumer works through the rest.
+
+        The polling task is stopped first, since it would take messages from the same inbox.
+        Messages fetched but not yet yielded when the generator is closed are dropped.
+
+        :param buffer_size: Maximum number of messages fetched but not yet consumed
+        :param follow: Keep waiting for new messages once the inbox is empty (otherwise stop there)
+        :param wait_ms: How long the server may hold an empty fetch while following
+        """
+        if not self.session_key:
+            self.log_error("No session key available")
+            return
+        if self.running:
+            await self.stop_polling_messages()
+        buffer_size = max(1, buffer_size)
+        fetch_wait_ms = wait_ms if follow else 0
+        scheduler = PollScheduler(base_interval=1)  # Delays between empty fetches if the server does not hold them
+
+        async def fetch(room, delay):
+            await asyncio.sleep(delay)
+            started = asyncio.get_running_loop().time()
+            messages = await self.fetch_messages(room, fetch_wait_ms)
+            return messages, (asyncio.get_running_loop().time() - started) * 1000
+
+        buffer = deque()  # Messages fetched but not yet yielded
+        pending = None  # Fetch in progress
+        delay = 0  # Before the next fetch
+        drained = False  # The inbox was empty and follow is off
+        try:
+            while True:
+                if pending is None and not drained and len(buffer) <= buffer_size // 2:
+                    pending = asyncio.ensure_future(fetch(buffer_size - len(buffer), delay))
+                if not buffer:
+                    if pending is None:
+                        return
+                    await asyncio.wait([pending])
+                if pending is not None and pending.done():
+                    messages, elapsed_ms = pending.result()
+                    pending = None
+                    buffer.extend(messages)
+                    delay = 0
+                    if not messages and not follow:
+                        drained = True
+                    elif not messages and elapsed_ms < fetch_wait_ms / 2:
+                        # The server answered right away rather than holding the fetch, so back off
+                        delay = scheduler.next_delay(0, buffer_size)
+                    continue
+                yield buffer.popleft()
+        finally:
+            if pending is not None:
+                pending.cancel()
+
+    # (7) DELETE MESSAGES
+    async def delete_message(self, message_ids):
+        """
+        Delete messages from the server.
+
+        :param message_ids: List of message IDs
+        :return: True if messages are deleted successfully, False otherwise
+        """
+        if not self.session_key:
+            return self.log_error("No session key available")
+
+        request = chat_pb2.DeleteMessagesRequest(
+            session_key=self.session_key, id=message_ids)
+        await self.get_stub().DeleteMessages(request, timeout=self.deadlines["DeleteMessages"])
+        print(f"[DELETED MESSAGES] IDs: {message_ids}")
+        return True
+
+    # (8) DELETE ACCOUNT
+    async def delete_account(self):
+        """
+        Delete the account from the server.
+
+        :return: True if account is deleted successfully, False otherwise
+        """
+        if not self.session_key:
+            return self.log_error("No session key available")
+
+        request = chat_pb2.DeleteAccountRequest(
+            session_key=self.session_key)
+        await self.get_stub().DeleteAccount(request, timeout=self.deadlines["DeleteAccount"])
+        print(f"[DELETED ACCOUNT] Session key: {self.session_key}")
+        self.session_key = None
+        return True
+
+    ### SHARED HELPERS ###
+    # Error handling, poll deadlines and password hashing are identical to the blocking client
+    log_error = ChatClient.log_error
+    poll_timeout = ChatClient.poll_timeout
+    get_hashed_password_for_login = ChatClient.get_hashed_password_for_login
+    generate_hashed_password_for_create = ChatClient.generate_hashed_password_for_create
+
+
+class TkAsyncAdapter():
+    """
+    Lets a Tkinter UI drive an AsyncChatClient.
+    A single event loop runs in one background thread; results are handed back
+    to the Tk main loop with root.after, so no thread is spawned per call.
+    """
+
+    def __init__(self, root):
+        """
+        Start the event loop thread.
+
+        :param root: The Tkinter root window
+        """
+        self.root = root
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(
+            target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+
+    def submit(self, coro, callback=None):
+        """
+        Schedule a coroutine on the event loop.
+
+        :param coro: Coroutine to run (e.g., client.send_message(...))
+        :param callback: Optional function called on the Tk thread with the result
+        :return: concurrent.futures.Future for the result
+        """
+        future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+        if callback:
+            future.add_done_callback(
+                lambda f: self.root.after(0, lambda: callback(self.result_or_none(f))))
+        return future
+
+    def result_or_none(self, future):
+        """
+        Get the result of a finished future, logging and returning None on error.
+
+        :param future: Finished future
+        :return: Result of the future, or None if it raised
+        """
+        try:
+            return future.result()
+        except Exception as e:
+            print(f"[ERROR] Async call failed: {e}")
+            return None
+
+    def stop(self, timeout=1):
+        """
+        Stop the event loop thread.
+
+        :param timeout: Seconds to wait for the thread to exit
+        """
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(timeout=timeout)
@@ -14,10 +14,17 @@ def main():
 
     # Set up a ChatClient instance and connect to the server
     print(
-        f"Configuration: \nhost={host}, \nport={port}, \nmax_msg={max_msg}, \nmax_users={max_users}")
+        f"Configuration: \nservers={', '.join(client_config['endpoints'])}, \nmax_msg={max_msg}, \nmax_users={max_users}")
 
-    # Create a client
-    client = ChatClient(host, port, max_msg, max_users)
+    # Create a client (messages are pushed over a stream, with polling as fallback)
+    client = ChatClient(host, port, max_msg, max_users, use_subscription=True,
+                        metrics_file=client_config["metrics_file"], deadlines=client_config["deadlines"],
+                        hedge_requests=client_config["hedge_requests"], compression=client_config["compression"],
+                        compression_threshold=client_config["compression_threshold"],
+                        prefix_cache_file=client_config["prefix_cache_file"],
+                        session_file=client_config["session_file"], endpoints=client_config["endpoints"],
+                        rpc_concurrency=client_config["rpc_concurrency"], rpc_rate=client_config["rpc_rate"],
+                        rpc_burst=client_config["rpc_burst"])
 
     # Start the user interface, passing in existing client
     root = tk.Tk()
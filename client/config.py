@@ -1,4 +1,6 @@
 import json
+import os
+from RpcScheduler import DEFAULT_BURST, DEFAULT_RATE
 
 CONFIG_FILE = '../config.json'
 
@@ -8,14 +10,42 @@ def get_config(config_file=CONFIG_FILE):
     Load the configuration from the config file.
 
     Returns:
-        dict: The configuration values (host, port, max_msg)
+        dict: The configuration values (host, port, endpoints, max_msg, max_users, metrics_file, deadlines,
+            hedge_requests, compression, compression_threshold, prefix_cache_file, session_file, rpc_concurrency,
+            rpc_rate, rpc_burst)
     """
     with open(config_file, "r") as f:
         config = json.load(f)
 
-    host = config["SERVER_HOST"]
-    port = config["SERVER_PORT"]
+    # Optional list of servers ("host:port" or {"host", "port"}); SERVER_HOST and SERVER_PORT otherwise
+    endpoints = [endpoint if isinstance(endpoint, str) else f"{endpoint['host']}:{endpoint['port']}"
+                 for endpoint in config.get("SERVERS", [])]
+    if endpoints:
+        host, port = endpoints[0].rsplit(":", 1)
+        port = int(port)
+    else:
+        host = config["SERVER_HOST"]
+        port = config["SERVER_PORT"]
+        endpoints = [f"{host}:{port}"]
     max_msg = config["MAX_MSG_TO_DISPLAY"]
     max_users = config["MAX_USERS_TO_DISPLAY"]
+    metrics_file = config.get("METRICS_FILE")  # Optional Prometheus text file
+    deadlines = config.get("DEADLINES", {})  # Optional RPC name -> seconds
+    hedge_requests = config.get("HEDGE_REQUESTS", False)
+    compression = config.get("COMPRESSION", "gzip")  # "gzip", "deflate" or "none"
+    compression_threshold = config.get("COMPRESSION_THRESHOLD", 1024)  # Bytes
+    prefix_cache_file = config.get("PREFIX_CACHE_FILE")  # Caches bcrypt prefixes; off unless set
+    if prefix_cache_file:
+        prefix_cache_file = os.path.expanduser(prefix_cache_file)
+    session_file = config.get("SESSION_FILE")  # Saves the session to resume it; off unless set
+    if session_file:
+        session_file = os.path.expanduser(session_file)
+    rpc_concurrency = config.get("RPC_CONCURRENCY", {})  # Optional priority class -> calls in flight
+    rpc_rate = config.get("RPC_RATE", DEFAULT_RATE)  # Calls per second; None disables the rate limit
+    rpc_burst = config.get("RPC_BURST", DEFAULT_BURST)
 
-    return {"host": host, "port": port, "max_msg": max_msg, "max_users": max_users}
+    return {"host": host, "port": port, "endpoints": endpoints, "max_msg": max_msg, "max_users": max_users, "metrics_file": metrics_file,
+            "deadlines": deadlines, "hedge_requests": hedge_requests, "compression": compression,
+            "compression_threshold": compression_threshold, "prefix_cache_file": prefix_cache_file,
+            "session_file": session_file, "rpc_concurrency": rpc_concurrency, "rpc_rate": rpc_rate,
+            "rpc_burst": rpc_burst}
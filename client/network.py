@@ -1,10 +1,84 @@
+import json
 import time
+from BulkAccounts import DEFAULT_MAX_IN_FLIGHT, BulkAccounts
 from BytesTrackingInterceptor import BytesTrackingInterceptor
+from CompressionInterceptor import COMPRESSION_ALGORITHMS, DEFAULT_COMPRESSION_THRESHOLD, CompressionInterceptor
+from EndpointSelector import rank_endpoints
+from LatencyInterceptor import LatencyInterceptor, RpcMetrics
+from MessageIterator import DEFAULT_BUFFER_SIZE, MessageIterator
+from Outbox import Outbox
+from PollScheduler import PollScheduler
+from PrefixCache import PrefixCache
+from RpcScheduler import BACKGROUND, DEFAULT_BURST, DEFAULT_RATE, INTERACTIVE, RpcScheduler
+from SessionMetadataInterceptor import SessionMetadataInterceptor
+from SessionStore import SessionStore
+from SessionStream import SessionStream, SessionStreamClosed
+from UsernameCache import UsernameCache
 import grpc
 import threading
 import bcrypt
+from concurrent.futures import ThreadPoolExecutor
 from proto import chat_pb2, chat_pb2_grpc
 
+# Extra time allowed beyond a long poll's wait before the call times out
+LONG_POLL_GRACE_S = 5
+# Default deadline (seconds) per RPC; override any of them with DEADLINES in config.json
+DEFAULT_DEADLINES = {
+    "AccountLookup": 5,
+    "Login": 10,  # Allows for bcrypt on the server
+    "CreateAccount": 10,
+    "ResumeSession": 5,
+    "ListAccounts": 5,
+    "ListMessages": 5,
+    "LookupUsernames": 5,
+    "SendMessage": 5,
+    "SendMessages": 30,  # Per batch of up to SEND_BATCH_SIZE messages
+    "RequestMessages": 5,  # Long polls get their wait plus LONG_POLL_GRACE_S instead
+    "AckMessages": 5,
+    "DeleteMessages": 5,
+    "DeleteAccount": 5,
+    "UploadAttachment": 600,  # Per attachment, however many chunks it takes
+    "DownloadAttachment": 600,
+}
+# Read-only RPCs, which are safe to retry and hedge. SendMessage and RequestMessages
+# change server state (a retried RequestMessages would lose the first batch), so they
+# are never retried beyond gRPC's transparent retries of calls that never left the client.
+IDEMPOTENT_METHODS = ("AccountLookup", "ListAccounts", "ListMessages", "LookupUsernames")
+# Retry policy for the idempotent RPCs (gRPC service config)
+SERVICE_CONFIG = {
+    "methodConfig": [{
+        "name": [{"service": "edu.harvard.ChatService", "method": method}
+                 for method in IDEMPOTENT_METHODS],
+        "retryPolicy": {
+            "maxAttempts": 3,
+            "initialBackoff": "0.1s",
+            "maxBackoff": "1s",
+            "backoffMultiplier": 2,
+            "retryableStatusCodes": ["UNAVAILABLE"],
+        },
+    }],
+}
+# RPCs made in the background (message polls and acks); all others are interactive and go first
+BACKGROUND_METHODS = ("RequestMessages", "AckMessages")
+# Maximum number of messages sent in one SendMessages call
+SEND_BATCH_SIZE = 500
+# Bytes per chunk of an attachment upload (matches the server's download chunks)
+ATTACHMENT_CHUNK_SIZE = 64 * 1024
+# Backoff (seconds) between polls after an error, while the channel is not READY
+RECONNECT_BASE_S = 1
+RECONNECT_MAX_S = 30
+# Once the channel is READY again, resume polling after a random delay up to this
+# (seconds), so clients reconnecting together do not poll in lockstep
+RECONNECT_SPREAD_S = 1
+# Hedged calls send a second attempt after the method's p95 latency...
+HEDGE_PERCENTILE = 95
+# ...once this many successful calls have been seen (before that, HEDGE_DEFAULT_DELAY_S)
+HEDGE_MIN_SAMPLES = 20
+HEDGE_DEFAULT_DELAY_S = 0.5
+HEDGE_MIN_DELAY_S = 0.01
+# Switch to the next endpoint once the channel has been failing this long (seconds)
+FAILOVER_AFTER_S = 10
+
 
 class ChatClient():
     """
@@ -14,7 +88,12 @@ class ChatClient():
 
     ### GENERAL FUNCTIONS ###
 
-    def __init__(self, host, port, max_msg, max_users):
+    def __init__(self, host, port, max_msg, max_users, use_subscription=False, long_poll_ms=20000, use_session_stream=False,
+                 count_wire_bytes=False, metrics_file=None, metrics_interval=15, deadlines=None, hedge_requests=False,
+                 use_outbox=False, outbox_window_ms=10, outbox_size=1000, compact_sender=False, username_cache_size=1024,
+                 session_metadata=True, compression="gzip", compression_threshold=DEFAULT_COMPRESSION_THRESHOLD,
+                 prefix_cache_file=None, session_file=None, endpoints=None, failover_after=FAILOVER_AFTER_S,
+                 rpc_concurrency=None, rpc_rate=DEFAULT_RATE, rpc_burst=DEFAULT_BURST, manual_ack=True):
         """
         Initialize the client.
 
@@ -22,20 +101,95 @@ class ChatClient():
         :param port: Server port
         :param max_msg: Maximum number of messages to display
         :param max_users: Maximum number of users to display
+        :param use_subscription: Receive messages over a server stream instead of polling
+        :param long_poll_ms: How long the server may hold an empty poll open (0 to disable)
+        :param use_session_stream: Send commands over one multiplexed Session stream
+        :param count_wire_bytes: Count framing and metadata in bytes_sent/bytes_received
+        :param metrics_file: If set, periodically write RPC latency metrics (Prometheus text) here
+        :param metrics_interval: Seconds between writes of metrics_file
+        :param deadlines: Dict of RPC name -> deadline in seconds, overriding DEFAULT_DEADLINES
+        :param hedge_requests: Hedge idempotent calls with a second attempt after their p95 latency
+        :param use_outbox: Queue sent messages and send them in coalesced batches (send_message returns a future)
+        :param outbox_window_ms: How long the outbox waits for more messages before sending a batch
+        :param outbox_size: Maximum number of unsent messages before send_message blocks
+        :param compact_sender: Receive message senders as account IDs, resolved through the username cache
+        :param username_cache_size: Maximum number of usernames cached by account ID
+        :param session_metadata: Send the session once per call as binary metadata instead of in every request
+        :param compression: Algorithm for large requests ("gzip", "deflate" or "none")
+        :param compression_threshold: Minimum serialized request size (bytes) to compress
+        :param prefix_cache_file: If set, cache bcrypt prefixes in this file to log in without an AccountLookup
+        :param session_file: If set, save the session in this file so resume_session can skip logging in
+        :param endpoints: Servers ("host:port") to choose from instead of host and port; they are probed
+            and the fastest healthy one is used
+        :param failover_after: Seconds the channel may stay failing before switching to another endpoint
+        :param rpc_concurrency: Dict of priority class ("interactive", "background") -> maximum calls in flight
+        :param rpc_rate: Calls per second allowed on average (None for no rate limit)
+        :param rpc_burst: Calls allowed at once after an idle period
+        :param manual_ack: Acknowledge received messages once on_messages_updated returns, so messages
+            lost before being handled (e.g., in a crash) are delivered again; otherwise the server marks
+            messages read as soon as it sends them
         """
-        channel_str = f"{host}:{port}"
-        base_channel = grpc.insecure_channel(
-            channel_str)  # Create a base channel
-        # Interceptor to track bytes sent/received
-        self.interceptor = BytesTrackingInterceptor(self)
-        # Create a channel with the interceptor
-        self.channel = grpc.intercept_channel(base_channel, self.interceptor)
-        self.stub = chat_pb2_grpc.ChatServiceStub(
-            self.channel)  # Create a stub with the channel and interceptor
+        self.server = None  # Address ("host:port") of the server in use, keying the prefix cache and saved sessions
+        # Interceptor to track bytes sent/received (per method, for all call types)
+        self.interceptor = BytesTrackingInterceptor(self, wire_bytes=count_wire_bytes)
+        # Latency histograms per method and status code
+        self.metrics = RpcMetrics()
+        self.latency_interceptor = LatencyInterceptor(self.metrics)
+        # Attaches the session to every call as metadata (if enabled)
+        self.session_metadata = session_metadata
+        interceptors = [self.latency_interceptor]
+        # Compresses requests of at least compression_threshold bytes
+        self.compression_interceptor = CompressionInterceptor(
+            COMPRESSION_ALGORITHMS[compression], compression_threshold)
+        interceptors.append(self.compression_interceptor)
+        if session_metadata:
+            interceptors.append(SessionMetadataInterceptor(self))
+        # Applied to every channel (latency outermost, so it times the whole call, and
+        # byte tracking innermost, so it counts the metadata the others attach)
+        self.interceptors = interceptors + [self.interceptor]
+        # Watch connectivity, so polling can wait for the channel to come back after errors
+        self.connectivity = None  # Last grpc.ChannelConnectivity reported
+        self.connectivity_changed = threading.Condition()  # Notified on changes and on stop
+        self.on_connection_state = None  # Callback for connection state changes
+        self.reconnect_scheduler = PollScheduler(
+            base_interval=RECONNECT_BASE_S, max_interval=RECONNECT_MAX_S, jitter=0.5)
+        self.base_channel = None  # Channel to the current server, without interceptors
+        self.channel = None  # base_channel with the interceptors
+        self.stub = None
+        # Servers to choose from, fastest first (a single server is not probed)
+        self.endpoints = list(endpoints) if endpoints else [f"{host}:{port}"]
+        if len(self.endpoints) > 1:
+            self.endpoints = [target for target, _ in rank_endpoints(self.endpoints)]
+        self.failover_after = failover_after  # Seconds of failure before switching servers
+        self.failover_timer = None  # Pending failover check, while the channel is failing
+        self.failover_lock = threading.Lock()  # Serializes switching servers
+        self.connect(self.endpoints[0])
 
         self.session_key = None  # Session key for authenticated requests
+        self.session_store = SessionStore(session_file) if session_file else None  # Saved sessions, if enabled
         self.running = False  # Flag to control polling thread
         self.thread = None  # Thread to poll for messages
+        self.stop_event = threading.Event()  # Wakes the polling thread on stop
+        self.poll_scheduler = None  # Adaptive delay between polls
+        self.use_subscription = use_subscription  # Prefer streaming over polling
+        self.subscription = None  # Open SubscribeMessages call, if any
+        self.long_poll_ms = long_poll_ms  # Server-side wait for empty polls
+        self.pending_poll = None  # In-flight long poll, so it can be cancelled
+        self.long_poll_supported = None  # Whether the server has held a long poll
+        self.use_session_stream = use_session_stream  # Prefer the Session stream
+        self.session_stream = None  # Open Session stream, if any
+        self.deadlines = dict(DEFAULT_DEADLINES, **(deadlines or {}))  # RPC name -> seconds
+        # Orders calls by priority under concurrency caps and a rate limit
+        self.scheduler = RpcScheduler(concurrency=rpc_concurrency, rate=rpc_rate, burst=rpc_burst)
+        # Runs the UI's calls in the background, at most one thread per interactive slot
+        self.executor = ThreadPoolExecutor(
+            max_workers=self.scheduler.limits[INTERACTIVE], thread_name_prefix="chat-client")
+        self.hedge_requests = hedge_requests  # Hedge idempotent calls
+        self.outbox = Outbox(self, flush_window=outbox_window_ms / 1000, max_batch=SEND_BATCH_SIZE,
+                             max_queued=outbox_size) if use_outbox else None  # Queued sends, if enabled
+        self.compact_sender = compact_sender  # Receive senders as IDs
+        self.manual_ack = manual_ack  # Acknowledge messages after handling them
+        self.usernames = UsernameCache(username_cache_size)  # Account ID -> username
 
         self.max_msg = max_msg  # Maximum number of messages to display
         self.max_users = max_users  # Maximum number of users to display
@@ -43,11 +197,17 @@ class ChatClient():
         self.last_offset_account_id = 0  # Offset ID for pagination of accounts
         self.username = None  # Username of the client
         self.bcrypt_prefix = None  # Bcrypt prefix for password hashing
+        self.prefix_cache = PrefixCache(prefix_cache_file) if prefix_cache_file else None  # Cached prefixes, if enabled
+        self.prefix_from_cache = False  # Whether bcrypt_prefix came from the cache (and may be stale)
+        self.inbox_version = 0  # Last inbox version from the server (0 if none)
         self.on_messages_updated = None  # Callback function to update messages
 
         self.bytes_sent = 0  # Number of bytes sent
         self.bytes_received = 0  # Number of bytes received
 
+        if metrics_file:
+            self.metrics.start_export(metrics_file, metrics_interval)
+
         print("[INITIALIZED] Client initialized")
 
     def set_message_update_callback(self, callback):
@@ -58,14 +218,155 @@ class ChatClient():
         """
         self.on_messages_updated = callback
 
+    def set_connection_state_callback(self, callback):
+        """
+        Set a callback function for connection state changes.
+        It is called from a gRPC thread with the state name ("IDLE", "CONNECTING",
+        "READY", "TRANSIENT_FAILURE" or "SHUTDOWN").
+
+        :param callback: Callback function
+        """
+        self.on_connection_state = callback
+        if self.connectivity is not None:
+            callback(self.connectivity.name)
+
+    def connect(self, target):
+        """
+        Open a channel to a server and use it for all further calls, closing the previous one.
+
+        :param target: Server address ("host:port")
+        """
+        base_channel = grpc.insecure_channel(
+            target, options=[("grpc.service_config", json.dumps(SERVICE_CONFIG))])  # Create a base channel (with the retry policy)
+        channel = grpc.intercept_channel(base_channel, *self.interceptors)
+        previous = self.base_channel
+        self.interceptor.target = target
+        self.server = target
+        self.base_channel = base_channel
+        self.channel = channel
+        self.stub = chat_pb2_grpc.ChatServiceStub(
+            self.channel)  # Create a stub with the channel and interceptors
+        print(f"[CONNECTED] Using server {target}")
+        base_channel.subscribe(
+            lambda connectivity: self.handle_connectivity(connectivity, base_channel), try_to_connect=True)
+        if previous is not None:
+            previous.close()
+
+    def handle_connectivity(self, connectivity, base_channel=None):
+        """
+        Record a channel connectivity change, wake a poll loop waiting to reconnect,
+        and pass the new state to the callback.
+        Changes of a channel that has since been replaced are ignored.
+
+        :param connectivity: grpc.ChannelConnectivity
+        :param base_channel: The channel that changed (default: the current one)
+        """
+        if base_channel is not None and base_channel is not self.base_channel:
+            return
+        if connectivity == grpc.ChannelConnectivity.READY:
+            self.cancel_failover()
+        elif connectivity == grpc.ChannelConnectivity.TRANSIENT_FAILURE:
+            self.schedule_failover(self.base_channel)
+        with self.connectivity_changed:
+            self.connectivity = connectivity
+            self.connectivity_changed.notify_all()
+        print(f"[CONNECTION] {connectivity.name}")
+        if self.on_connection_state:
+            self.on_connection_state(connectivity.name)
+
+    def schedule_failover(self, base_channel):
+        """
+        Check after failover_after seconds whether the channel is still failing, unless
+        a check is already pending or there is no other endpoint.
+
+        :param base_channel: The failing channel
+        """
+        if len(self.endpoints) < 2:
+            return
+        with self.failover_lock:
+            if self.failover_timer is None:
+                self.failover_timer = threading.Timer(self.failover_after, self.fail_over, args=(base_channel,))
+                self.failover_timer.daemon = True
+                self.failover_timer.start()
+
+    def cancel_failover(self):
+        """
+        Cancel the pending failover check, if any (the channel has recovered).
+        """
+        with self.failover_lock:
+            if self.failover_timer is not None:
+                self.failover_timer.cancel()
+                self.failover_timer = None
+
+    def fail_over(self, base_channel):
+        """
+        Switch to the fastest reachable other endpoint if the channel has not recovered.
+        If none is reachable, stay and check again later.
+
+        The server's session carries over only if the endpoints share their accounts;
+        otherwise calls fail as unauthenticated until the user logs in again.
+
+        :param base_channel: The channel that was failing
+        """
+        with self.failover_lock:
+            self.failover_timer = None
+            if base_channel is not self.base_channel or self.connectivity == grpc.ChannelConnectivity.READY:
+                return
+            failed = self.server
+            ranked = rank_endpoints([target for target in self.endpoints if target != failed])
+            healthy = [target for target, rtt in ranked if rtt is not None]
+            if healthy:
+                # The failed endpoint becomes the last resort
+                self.endpoints = [target for target, _ in ranked] + [failed]
+                self.connect(healthy[0])
+        if not healthy:
+            self.log_error(f"No other server is reachable, staying on {failed}")
+            self.schedule_failover(base_channel)
+            return
+        print(f"[FAILOVER] Switched from {failed} to {self.server}")
+        # Move the open streams to the new channel (the message stream falls back to polling)
+        if self.session_stream:
+            self.open_session_stream()
+        if self.subscription:
+            self.subscription.cancel()
+        self.cancel_pending_poll()
+
+    def wait_to_reconnect(self, stop_event):
+        """
+        Wait before polling again after a failed poll.
+        While the channel is down, wait with jittered exponential backoff, returning
+        early (after a small random spread) once the channel is READY again.
+
+        :param stop_event: Event that ends the wait early when polling is stopped
+        """
+        delay = self.reconnect_scheduler.next_delay(0, self.max_msg)
+        if self.connectivity == grpc.ChannelConnectivity.READY:
+            # The connection is fine, so the call itself failed: just back off
+            stop_event.wait(delay)
+            return
+
+        deadline = time.monotonic() + delay
+        with self.connectivity_changed:
+            while not stop_event.is_set() and self.connectivity != grpc.ChannelConnectivity.READY:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return  # Try a poll anyway (which also prompts the channel to reconnect)
+                self.connectivity_changed.wait(remaining)
+        if not stop_event.is_set():
+            self.reconnect_scheduler.reset()
+            stop_event.wait(self.reconnect_scheduler.random.uniform(
+                0, RECONNECT_SPREAD_S))
+
     def start_polling_messages(self, poll_interval=5):
         """
         Start a thread to listen for messages from the server.
 
-        :param poll_interval: Polling interval
+        :param poll_interval: Base polling interval (see PollScheduler)
         """
         if not self.running:
             self.running = True
+            self.stop_event = threading.Event()
+            self.poll_scheduler = PollScheduler(base_interval=poll_interval)
             self.thread = threading.Thread(
                 target=self.poll_messages, args=(poll_interval,), daemon=True)
             self.thread.start()
@@ -73,24 +374,315 @@ class ChatClient():
     def poll_messages(self, poll_interval):
         """
         Poll for messages from the server.
+        Uses long polls when enabled; otherwise polls again right away while full pages
+        come back, and backs off while the inbox is idle.
+        Failed polls do not end the thread; it waits for the channel to reconnect instead.
+        Neither does a failing callback: the batch is fetched again after a backoff.
+
+        :param poll_interval: Base polling interval
+        """
+        stop_event = self.stop_event  # Event owned by this polling thread
+        scheduler = self.poll_scheduler or PollScheduler(
+            base_interval=poll_interval)
+        while self.running and not stop_event.is_set():
+            started = time.monotonic()
+            try:
+                messages = self.request_messages(wait_ms=self.long_poll_ms)
+            except grpc.RpcError as e:
+                # Keep the thread alive: wait for the server to come back, then poll again
+                if stop_event.is_set():
+                    return
+                self.log_error(f"Poll failed ({e.code()}), retrying")
+                self.wait_to_reconnect(stop_event)
+                continue
+            except Exception as e:
+                # The callback failed and the cursor was rewound: back off, then fetch the batch again
+                self.log_error(f"Message callback failed ({e}), retrying")
+                self.wait_to_reconnect(stop_event)
+                continue
+            self.reconnect_scheduler.reset()
+            elapsed_ms = (time.monotonic() - started) * 1000
+
+            # An empty long poll that was held for its wait shows the server parks calls;
+            # one that came back early means it does not, so rely on the scheduler.
+            if self.long_poll_ms and messages == []:
+                self.long_poll_supported = elapsed_ms >= self.long_poll_ms / 2
+            # With long polls the server does the waiting, so poll again right away
+            if self.long_poll_ms and self.long_poll_supported and messages is not None:
+                continue
+
+            # Wait for the adaptive delay (returns early if polling is stopped)
+            num_received = len(messages) if messages is not None else None
+            stop_event.wait(scheduler.next_delay(num_received, self.max_msg))
+
+    def start_receiving_messages(self, poll_interval=5):
+        """
+        Start receiving messages, over a stream if enabled and by polling otherwise.
 
-        :param poll_interval: Polling interval
+        :param poll_interval: Base polling interval (used for polling or fallback)
         """
-        while self.running:
-            self.request_messages()
+        if self.use_subscription and self.session_key:
+            self.start_message_subscription(poll_interval)
+        else:
+            self.start_polling_messages(poll_interval)
+
+    def start_message_subscription(self, poll_interval=5):
+        """
+        Start a thread that consumes the server's message stream.
+
+        :param poll_interval: Base polling interval to fall back to if the stream fails
+        """
+        if not self.running:
+            self.running = True
+            self.stop_event = threading.Event()
+            self.poll_scheduler = PollScheduler(base_interval=poll_interval)
+            self.thread = threading.Thread(
+                target=self.subscribe_messages, args=(poll_interval,), daemon=True)
+            self.thread.start()
+
+    def subscribe_messages(self, poll_interval):
+        """
+        Receive messages pushed by the server as they are sent.
+        If the server ends the stream (e.g., it was replaced by a newer one for this
+        session) or the callback fails, subscribes again after a backoff. Falls back
+        to polling on this thread if the stream fails.
+
+        :param poll_interval: Base polling interval for the fallback
+        """
+        stop_event = self.stop_event  # Event owned by this thread
+        while self.running and not stop_event.is_set():
+            request = chat_pb2.SubscribeMessagesRequest(
+                session_key=self.request_session_key(), compact_sender=self.compact_sender,
+                manual_ack=self.manual_ack)
+            try:
+                self.subscription = self.stub.SubscribeMessages(request)
+                for response in self.subscription:
+                    self.handle_received_messages(response)
+                    self.reconnect_scheduler.reset()
+            except grpc.RpcError as e:
+                if stop_event.is_set():
+                    return
+                self.log_error(
+                    f"Message stream failed ({e.code()}), falling back to polling")
+                break
+            except Exception as e:
+                # The callback failed and the cursor was rewound, so the open stream is past
+                # the batch: end it, and the next subscription delivers the batch again
+                if self.subscription:
+                    self.subscription.cancel()
+                self.log_error(f"Message callback failed ({e}), subscribing again")
+                self.wait_to_reconnect(stop_event)
+                continue
+            finally:
+                self.subscription = None
+            if stop_event.is_set():
+                return
+            print("[STREAM CLOSED] Message stream ended, subscribing again")
+            stop_event.wait(self.reconnect_scheduler.next_delay(0, self.max_msg))
+        else:
+            return  # Stopped (the loop only breaks when the stream fails)
 
-            # Sleep for the polling interval
-            time.sleep(poll_interval)
+        self.poll_messages(poll_interval)
+
+    def get_metrics(self):
+        """
+        Get a snapshot of RPC latencies (p50/p90/p99/max in ms), call counts and error counts per method.
+
+        :return: Dict of RPC name -> summary (see RpcMetrics.snapshot)
+        """
+        return self.metrics.snapshot()
+
+    def dump_metrics(self, path=None):
+        """
+        Get the metrics snapshot as JSON, optionally writing it to a file.
+
+        :param path: File to write the JSON to (optional)
+        :return: JSON string
+        """
+        snapshot = self.metrics.to_json()
+        if path:
+            with open(path, "w") as f:
+                f.write(snapshot)
+        return snapshot
+
+    def get_scheduler_stats(self):
+        """
+        Get queue depths, calls in flight and wait times (ms) per priority class.
+
+        :return: Dict of priority class -> stats (see RpcScheduler.stats)
+        """
+        return self.scheduler.stats()
+
+    def submit(self, function, *args):
+        """
+        Run a function (typically one making calls for the UI) on the client's thread pool.
+
+        :param function: Function to run
+        :param args: Arguments to pass
+        :return: concurrent.futures.Future of its result
+        """
+        return self.executor.submit(function, *args)
+
+    def get_poll_rate(self):
+        """
+        Get the poll rate currently in use.
+
+        :return: Polls per second (0 if not polling)
+        """
+        if not self.running or not self.poll_scheduler:
+            return 0
+        return self.poll_scheduler.poll_rate
 
     def stop_polling_messages(self):
         """
         Stop the thread listening for messages.
         """
         self.running = False
+        self.stop_event.set()
+        with self.connectivity_changed:
+            self.connectivity_changed.notify_all()
+        if self.subscription:
+            self.subscription.cancel()
+        self.cancel_pending_poll()
         if self.thread:
             self.thread.join(timeout=1)
+        # In case a long poll was issued while stopping
+        self.cancel_pending_poll()
         print("[STOPPED] Polling messages")
 
+    def cancel_pending_poll(self):
+        """
+        Cancel the in-flight long poll, if any.
+        """
+        pending_poll = self.pending_poll
+        if pending_poll:
+            pending_poll.cancel()
+
+    def close_outbox(self, timeout=None):
+        """
+        Send any messages still in the outbox and stop its flusher.
+
+        :param timeout: Seconds to wait for the outbox to empty
+        """
+        if self.outbox:
+            self.outbox.close(timeout)
+
+    def open_session_stream(self):
+        """
+        Open a Session stream for the current session, replacing any existing one.
+        """
+        self.close_session_stream()
+        self.session_stream = SessionStream(self, self.request_session_key())
+        print("[SESSION STREAM] Opened")
+
+    def close_session_stream(self):
+        """
+        Close the Session stream, if open.
+        """
+        if self.session_stream:
+            self.session_stream.close()
+            self.session_stream = None
+
+    def request_session_key(self):
+        """
+        Session key to put in request messages: empty when the session is sent as
+        call metadata instead.
+
+        :return: Session key (or "")
+        """
+        if self.session_metadata:
+            return ""
+        return self.session_key
+
+    def invoke(self, command, method, request):
+        """
+        Send a command over the Session stream if one is open, or as a unary call otherwise.
+        Requests on the stream omit the session key, since the stream is already authenticated.
+
+        :param command: Session command name (e.g., "send_message")
+        :param method: RPC name to fall back to (e.g., "SendMessage")
+        :param request: Request message (built with the session key)
+        :return: Response message
+        """
+        session_stream = self.session_stream
+        if session_stream and session_stream.is_open():
+            request.session_key = ""
+            try:
+                with self.scheduler.admit(self.priority(method)):
+                    return session_stream.request(command, request, timeout=self.deadlines[method])
+            except SessionStreamClosed:
+                self.log_error("Session stream closed, falling back to unary calls")
+            request.session_key = self.request_session_key()
+        return self.call(method, request)
+
+    def priority(self, method):
+        """
+        :param method: RPC name
+        :return: The method's priority class (BACKGROUND for polls, INTERACTIVE otherwise)
+        """
+        return BACKGROUND if method in BACKGROUND_METHODS else INTERACTIVE
+
+    def call(self, method, request):
+        """
+        Make a unary call with the method's deadline (hedged, if enabled and safe),
+        once the scheduler admits it.
+
+        :param method: RPC name (e.g., "SendMessage")
+        :param request: Request message
+        :return: Response message
+        """
+        with self.scheduler.admit(self.priority(method)):
+            if self.hedge_requests and method in IDEMPOTENT_METHODS:
+                return self.hedged_call(method, request)
+            return getattr(self.stub, method)(request, timeout=self.deadlines[method])
+
+    def hedged_call(self, method, request):
+        """
+        Make an idempotent call, sending a second attempt if the first has not answered
+        within the method's p95 latency. The first successful answer wins and the other
+        attempt is cancelled.
+
+        :param method: RPC name (one of IDEMPOTENT_METHODS)
+        :param request: Request message
+        :return: Response message
+        """
+        rpc = getattr(self.stub, method)
+        deadline = time.monotonic() + self.deadlines[method]
+        finished = threading.Event()  # Set whenever an attempt completes
+        attempts = [rpc.future(request, timeout=self.deadlines[method])]
+        attempts[0].add_done_callback(lambda _: finished.set())
+
+        if not finished.wait(self.hedge_delay(method)):
+            hedge = rpc.future(request, timeout=max(
+                deadline - time.monotonic(), HEDGE_MIN_DELAY_S))
+            hedge.add_done_callback(lambda _: finished.set())
+            attempts.append(hedge)
+
+        while True:
+            finished.wait()
+            finished.clear()
+            for attempt in attempts:
+                if attempt.done() and not attempt.cancelled() and attempt.exception() is None:
+                    for other in attempts:
+                        if other is not attempt:
+                            other.cancel()
+                    return attempt.result()
+            if all(attempt.done() for attempt in attempts):
+                # Every attempt failed: raise the first attempt's error
+                return attempts[0].result()
+
+    def hedge_delay(self, method):
+        """
+        How long to wait before hedging a call.
+
+        :param method: RPC name
+        :return: Delay in seconds (the method's p95 latency once enough calls are seen)
+        """
+        latency, samples = self.metrics.percentile(method, HEDGE_PERCENTILE)
+        if samples < HEDGE_MIN_SAMPLES:
+            return HEDGE_DEFAULT_DELAY_S
+        return max(latency, HEDGE_MIN_DELAY_S)
+
     # MAIN OPERATIONS
     # (1) LOOKUP
     def account_lookup(self, username):
@@ -101,17 +693,41 @@ class ChatClient():
         :return: True if the account exists, False otherwise
         """
         request = chat_pb2.AccountLookupRequest(username=username)
-        response = self.stub.AccountLookup(request)
+        response = self.call("AccountLookup", request)
         print(
             f"[LOOKUP] Exists: {response.exists}, Prefix: {response.bcrypt_prefix}")
+        self.prefix_from_cache = False
         if response.exists:
             self.bcrypt_prefix = response.bcrypt_prefix
+        if self.prefix_cache:
+            if response.exists:
+                self.prefix_cache.put(self.server, username, response.bcrypt_prefix)
+            else:
+                self.prefix_cache.remove(self.server, username)
         return response.exists
 
+    def cached_account_lookup(self, username):
+        """
+        Like account_lookup, but answered from the prefix cache (without a round trip)
+        if the username's bcrypt prefix is cached. login refreshes a stale prefix.
+
+        :param username: Username
+        :return: True if the account exists (or is cached), False otherwise
+        """
+        prefix = self.prefix_cache.get(self.server, username) if self.prefix_cache else None
+        if prefix is None:
+            return self.account_lookup(username)
+        print(f"[LOOKUP] Cached prefix: {prefix}")
+        self.bcrypt_prefix = prefix
+        self.prefix_from_cache = True
+        return True
+
     # (2) LOGIN
     def login(self, username, password):
         """
         Login to the server.
+        If login fails with a cached bcrypt prefix, the prefix is looked up again and,
+        if it changed (e.g., the account was recreated), login is retried once.
 
         :param username: Username
         :param password: Password
@@ -120,18 +736,71 @@ class ChatClient():
         hashed_password = self.get_hashed_password_for_login(password)
         request = chat_pb2.LoginCreateRequest(
             username=username, password_hash=hashed_password)
-        response = self.stub.Login(request)
+        response = self.call("Login", request)
+
+        if not response.success and self.prefix_from_cache:
+            cached_prefix = self.bcrypt_prefix
+            if self.account_lookup(username) and self.bcrypt_prefix != cached_prefix:
+                print("[LOGIN] Cached prefix was stale, retrying")
+                return self.login(username, password)
 
         if response.success:  # If login is successful, store the session key and username
             print(
                 f"[LOGIN] Session key: {response.session_key}, Unread messages: {response.unread_messages}")
-            self.session_key = response.session_key
-            self.username = username
-            self.start_polling_messages()
+            self.begin_session(response.session_key, username, response.session_expires_at_ms)
             return response.success, response.unread_messages
         # Else, log the error and return False
         return self.log_error("Login failed", False)
 
+    def resume_session(self):
+        """
+        Resume the session saved by an earlier run, without logging in (so without
+        any bcrypt work). A session the server rejects is forgotten.
+
+        :return: True + number of unread messages if resumed, False otherwise
+        """
+        saved = self.session_store.load(self.server) if self.session_store else None
+        if saved is None:
+            return False
+        username, session_key = saved
+        try:
+            response = self.call("ResumeSession", chat_pb2.ResumeSessionRequest(session_key=session_key))
+        except grpc.RpcError as e:
+            # Keep the saved session: the server may just be unreachable
+            return self.log_error(f"Could not resume session ({e.code()})", False)
+        if not response.success:
+            self.session_store.clear(self.server)
+            return self.log_error("Saved session is no longer valid", False)
+        print(f"[RESUMED] User: {response.username}, Unread messages: {response.unread_messages}")
+        self.begin_session(session_key, response.username, response.session_expires_at_ms)
+        return True, response.unread_messages
+
+    def begin_session(self, session_key, username, expires_at_ms):
+        """
+        Start using a new session: save it (if enabled) and start receiving messages.
+
+        :param session_key: Session key
+        :param username: Username
+        :param expires_at_ms: When the server expires the session (milliseconds since the epoch)
+        """
+        self.session_key = session_key
+        self.username = username
+        self.inbox_version = 0
+        if self.session_store:
+            self.session_store.save(self.server, username, session_key, expires_at_ms)
+        if self.use_session_stream:
+            self.open_session_stream()
+        self.start_receiving_messages()
+        if self.poll_scheduler:
+            self.poll_scheduler.reset()
+
+    def forget_session(self):
+        """
+        Forget the saved session, so the next run has to log in.
+        """
+        if self.session_store:
+            self.session_store.clear(self.server)
+
     # (3) CREATE ACCOUNT
     def create_account(self, username, password):
         """
@@ -144,17 +813,40 @@ class ChatClient():
         hashed_password = self.generate_hashed_password_for_create(password)
         request = chat_pb2.LoginCreateRequest(
             username=username, password_hash=hashed_password)
-        response = self.stub.CreateAccount(request)
+        response = self.call("CreateAccount", request)
         if response.success:
+            if self.prefix_cache:
+                self.prefix_cache.put(self.server, username, self.bcrypt_prefix)
             print(
                 f"[CREATE ACCOUNT] Success: {response.success}, Session key: {response.session_key}")
-            self.session_key = response.session_key
-            self.username = username
-            self.start_polling_messages()
+            self.begin_session(response.session_key, username, response.session_expires_at_ms)
         else:
             self.log_error("Account creation failed")
         return response.success
 
+    def bulk_create_accounts(self, accounts, processes=None, max_in_flight=DEFAULT_MAX_IN_FLIGHT):
+        """
+        Create many accounts, hashing passwords in parallel processes and keeping up to
+        max_in_flight calls outstanding. This client's own session is not changed.
+
+        :param accounts: List of (username, password) pairs
+        :param processes: Number of hashing processes (default: one per CPU)
+        :param max_in_flight: Maximum number of calls outstanding at once
+        :return: Dict of username -> session key (None if creation failed)
+        """
+        return BulkAccounts(self, processes, max_in_flight).create_accounts(accounts)
+
+    def bulk_login(self, accounts, processes=None, max_in_flight=DEFAULT_MAX_IN_FLIGHT):
+        """
+        Log into many accounts, like bulk_create_accounts.
+
+        :param accounts: List of (username, password) pairs
+        :param processes: Number of hashing processes (default: one per CPU)
+        :param max_in_flight: Maximum number of calls outstanding at once
+        :return: Dict of username -> session key (None if login failed)
+        """
+        return BulkAccounts(self, processes, max_in_flight).login(accounts)
+
     # (4) LIST ACCOUNTS
     def list_accounts(self, filter_text=""):
         """
@@ -167,53 +859,336 @@ class ChatClient():
             return self.log_error("No session key available")
 
         request = chat_pb2.ListAccountsRequest(
-            session_key=self.session_key, maximum_number=self.max_users, offset_account_id=self.last_offset_account_id, filter_text=filter_text)
-        response = self.stub.ListAccounts(request)
+            session_key=self.request_session_key(), maximum_number=self.max_users, offset_account_id=self.last_offset_account_id, filter_text=filter_text)
+        response = self.invoke("list_accounts", "ListAccounts", request)
         accounts = [(account.id, account.username)
                     for account in response.accounts]
+        self.usernames.update(accounts)
         print(f"[LIST ACCOUNTS] Accounts: {accounts}")
         return accounts
 
     # (5) SEND MESSAGE
-    def send_message(self, recipient, message):
+    def send_message(self, recipient, message, attachment_ids=()):
         """
         Send a message to a recipient.
+        In outbox mode, the message is queued and a future is returned right away
+        (messages with attachments are sent directly, since batches carry none).
 
         :param recipient: Recipient
         :param message: Message
+        :param attachment_ids: IDs of uploaded attachments (see upload_attachment)
         :return: True if message is sent successfully, False otherwise
+            (in outbox mode: a Future resolving to the message ID)
         """
         if not self.session_key:
             return self.log_error("No session key available")
+        if self.outbox and not attachment_ids:
+            return self.outbox.submit(recipient, message)
 
         request = chat_pb2.SendMessageRequest(
-            session_key=self.session_key, recipient=recipient, message=message)
-        response = self.stub.SendMessage(request)
+            session_key=self.request_session_key(), recipient=recipient, message=message,
+            attachment_ids=attachment_ids)
+        response = self.invoke("send_message", "SendMessage", request)
         print(f"[MESSAGE SENT] ID: {response.id}")
         return True
 
+    def send_many(self, messages, batch_size=SEND_BATCH_SIZE):
+        """
+        Send many messages with few round trips, using batched SendMessages calls.
+        Each message succeeds or fails on its own.
+
+        :param messages: List of (recipient, message) pairs
+        :param batch_size: Maximum number of messages per call
+        :return: List with the message ID of each sent message (None for failed ones), in order
+        """
+        if not self.session_key:
+            return self.log_error("No session key available")
+
+        ids = []
+        for start in range(0, len(messages), batch_size):
+            request = chat_pb2.SendMessagesRequest(session_key=self.request_session_key(), messages=[
+                chat_pb2.OutgoingMessage(recipient=recipient, message=message)
+                for recipient, message in messages[start:start + batch_size]])
+            response = self.call("SendMessages", request)
+            for (recipient, _), result in zip(messages[start:start + batch_size], response.results):
+                if result.WhichOneof("result") == "id":
+                    ids.append(result.id)
+                else:
+                    self.log_error(
+                        f"Message to {recipient} failed: {result.error.description}")
+                    ids.append(None)
+        print(f"[MESSAGES SENT] {sum(id is not None for id in ids)}/{len(ids)}")
+        return ids
+
     # (6) REQUEST MESSAGES
-    def request_messages(self):
+    def request_messages(self, wait_ms=0):
         """
         Request messages from the server.
 
+        :param wait_ms: If nonzero and there are no unread messages, how long the server
+            should wait for one before answering (long poll)
         :return: List of messages
         """
         if not self.session_key:
             return self.log_error("No session key available")
 
         request = chat_pb2.RequestMessagesRequest(
-            session_key=self.session_key, maximum_number=self.max_msg)
-        response = self.stub.RequestMessages(request)
-        messages = [(message.id, message.sender,
-                     message.message) for message in response.messages]
+            session_key=self.request_session_key(), maximum_number=self.max_msg, wait_ms=wait_ms, inbox_version=self.inbox_version,
+            compact_sender=self.compact_sender, manual_ack=self.manual_ack)
+        if wait_ms > 0:
+            with self.scheduler.admit(BACKGROUND):
+                # Keep a handle on the parked call so stop_polling_messages can cancel it
+                self.pending_poll = self.stub.RequestMessages.future(
+                    request, timeout=self.poll_timeout(wait_ms))
+                try:
+                    response = self.pending_poll.result()
+                except grpc.FutureCancelledError:
+                    return self.log_error("Long poll cancelled")
+                finally:
+                    self.pending_poll = None
+        else:
+            response = self.invoke(
+                "request_messages", "RequestMessages", request)
+        return self.handle_received_messages(response)
+
+    def poll_timeout(self, wait_ms):
+        """
+        :param wait_ms: How long the server may hold the poll
+        :return: Deadline (seconds) for a RequestMessages call
+        """
+        if wait_ms > 0:
+            return wait_ms / 1000 + LONG_POLL_GRACE_S
+        return self.deadlines["RequestMessages"]
+
+    def iter_messages(self, buffer_size=DEFAULT_BUFFER_SIZE, follow=True, wait_ms=None):
+        """
+        Get a generator yielding received messages one at a time as they arrive, for consumers
+        that process them as a pipeline. At most buffer_size messages are fetched ahead
+        of the consumer (see MessageIterator), and they are not passed to the callback.
+
+        Polling and the message stream are stopped first, since they would take
+        messages from the same inbox. With manual_ack, messages are acknowledged once the
+        consumer asks for the next one, and those fetched but not yet yielded when the
+        generator is closed are delivered again to the next fetch (otherwise they are dropped).
+
+        :param buffer_size: Maximum number of messages fetched but not yet consumed
+        :param follow: Keep waiting for new messages once the inbox is empty (otherwise stop there)
+        :param wait_ms: How long the server may hold an empty fetch while following (default: long_poll_ms)
+        :return: Generator of (id, sender, message)
+        """
+        if not self.session_key:
+            return self.log_error("No session key available", iter(()))
+        if self.running:
+            self.stop_polling_messages()
+        iterator = MessageIterator(self, buffer_size, follow, wait_ms)
+        return self.iterate(iterator)
+
+    def iterate(self, iterator):
+        """
+        :param iterator: MessageIterator
+        :return: Generator over the iterator that closes it when the generator is closed
+        """
+        with iterator:
+            yield from iterator
+
+    def list_messages(self, offset_message_id=0, maximum_number=None, newest_first=True):
+        """
+        Get a page of the messages this user has received, read or not, without
+        marking them read (see MessageHistory).
+
+        :param offset_message_id: Only return messages older than this ID (or newer,
+            if not newest_first); 0 to start from the newest (or oldest)
+        :param maximum_number: Maximum number of messages (default: max_msg)
+        :param newest_first: Page backwards from the newest message
+        :return: List of (id, sender, message), in the requested order
+        """
+        if not self.session_key:
+            return self.log_error("No session key available", [])
+
+        request = chat_pb2.ListMessagesRequest(
+            session_key=self.request_session_key(), maximum_number=maximum_number or self.max_msg,
+            offset_message_id=offset_message_id, newest_first=newest_first, compact_sender=self.compact_sender)
+        response = self.invoke("list_messages", "ListMessages", request)
+        messages = self.convert_messages(response.messages)
+        print(f"[LIST MESSAGES] Offset ID: {offset_message_id}, Messages: {len(messages)}")
+        return messages
+
+    def handle_received_messages(self, response):
+        """
+        Convert a batch of messages from the server and pass it to the callback, then
+        acknowledge them (with manual_ack). The inbox version is only updated once that
+        succeeds. If the callback raises, the session's cursor is rewound so the batch is
+        delivered again by the next poll, and the error is raised.
+
+        :param response: RequestMessagesResponse from a poll or the message stream
+        :return: List of messages
+        """
+        if response.unchanged:  # Nothing new since the last inbox version
+            return []
+        messages = self.convert_messages(response.messages)
         if len(messages) > 0:
             print(f"[RECEIVED MESSAGES] Messages: {messages}")
             # send callback
-            if self.on_messages_updated:
-                self.on_messages_updated(messages)
+            try:
+                if self.on_messages_updated:
+                    self.on_messages_updated(messages)
+            except Exception:
+                if self.manual_ack:
+                    # Rewind without acknowledging any of the batch, and skip the "unchanged" reply
+                    self.inbox_version = 0
+                    self.try_ack_messages(0, rewind=True)
+                raise
+            if self.manual_ack and self.try_ack_messages(messages[-1][0]) is None:
+                return messages
+        self.inbox_version = response.inbox_version
         return messages
 
+    def ack_messages(self, up_to_id, rewind=False):
+        """
+        Acknowledge the messages this session has received up to up_to_id, marking them read.
+        Unacknowledged messages are delivered again when the session is resumed.
+
+        :param up_to_id: ID of the last message handled (IDs increase, so all earlier ones are included)
+        :param rewind: Also have the messages received after up_to_id delivered again
+        :return: Number of unread messages left
+        """
+        if not self.session_key:
+            return self.log_error("No session key available")
+
+        request = chat_pb2.AckMessagesRequest(
+            session_key=self.request_session_key(), up_to_id=up_to_id, rewind=rewind)
+        response = self.invoke("ack_messages", "AckMessages", request)
+        print(f"[ACKED MESSAGES] Up to ID: {up_to_id}, Unread messages: {response.unread_messages}")
+        return response.unread_messages
+
+    def try_ack_messages(self, up_to_id, rewind=False):
+        """
+        Like ack_messages, but only logs a failure: the messages stay unacknowledged,
+        and a later acknowledgement covers them.
+
+        :param up_to_id: ID of the last message handled
+        :param rewind: Also have the messages received after up_to_id delivered again
+        :return: Number of unread messages left, or None if the acknowledgement failed
+        """
+        try:
+            return self.ack_messages(up_to_id, rewind)
+        except grpc.RpcError as e:
+            return self.log_error(f"Acknowledging messages failed ({e.code()})")
+
+    def convert_messages(self, messages):
+        """
+        Convert received ChatMessages to tuples, resolving compact senders.
+
+        :param messages: ChatMessages
+        :return: List of (id, sender username, message), with a fourth element
+            (the list of attachment IDs) for messages that have attachments
+        """
+        if self.compact_sender:
+            messages = self.resolve_senders(messages)
+        return [self.convert_message(message) for message in messages]
+
+    def convert_message(self, message):
+        """
+        :param message: ChatMessage (its sender in the username cache, if compact)
+        :return: (id, sender username, message), plus the attachment IDs if it has any
+        """
+        # Messages from deleted accounts carry only the sender's ID
+        converted = (message.id, message.sender or self.sender_name(message.sender_id), message.message)
+        if message.attachment_ids:
+            return converted + (list(message.attachment_ids),)
+        return converted
+
+    def resolve_senders(self, messages):
+        """
+        Make sure the senders of a batch of compact messages are in the username cache,
+        looking up any missing ones in a single call.
+
+        :param messages: ChatMessages with sender_id set
+        :return: The messages
+        """
+        missing = self.usernames.missing(
+            message.sender_id for message in messages)
+        if missing:
+            try:
+                self.lookup_usernames(missing)
+            except grpc.RpcError as e:
+                # The messages are already delivered, so show them with placeholder names
+                self.log_error(f"Username lookup failed ({e.code()})")
+        return messages
+
+    def sender_name(self, sender_id):
+        """
+        :param sender_id: Account ID of a message sender
+        :return: The sender's username (or a placeholder if it is unknown, e.g. deleted)
+        """
+        return self.usernames.get(sender_id) or f"user #{sender_id}"
+
+    def lookup_usernames(self, account_ids):
+        """
+        Look up usernames by account ID, adding them to the username cache.
+
+        :param account_ids: List of account IDs
+        :return: Dict of account ID -> username for the accounts that exist
+        """
+        if not self.session_key:
+            return self.log_error("No session key available")
+
+        request = chat_pb2.LookupUsernamesRequest(
+            session_key=self.request_session_key(), id=account_ids)
+        response = self.call("LookupUsernames", request)
+        accounts = {account.id: account.username for account in response.accounts}
+        self.usernames.update(accounts.items())
+        print(f"[LOOKUP USERNAMES] {accounts}")
+        return accounts
+
+    def upload_attachment(self, file, chunk_size=ATTACHMENT_CHUNK_SIZE):
+        """
+        Upload an attachment from a binary file object, streaming it in chunks so it is
+        never held in memory whole. The returned ID can be sent with any number of messages;
+        uploading the same content again returns the same ID.
+
+        :param file: Binary file object, read to the end
+        :param chunk_size: Bytes per chunk
+        :return: Attachment ID
+        """
+        if not self.session_key:
+            return self.log_error("No session key available")
+
+        def chunks():
+            session_key = self.request_session_key()  # Only the first chunk needs it
+            while True:
+                data = file.read(chunk_size)
+                if not data:
+                    return
+                yield chat_pb2.UploadAttachmentRequest(session_key=session_key, data=data)
+                session_key = ""
+
+        with self.scheduler.admit(INTERACTIVE):
+            response = self.stub.UploadAttachment(chunks(), timeout=self.deadlines["UploadAttachment"])
+        print(f"[UPLOADED ATTACHMENT] ID: {response.attachment_id}, Size: {response.size}")
+        return response.attachment_id
+
+    def download_attachment(self, attachment_id, file):
+        """
+        Download an attachment into a binary file object, writing each chunk as it arrives.
+
+        :param attachment_id: Attachment ID (from a received message)
+        :param file: Binary file object to write to
+        :return: Number of bytes written
+        """
+        if not self.session_key:
+            return self.log_error("No session key available")
+
+        request = chat_pb2.DownloadAttachmentRequest(
+            session_key=self.request_session_key(), attachment_id=attachment_id)
+        size = 0
+        with self.scheduler.admit(INTERACTIVE):
+            for chunk in self.stub.DownloadAttachment(request, timeout=self.deadlines["DownloadAttachment"]):
+                file.write(chunk.data)
+                size += len(chunk.data)
+        print(f"[DOWNLOADED ATTACHMENT] ID: {attachment_id}, Size: {size}")
+        return size
+
     # (7) DELETE MESSAGES
     def delete_message(self, message_ids):
         """
@@ -226,8 +1201,8 @@ class ChatClient():
             return self.log_error("No session key available")
 
         request = chat_pb2.DeleteMessagesRequest(
-            session_key=self.session_key, id=message_ids)
-        self.stub.DeleteMessages(request)
+            session_key=self.request_session_key(), id=message_ids)
+        self.invoke("delete_messages", "DeleteMessages", request)
         print(f"[DELETED MESSAGES] IDs: {message_ids}")
         return True
 
@@ -241,10 +1216,16 @@ class ChatClient():
         if not self.session_key:
             return self.log_error("No session key available")
 
+        # Send queued messages while the session is still valid
+        self.close_outbox()
         request = chat_pb2.DeleteAccountRequest(
-            session_key=self.session_key)
-        self.stub.DeleteAccount(request)
+            session_key=self.request_session_key())
+        self.call("DeleteAccount", request)
         print(f"[DELETED ACCOUNT] Session key: {self.session_key}")
+        if self.prefix_cache:
+            self.prefix_cache.remove(self.server, self.username)
+        self.forget_session()
+        self.close_session_stream()
         self.session_key = None
         return True
 
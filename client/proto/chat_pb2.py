@@ -24,7 +24,7 @@ _sym_db = _symbol_database.Default()
 
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\nchat.proto\x12\x0b\x65\x64u.harvard\"\'\n\x07\x41\x63\x63ount\x12\n\n\x02id\x18\x01 \x01(\x05\x12\x10\n\x08username\x18\x02 \x01(\t\":\n\x0b\x43hatMessage\x12\n\n\x02id\x18\x01 \x01(\x05\x12\x0e\n\x06sender\x18\x02 \x01(\t\x12\x0f\n\x07message\x18\x03 \x01(\t\"(\n\x14\x41\x63\x63ountLookupRequest\x12\x10\n\x08username\x18\x01 \x01(\t\">\n\x15\x41\x63\x63ountLookupResponse\x12\x0e\n\x06\x65xists\x18\x01 \x01(\x08\x12\x15\n\rbcrypt_prefix\x18\x02 \x01(\t\"=\n\x12LoginCreateRequest\x12\x10\n\x08username\x18\x01 \x01(\t\x12\x15\n\rpassword_hash\x18\x02 \x01(\t\"T\n\x13LoginCreateResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x13\n\x0bsession_key\x18\x02 \x01(\t\x12\x17\n\x0funread_messages\x18\x03 \x01(\x05\"r\n\x13ListAccountsRequest\x12\x13\n\x0bsession_key\x18\x01 \x01(\t\x12\x16\n\x0emaximum_number\x18\x02 \x01(\r\x12\x19\n\x11offset_account_id\x18\x03 \x01(\r\x12\x13\n\x0b\x66ilter_text\x18\x04 \x01(\t\">\n\x14ListAccountsResponse\x12&\n\x08\x61\x63\x63ounts\x18\x01 \x03(\x0b\x32\x14.edu.harvard.Account\"M\n\x12SendMessageRequest\x12\x13\n\x0bsession_key\x18\x01 \x01(\t\x12\x11\n\trecipient\x18\x02 \x01(\t\x12\x0f\n\x07message\x18\x03 \x01(\t\"!\n\x13SendMessageResponse\x12\n\n\x02id\x18\x01 \x01(\x05\"E\n\x16RequestMessagesRequest\x12\x13\n\x0bsession_key\x18\x01 \x01(\t\x12\x16\n\x0emaximum_number\x18\x02 \x01(\r\"E\n\x17RequestMessagesResponse\x12*\n\x08messages\x18\x01 \x03(\x0b\x32\x18.edu.harvard.ChatMessage\"8\n\x15\x44\x65leteMessagesRequest\x12\x13\n\x0bsession_key\x18\x01 \x01(\t\x12\n\n\x02id\x18\x02 \x03(\x05\"+\n\x14\x44\x65leteAccountRequest\x12\x13\n\x0bsession_key\x18\x01 \x01(\t\"\x07\n\x05\x45mpty2\x9c\x05\n\x0b\x43hatService\x12V\n\rAccountLookup\x12!.edu.harvard.AccountLookupRequest\x1a\".edu.harvard.AccountLookupResponse\x12J\n\x05Login\x12\x1f.edu.harvard.LoginCreateRequest\x1a .edu.harvard.LoginCreateResponse\x12R\n\rCreateAccount\x12\x1f.edu.harvard.LoginCreateRequest\x1a .edu.harvard.LoginCreateResponse\x12S\n\x0cListAccounts\x12 .edu.harvard.ListAccountsRequest\x1a!.edu.harvard.ListAccountsResponse\x12P\n\x0bSendMessage\x12\x1f.edu.harvard.SendMessageRequest\x1a .edu.harvard.SendMessageResponse\x12\\\n\x0fRequestMessages\x12#.edu.harvard.RequestMessagesRequest\x1a$.edu.harvard.RequestMessagesResponse\x12H\n\x0e\x44\x65leteMessages\x12\".edu.harvard.DeleteMessagesRequest\x1a\x12.edu.harvard.Empty\x12\x46\n\rDeleteAccount\x12!.edu.harvard.DeleteAccountRequest\x1a\x12.edu.harvard.EmptyB\r\n\x0b\x65\x64u.harvardb\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\nchat.proto\x12\x0b\x65\x64u.harvard\"\'\n\x07\x41\x63\x63ount\x12\n\n\x02id\x18\x01 \x01(\x05\x12\x10\n\x08username\x18\x02 \x01(\t\"e\n\x0b\x43hatMessage\x12\n\n\x02id\x18\x01 \x01(\x05\x12\x0e\n\x06sender\x18\x02 \x01(\t\x12\x0f\n\x07message\x18\x03 \x01(\t\x12\x11\n\tsender_id\x18\x04 \x01(\x05\x12\x16\n\x0e\x61ttachment_ids\x18\x05 \x03(\t\"(\n\x14\x41\x63\x63ountLookupRequest\x12\x10\n\x08username\x18\x01 \x01(\t\">\n\x15\x41\x63\x63ountLookupResponse\x12\x0e\n\x06\x65xists\x18\x01 \x01(\x08\x12\x15\n\rbcrypt_prefix\x18\x02 \x01(\t\"=\n\x12LoginCreateRequest\x12\x10\n\x08username\x18\x01 \x01(\t\x12\x15\n\rpassword_hash\x18\x02 \x01(\t\"s\n\x13LoginCreateResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x13\n\x0bsession_key\x18\x02 \x01(\t\x12\x17\n\x0funread_messages\x18\x03 \x01(\x05\x12\x1d\n\x15session_expires_at_ms\x18\x04 \x01(\x03\"+\n\x14ResumeSessionRequest\x12\x13\n\x0bsession_key\x18\x01 \x01(\t\"r\n\x15ResumeSessionResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x10\n\x08username\x18\x02 \x01(\t\x12\x17\n\x0funread_messages\x18\x03 \x01(\x05\x12\x1d\n\x15session_expires_at_ms\x18\x04 \x01(\x03\"r\n\x13ListAccountsRequest\x12\x13\n\x0bsession_key\x18\x01 \x01(\t\x12\x16\n\x0emaximum_number\x18\x02 \x01(\r\x12\x19\n\x11offset_account_id\x18\x03 \x01(\r\x12\x13\n\x0b\x66ilter_text\x18\x04 \x01(\t\">\n\x14ListAccountsResponse\x12&\n\x08\x61\x63\x63ounts\x18\x01 \x03(\x0b\x32\x14.edu.harvard.Account\"e\n\x12SendMessageRequest\x12\x13\n\x0bsession_key\x18\x01 \x01(\t\x12\x11\n\trecipient\x18\x02 \x01(\t\x12\x0f\n\x07message\x18\x03 \x01(\t\x12\x16\n\x0e\x61ttachment_ids\x18\x04 \x03(\t\"!\n\x13SendMessageResponse\x12\n\n\x02id\x18\x01 \x01(\x05\"5\n\x0fOutgoingMessage\x12\x11\n\trecipient\x18\x01 \x01(\t\x12\x0f\n\x07message\x18\x02 \x01(\t\"Z\n\x13SendMessagesRequest\x12\x13\n\x0bsession_key\x18\x01 \x01(\t\x12.\n\x08messages\x18\x02 \x03(\x0b\x32\x1c.edu.harvard.OutgoingMessage\"X\n\x12SendMessagesResult\x12\x0c\n\x02id\x18\x01 \x01(\x05H\x00\x12*\n\x05\x65rror\x18\x02 \x01(\x0b\x32\x19.edu.harvard.SessionErrorH\x00\x42\x08\n\x06result\"H\n\x14SendMessagesResponse\x12\x30\n\x07results\x18\x01 \x03(\x0b\x32\x1f.edu.harvard.SendMessagesResult\"\x99\x01\n\x16RequestMessagesRequest\x12\x13\n\x0bsession_key\x18\x01 \x01(\t\x12\x16\n\x0emaximum_number\x18\x02 \x01(\r\x12\x0f\n\x07wait_ms\x18\x03 \x01(\r\x12\x15\n\rinbox_version\x18\x04 \x01(\x04\x12\x16\n\x0e\x63ompact_sender\x18\x05 \x01(\x08\x12\x12\n\nmanual_ack\x18\x06 \x01(\x08\"o\n\x17RequestMessagesResponse\x12*\n\x08messages\x18\x01 \x03(\x0b\x32\x18.edu.harvard.ChatMessage\x12\x15\n\rinbox_version\x18\x02 \x01(\x04\x12\x11\n\tunchanged\x18\x03 \x01(\x08\"[\n\x18SubscribeMessagesRequest\x12\x13\n\x0bsession_key\x18\x01 \x01(\t\x12\x16\n\x0e\x63ompact_sender\x18\x02 \x01(\x08\x12\x12\n\nmanual_ack\x18\x03 \x01(\x08\"K\n\x12\x41\x63kMessagesRequest\x12\x13\n\x0bsession_key\x18\x01 \x01(\t\x12\x10\n\x08up_to_id\x18\x02 \x01(\x05\x12\x0e\n\x06rewind\x18\x03 \x01(\x08\".\n\x13\x41\x63kMessagesResponse\x12\x17\n\x0funread_messages\x18\x01 \x01(\r\"\x8b\x01\n\x13ListMessagesRequest\x12\x13\n\x0bsession_key\x18\x01 \x01(\t\x12\x16\n\x0emaximum_number\x18\x02 \x01(\r\x12\x19\n\x11offset_message_id\x18\x03 \x01(\r\x12\x14\n\x0cnewest_first\x18\x04 \x01(\x08\x12\x16\n\x0e\x63ompact_sender\x18\x05 \x01(\x08\"B\n\x14ListMessagesResponse\x12*\n\x08messages\x18\x01 \x03(\x0b\x32\x18.edu.harvard.ChatMessage\"<\n\x17UploadAttachmentRequest\x12\x13\n\x0bsession_key\x18\x01 \x01(\t\x12\x0c\n\x04\x64\x61ta\x18\x02 \x01(\x0c\"?\n\x18UploadAttachmentResponse\x12\x15\n\rattachment_id\x18\x01 \x01(\t\x12\x0c\n\x04size\x18\x02 \x01(\x04\"G\n\x19\x44ownloadAttachmentRequest\x12\x13\n\x0bsession_key\x18\x01 \x01(\t\x12\x15\n\rattachment_id\x18\x02 \x01(\t\"\x1f\n\x0f\x41ttachmentChunk\x12\x0c\n\x04\x64\x61ta\x18\x01 \x01(\x0c\"9\n\x16LookupUsernamesRequest\x12\x13\n\x0bsession_key\x18\x01 \x01(\t\x12\n\n\x02id\x18\x02 \x03(\x05\"A\n\x17LookupUsernamesResponse\x12&\n\x08\x61\x63\x63ounts\x18\x01 \x03(\x0b\x32\x14.edu.harvard.Account\"8\n\x15\x44\x65leteMessagesRequest\x12\x13\n\x0bsession_key\x18\x01 \x01(\t\x12\n\n\x02id\x18\x02 \x03(\x05\"+\n\x14\x44\x65leteAccountRequest\x12\x13\n\x0bsession_key\x18\x01 \x01(\t\"\x07\n\x05\x45mpty\"\xb0\x03\n\x0eSessionRequest\x12\x16\n\x0e\x63orrelation_id\x18\x01 \x01(\r\x12\x13\n\x0bsession_key\x18\x02 \x01(\t\x12\x37\n\x0csend_message\x18\x03 \x01(\x0b\x32\x1f.edu.harvard.SendMessageRequestH\x00\x12\x39\n\rlist_accounts\x18\x04 \x01(\x0b\x32 .edu.harvard.ListAccountsRequestH\x00\x12=\n\x0f\x64\x65lete_messages\x18\x05 \x01(\x0b\x32\".edu.harvard.DeleteMessagesRequestH\x00\x12?\n\x10request_messages\x18\x06 \x01(\x0b\x32#.edu.harvard.RequestMessagesRequestH\x00\x12\x37\n\x0c\x61\x63k_messages\x18\x07 \x01(\x0b\x32\x1f.edu.harvard.AckMessagesRequestH\x00\x12\x39\n\rlist_messages\x18\x08 \x01(\x0b\x32 .edu.harvard.ListMessagesRequestH\x00\x42\t\n\x07\x63ommand\"1\n\x0cSessionError\x12\x0c\n\x04\x63ode\x18\x01 \x01(\x05\x12\x13\n\x0b\x64\x65scription\x18\x02 \x01(\t\"\xbc\x03\n\x0fSessionResponse\x12\x16\n\x0e\x63orrelation_id\x18\x01 \x01(\r\x12\x38\n\x0csend_message\x18\x02 \x01(\x0b\x32 .edu.harvard.SendMessageResponseH\x00\x12:\n\rlist_accounts\x18\x03 \x01(\x0b\x32!.edu.harvard.ListAccountsResponseH\x00\x12-\n\x0f\x64\x65lete_messages\x18\x04 \x01(\x0b\x32\x12.edu.harvard.EmptyH\x00\x12@\n\x10request_messages\x18\x05 \x01(\x0b\x32$.edu.harvard.RequestMessagesResponseH\x00\x12*\n\x05\x65rror\x18\x06 \x01(\x0b\x32\x19.edu.harvard.SessionErrorH\x00\x12\x38\n\x0c\x61\x63k_messages\x18\x07 \x01(\x0b\x32 .edu.harvard.AckMessagesResponseH\x00\x12:\n\rlist_messages\x18\x08 \x01(\x0b\x32!.edu.harvard.ListMessagesResponseH\x00\x42\x08\n\x06result2\xbd\x0b\n\x0b\x43hatService\x12V\n\rAccountLookup\x12!.edu.harvard.AccountLookupRequest\x1a\".edu.harvard.AccountLookupResponse\x12J\n\x05Login\x12\x1f.edu.harvard.LoginCreateRequest\x1a .edu.harvard.LoginCreateResponse\x12R\n\rCreateAccount\x12\x1f.edu.harvard.LoginCreateRequest\x1a .edu.harvard.LoginCreateResponse\x12V\n\rResumeSession\x12!.edu.harvard.ResumeSessionRequest\x1a\".edu.harvard.ResumeSessionResponse\x12S\n\x0cListAccounts\x12 .edu.harvard.ListAccountsRequest\x1a!.edu.harvard.ListAccountsResponse\x12\\\n\x0fLookupUsernames\x12#.edu.harvard.LookupUsernamesRequest\x1a$.edu.harvard.LookupUsernamesResponse\x12P\n\x0bSendMessage\x12\x1f.edu.harvard.SendMessageRequest\x1a .edu.harvard.SendMessageResponse\x12S\n\x0cSendMessages\x12 .edu.harvard.SendMessagesRequest\x1a!.edu.harvard.SendMessagesResponse\x12\\\n\x0fRequestMessages\x12#.edu.harvard.RequestMessagesRequest\x1a$.edu.harvard.RequestMessagesResponse\x12\x62\n\x11SubscribeMessages\x12%.edu.harvard.SubscribeMessagesRequest\x1a$.edu.harvard.RequestMessagesResponse0\x01\x12P\n\x0b\x41\x63kMessages\x12\x1f.edu.harvard.AckMessagesRequest\x1a .edu.harvard.AckMessagesResponse\x12S\n\x0cListMessages\x12 .edu.harvard.ListMessagesRequest\x1a!.edu.harvard.ListMessagesResponse\x12\x61\n\x10UploadAttachment\x12$.edu.harvard.UploadAttachmentRequest\x1a%.edu.harvard.UploadAttachmentResponse(\x01\x12\\\n\x12\x44ownloadAttachment\x12&.edu.harvard.DownloadAttachmentRequest\x1a\x1c.edu.harvard.AttachmentChunk0\x01\x12H\n\x0e\x44\x65leteMessages\x12\".edu.harvard.DeleteMessagesRequest\x1a\x12.edu.harvard.Empty\x12\x46\n\rDeleteAccount\x12!.edu.harvard.DeleteAccountRequest\x1a\x12.edu.harvard.Empty\x12H\n\x07Session\x12\x1b.edu.harvard.SessionRequest\x1a\x1c.edu.harvard.SessionResponse(\x01\x30\x01\x42\r\n\x0b\x65\x64u.harvardb\x06proto3')
 
 _globals = globals()
 _builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
@@ -35,33 +35,73 @@ if not _descriptor._USE_C_DESCRIPTORS:
   _globals['_ACCOUNT']._serialized_start=27
   _globals['_ACCOUNT']._serialized_end=66
   _globals['_CHATMESSAGE']._serialized_start=68
-  _globals['_CHATMESSAGE']._serialized_end=126
-  _globals['_ACCOUNTLOOKUPREQUEST']._serialized_start=128
-  _globals['_ACCOUNTLOOKUPREQUEST']._serialized_end=168
-  _globals['_ACCOUNTLOOKUPRESPONSE']._serialized_start=170
-  _globals['_ACCOUNTLOOKUPRESPONSE']._serialized_end=232
-  _globals['_LOGINCREATEREQUEST']._serialized_start=234
-  _globals['_LOGINCREATEREQUEST']._serialized_end=295
-  _globals['_LOGINCREATERESPONSE']._serialized_start=297
-  _globals['_LOGINCREATERESPONSE']._serialized_end=381
-  _globals['_LISTACCOUNTSREQUEST']._serialized_start=383
-  _globals['_LISTACCOUNTSREQUEST']._serialized_end=497
-  _globals['_LISTACCOUNTSRESPONSE']._serialized_start=499
-  _globals['_LISTACCOUNTSRESPONSE']._serialized_end=561
-  _globals['_SENDMESSAGEREQUEST']._serialized_start=563
-  _globals['_SENDMESSAGEREQUEST']._serialized_end=640
-  _globals['_SENDMESSAGERESPONSE']._serialized_start=642
-  _globals['_SENDMESSAGERESPONSE']._serialized_end=675
-  _globals['_REQUESTMESSAGESREQUEST']._serialized_start=677
-  _globals['_REQUESTMESSAGESREQUEST']._serialized_end=746
-  _globals['_REQUESTMESSAGESRESPONSE']._serialized_start=748
-  _globals['_REQUESTMESSAGESRESPONSE']._serialized_end=817
-  _globals['_DELETEMESSAGESREQUEST']._serialized_start=819
-  _globals['_DELETEMESSAGESREQUEST']._serialized_end=875
-  _globals['_DELETEACCOUNTREQUEST']._serialized_start=877
-  _globals['_DELETEACCOUNTREQUEST']._serialized_end=920
-  _globals['_EMPTY']._serialized_start=922
-  _globals['_EMPTY']._serialized_end=929
-  _globals['_CHATSERVICE']._serialized_start=932
-  _globals['_CHATSERVICE']._serialized_end=1600
+  _globals['_CHATMESSAGE']._serialized_end=169
+  _globals['_ACCOUNTLOOKUPREQUEST']._serialized_start=171
+  _globals['_ACCOUNTLOOKUPREQUEST']._serialized_end=211
+  _globals['_ACCOUNTLOOKUPRESPONSE']._serialized_start=213
+  _globals['_ACCOUNTLOOKUPRESPONSE']._serialized_end=275
+  _globals['_LOGINCREATEREQUEST']._serialized_start=277
+  _globals['_LOGINCREATEREQUEST']._serialized_end=338
+  _globals['_LOGINCREATERESPONSE']._serialized_start=340
+  _globals['_LOGINCREATERESPONSE']._serialized_end=455
+  _globals['_RESUMESESSIONREQUEST']._serialized_start=457
+  _globals['_RESUMESESSIONREQUEST']._serialized_end=500
+  _globals['_RESUMESESSIONRESPONSE']._serialized_start=502
+  _globals['_RESUMESESSIONRESPONSE']._serialized_end=616
+  _globals['_LISTACCOUNTSREQUEST']._serialized_start=618
+  _globals['_LISTACCOUNTSREQUEST']._serialized_end=732
+  _globals['_LISTACCOUNTSRESPONSE']._serialized_start=734
+  _globals['_LISTACCOUNTSRESPONSE']._serialized_end=796
+  _globals['_SENDMESSAGEREQUEST']._serialized_start=798
+  _globals['_SENDMESSAGEREQUEST']._serialized_end=899
+  _globals['_SENDMESSAGERESPONSE']._serialized_start=901
+  _globals['_SENDMESSAGERESPONSE']._serialized_end=934
+  _globals['_OUTGOINGMESSAGE']._serialized_start=936
+  _globals['_OUTGOINGMESSAGE']._serialized_end=989
+  _globals['_SENDMESSAGESREQUEST']._serialized_start=991
+  _globals['_SENDMESSAGESREQUEST']._serialized_end=1081
+  _globals['_SENDMESSAGESRESULT']._serialized_start=1083
+  _globals['_SENDMESSAGESRESULT']._serialized_end=1171
+  _globals['_SENDMESSAGESRESPONSE']._serialized_start=1173
+  _globals['_SENDMESSAGESRESPONSE']._serialized_end=1245
+  _globals['_REQUESTMESSAGESREQUEST']._serialized_start=1248
+  _globals['_REQUESTMESSAGESREQUEST']._serialized_end=1401
+  _globals['_REQUESTMESSAGESRESPONSE']._serialized_start=1403
+  _globals['_REQUESTMESSAGESRESPONSE']._serialized_end=1514
+  _globals['_SUBSCRIBEMESSAGESREQUEST']._serialized_start=1516
+  _globals['_SUBSCRIBEMESSAGESREQUEST']._serialized_end=1607
+  _globals['_ACKMESSAGESREQUEST']._serialized_start=1609
+  _globals['_ACKMESSAGESREQUEST']._serialized_end=1684
+  _globals['_ACKMESSAGESRESPONSE']._serialized_start=1686
+  _globals['_ACKMESSAGESRESPONSE']._serialized_end=1732
+  _globals['_LISTMESSAGESREQUEST']._serialized_start=1735
+  _globals['_LISTMESSAGESREQUEST']._serialized_end=1874
+  _globals['_LISTMESSAGESRESPONSE']._serialized_start=1876
+  _globals['_LISTMESSAGESRESPONSE']._serialized_end=1942
+  _globals['_UPLOADATTACHMENTREQUEST']._serialized_start=1944
+  _globals['_UPLOADATTACHMENTREQUEST']._serialized_end=2004
+  _globals['_UPLOADATTACHMENTRESPONSE']._serialized_start=2006
+  _globals['_UPLOADATTACHMENTRESPONSE']._serialized_end=2069
+  _globals['_DOWNLOADATTACHMENTREQUEST']._serialized_start=2071
+  _globals['_DOWNLOADATTACHMENTREQUEST']._serialized_end=2142
+  _globals['_ATTACHMENTCHUNK']._serialized_start=2144
+  _globals['_ATTACHMENTCHUNK']._serialized_end=2175
+  _globals['_LOOKUPUSERNAMESREQUEST']._serialized_start=2177
+  _globals['_LOOKUPUSERNAMESREQUEST']._serialized_end=2234
+  _globals['_LOOKUPUSERNAMESRESPONSE']._serialized_start=2236
+  _globals['_LOOKUPUSERNAMESRESPONSE']._serialized_end=2301
+  _globals['_DELETEMESSAGESREQUEST']._serialized_start=2303
+  _globals['_DELETEMESSAGESREQUEST']._serialized_end=2359
+  _globals['_DELETEACCOUNTREQUEST']._serialized_start=2361
+  _globals['_DELETEACCOUNTREQUEST']._serialized_end=2404
+  _globals['_EMPTY']._serialized_start=2406
+  _globals['_EMPTY']._serialized_end=2413
+  _globals['_SESSIONREQUEST']._serialized_start=2416
+  _globals['_SESSIONREQUEST']._serialized_end=2848
+  _globals['_SESSIONERROR']._serialized_start=2850
+  _globals['_SESSIONERROR']._serialized_end=2899
+  _globals['_SESSIONRESPONSE']._serialized_start=2902
+  _globals['_SESSIONRESPONSE']._serialized_end=3346
+  _globals['_CHATSERVICE']._serialized_start=3349
+  _globals['_CHATSERVICE']._serialized_end=4818
 # @@protoc_insertion_point(module_scope)
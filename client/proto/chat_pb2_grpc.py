@@ -50,21 +50,61 @@ class ChatServiceStub(object):
             request_serializer=chat__pb2.LoginCreateRequest.SerializeToString,
             response_deserializer=chat__pb2.LoginCreateResponse.FromString,
             _registered_method=True)
+        self.ResumeSession = channel.unary_unary(
+            '/edu.harvard.ChatService/ResumeSession',
+            request_serializer=chat__pb2.ResumeSessionRequest.SerializeToString,
+            response_deserializer=chat__pb2.ResumeSessionResponse.FromString,
+            _registered_method=True)
         self.ListAccounts = channel.unary_unary(
             '/edu.harvard.ChatService/ListAccounts',
             request_serializer=chat__pb2.ListAccountsRequest.SerializeToString,
             response_deserializer=chat__pb2.ListAccountsResponse.FromString,
             _registered_method=True)
+        self.LookupUsernames = channel.unary_unary(
+            '/edu.harvard.ChatService/LookupUsernames',
+            request_serializer=chat__pb2.LookupUsernamesRequest.SerializeToString,
+            response_deserializer=chat__pb2.LookupUsernamesResponse.FromString,
+            _registered_method=True)
         self.SendMessage = channel.unary_unary(
             '/edu.harvard.ChatService/SendMessage',
             request_serializer=chat__pb2.SendMessageRequest.SerializeToString,
             response_deserializer=chat__pb2.SendMessageResponse.FromString,
             _registered_method=True)
+        self.SendMessages = channel.unary_unary(
+            '/edu.harvard.ChatService/SendMessages',
+            request_serializer=chat__pb2.SendMessagesRequest.SerializeToString,
+            response_deserializer=chat__pb2.SendMessagesResponse.FromString,
+            _registered_method=True)
         self.RequestMessages = channel.unary_unary(
             '/edu.harvard.ChatService/RequestMessages',
             request_serializer=chat__pb2.RequestMessagesRequest.SerializeToString,
             response_deserializer=chat__pb2.RequestMessagesResponse.FromString,
             _registered_method=True)
+        self.SubscribeMessages = channel.unary_stream(
+            '/edu.harvard.ChatService/SubscribeMessages',
+            request_serializer=chat__pb2.SubscribeMessagesRequest.SerializeToString,
+            response_deserializer=chat__pb2.RequestMessagesResponse.FromString,
+            _registered_method=True)
+        self.AckMessages = channel.unary_unary(
+            '/edu.harvard.ChatService/AckMessages',
+            request_serializer=chat__pb2.AckMessagesRequest.SerializeToString,
+            response_deserializer=chat__pb2.AckMessagesResponse.FromString,
+            _registered_method=True)
+        self.ListMessages = channel.unary_unary(
+            '/edu.harvard.ChatService/ListMessages',
+            request_serializer=chat__pb2.ListMessagesRequest.SerializeToString,
+            response_deserializer=chat__pb2.ListMessagesResponse.FromString,
+            _registered_method=True)
+        self.UploadAttachment = channel.stream_unary(
+            '/edu.harvard.ChatService/UploadAttachment',
+            request_serializer=chat__pb2.UploadAttachmentRequest.SerializeToString,
+            response_deserializer=chat__pb2.UploadAttachmentResponse.FromString,
+            _registered_method=True)
+        self.DownloadAttachment = channel.unary_stream(
+            '/edu.harvard.ChatService/DownloadAttachment',
+            request_serializer=chat__pb2.DownloadAttachmentRequest.SerializeToString,
+            response_deserializer=chat__pb2.AttachmentChunk.FromString,
+            _registered_method=True)
         self.DeleteMessages = channel.unary_unary(
             '/edu.harvard.ChatService/DeleteMessages',
             request_serializer=chat__pb2.DeleteMessagesRequest.SerializeToString,
@@ -75,6 +115,11 @@ class ChatServiceStub(object):
             request_serializer=chat__pb2.DeleteAccountRequest.SerializeToString,
             response_deserializer=chat__pb2.Empty.FromString,
             _registered_method=True)
+        self.Session = channel.stream_stream(
+            '/edu.harvard.ChatService/Session',
+            request_serializer=chat__pb2.SessionRequest.SerializeToString,
+            response_deserializer=chat__pb2.SessionResponse.FromString,
+            _registered_method=True)
 
 
 class ChatServiceServicer(object):
@@ -98,24 +143,72 @@ class ChatServiceServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def ResumeSession(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
     def ListAccounts(self, request, context):
         """Missing associated documentation comment in .proto file."""
         context.set_code(grpc.StatusCode.UNIMPLEMENTED)
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def LookupUsernames(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
     def SendMessage(self, request, context):
         """Missing associated documentation comment in .proto file."""
         context.set_code(grpc.StatusCode.UNIMPLEMENTED)
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def SendMessages(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
     def RequestMessages(self, request, context):
         """Missing associated documentation comment in .proto file."""
         context.set_code(grpc.StatusCode.UNIMPLEMENTED)
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def SubscribeMessages(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def AckMessages(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def ListMessages(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def UploadAttachment(self, request_iterator, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def DownloadAttachment(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
     def DeleteMessages(self, request, context):
         """Missing associated documentation comment in .proto file."""
         context.set_code(grpc.StatusCode.UNIMPLEMENTED)
@@ -128,6 +221,12 @@ class ChatServiceServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def Session(self, request_iterator, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
 
 def add_ChatServiceServicer_to_server(servicer, server):
     rpc_method_handlers = {
@@ -146,21 +245,61 @@ def add_ChatServiceServicer_to_server(servicer, server):
             request_deserializer=chat__pb2.LoginCreateRequest.FromString,
             response_serializer=chat__pb2.LoginCreateResponse.SerializeToString,
         ),
+        'ResumeSession': grpc.unary_unary_rpc_method_handler(
+            servicer.ResumeSession,
+            request_deserializer=chat__pb2.ResumeSessionRequest.FromString,
+            response_serializer=chat__pb2.ResumeSessionResponse.SerializeToString,
+        ),
         'ListAccounts': grpc.unary_unary_rpc_method_handler(
             servicer.ListAccounts,
             request_deserializer=chat__pb2.ListAccountsRequest.FromString,
             response_serializer=chat__pb2.ListAccountsResponse.SerializeToString,
         ),
+        'LookupUsernames': grpc.unary_unary_rpc_method_handler(
+            servicer.LookupUsernames,
+            request_deserializer=chat__pb2.LookupUsernamesRequest.FromString,
+            response_serializer=chat__pb2.LookupUsernamesResponse.SerializeToString,
+        ),
         'SendMessage': grpc.unary_unary_rpc_method_handler(
             servicer.SendMessage,
             request_deserializer=chat__pb2.SendMessageRequest.FromString,
             response_serializer=chat__pb2.SendMessageResponse.SerializeToString,
         ),
+        'SendMessages': grpc.unary_unary_rpc_method_handler(
+            servicer.SendMessages,
+            request_deserializer=chat__pb2.SendMessagesRequest.FromString,
+            response_serializer=chat__pb2.SendMessagesResponse.SerializeToString,
+        ),
         'RequestMessages': grpc.unary_unary_rpc_method_handler(
             servicer.RequestMessages,
             request_deserializer=chat__pb2.RequestMessagesRequest.FromString,
             response_serializer=chat__pb2.RequestMessagesResponse.SerializeToString,
         ),
+        'SubscribeMessages': grpc.unary_stream_rpc_method_handler(
+            servicer.SubscribeMessages,
+            request_deserializer=chat__pb2.SubscribeMessagesRequest.FromString,
+            response_serializer=chat__pb2.RequestMessagesResponse.SerializeToString,
+        ),
+        'AckMessages': grpc.unary_unary_rpc_method_handler(
+            servicer.AckMessages,
+            request_deserializer=chat__pb2.AckMessagesRequest.FromString,
+            response_serializer=chat__pb2.AckMessagesResponse.SerializeToString,
+        ),
+        'ListMessages': grpc.unary_unary_rpc_method_handler(
+            servicer.ListMessages,
+            request_deserializer=chat__pb2.ListMessagesRequest.FromString,
+            response_serializer=chat__pb2.ListMessagesResponse.SerializeToString,
+        ),
+        'UploadAttachment': grpc.stream_unary_rpc_method_handler(
+            servicer.UploadAttachment,
+            request_deserializer=chat__pb2.UploadAttachmentRequest.FromString,
+            response_serializer=chat__pb2.UploadAttachmentResponse.SerializeToString,
+        ),
+        'DownloadAttachment': grpc.unary_stream_rpc_method_handler(
+            servicer.DownloadAttachment,
+            request_deserializer=chat__pb2.DownloadAttachmentRequest.FromString,
+            response_serializer=chat__pb2.AttachmentChunk.SerializeToString,
+        ),
         'DeleteMessages': grpc.unary_unary_rpc_method_handler(
             servicer.DeleteMessages,
             request_deserializer=chat__pb2.DeleteMessagesRequest.FromString,
@@ -171,6 +310,11 @@ def add_ChatServiceServicer_to_server(servicer, server):
             request_deserializer=chat__pb2.DeleteAccountRequest.FromString,
             response_serializer=chat__pb2.Empty.SerializeToString,
         ),
+        'Session': grpc.stream_stream_rpc_method_handler(
+            servicer.Session,
+            request_deserializer=chat__pb2.SessionRequest.FromString,
+            response_serializer=chat__pb2.SessionResponse.SerializeToString,
+        ),
     }
     generic_handler = grpc.method_handlers_generic_handler(
         'edu.harvard.ChatService', rpc_method_handlers)
@@ -265,6 +409,33 @@ class ChatService(object):
             metadata,
             _registered_method=True)
 
+    @staticmethod
+    def ResumeSession(request,
+                      target,
+                      options=(),
+                      channel_credentials=None,
+                      call_credentials=None,
+                      insecure=False,
+                      compression=None,
+                      wait_for_ready=None,
+                      timeout=None,
+                      metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/edu.harvard.ChatService/ResumeSession',
+            chat__pb2.ResumeSessionRequest.SerializeToString,
+            chat__pb2.ResumeSessionResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
     @staticmethod
     def ListAccounts(request,
                      target,
@@ -292,6 +463,33 @@ class ChatService(object):
             metadata,
             _registered_method=True)
 
+    @staticmethod
+    def LookupUsernames(request,
+                        target,
+                        options=(),
+                        channel_credentials=None,
+                        call_credentials=None,
+                        insecure=False,
+                        compression=None,
+                        wait_for_ready=None,
+                        timeout=None,
+                        metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/edu.harvard.ChatService/LookupUsernames',
+            chat__pb2.LookupUsernamesRequest.SerializeToString,
+            chat__pb2.LookupUsernamesResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
     @staticmethod
     def SendMessage(request,
                     target,
@@ -319,6 +517,33 @@ class ChatService(object):
             metadata,
             _registered_method=True)
 
+    @staticmethod
+    def SendMessages(request,
+                     target,
+                     options=(),
+                     channel_credentials=None,
+                     call_credentials=None,
+                     insecure=False,
+                     compression=None,
+                     wait_for_ready=None,
+                     timeout=None,
+                     metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/edu.harvard.ChatService/SendMessages',
+            chat__pb2.SendMessagesRequest.SerializeToString,
+            chat__pb2.SendMessagesResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
     @staticmethod
     def RequestMessages(request,
                         target,
@@ -346,6 +571,141 @@ class ChatService(object):
             metadata,
             _registered_method=True)
 
+    @staticmethod
+    def SubscribeMessages(request,
+                          target,
+                          options=(),
+                          channel_credentials=None,
+                          call_credentials=None,
+                          insecure=False,
+                          compression=None,
+                          wait_for_ready=None,
+                          timeout=None,
+                          metadata=None):
+        return grpc.experimental.unary_stream(
+            request,
+            target,
+            '/edu.harvard.ChatService/SubscribeMessages',
+            chat__pb2.SubscribeMessagesRequest.SerializeToString,
+            chat__pb2.RequestMessagesResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def AckMessages(request,
+                    target,
+                    options=(),
+                    channel_credentials=None,
+                    call_credentials=None,
+                    insecure=False,
+                    compression=None,
+                    wait_for_ready=None,
+                    timeout=None,
+                    metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/edu.harvard.ChatService/AckMessages',
+            chat__pb2.AckMessagesRequest.SerializeToString,
+            chat__pb2.AckMessagesResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def ListMessages(request,
+                     target,
+                     options=(),
+                     channel_credentials=None,
+                     call_credentials=None,
+                     insecure=False,
+                     compression=None,
+                     wait_for_ready=None,
+                     timeout=None,
+                     metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/edu.harvard.ChatService/ListMessages',
+            chat__pb2.ListMessagesRequest.SerializeToString,
+            chat__pb2.ListMessagesResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def UploadAttachment(request_iterator,
+                         target,
+                         options=(),
+                         channel_credentials=None,
+                         call_credentials=None,
+                         insecure=False,
+                         compression=None,
+                         wait_for_ready=None,
+                         timeout=None,
+                         metadata=None):
+        return grpc.experimental.stream_unary(
+            request_iterator,
+            target,
+            '/edu.harvard.ChatService/UploadAttachment',
+            chat__pb2.UploadAttachmentRequest.SerializeToString,
+            chat__pb2.UploadAttachmentResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def DownloadAttachment(request,
+                           target,
+                           options=(),
+                           channel_credentials=None,
+                           call_credentials=None,
+                           insecure=False,
+                           compression=None,
+                           wait_for_ready=None,
+                           timeout=None,
+                           metadata=None):
+        return grpc.experimental.unary_stream(
+            request,
+            target,
+            '/edu.harvard.ChatService/DownloadAttachment',
+            chat__pb2.DownloadAttachmentRequest.SerializeToString,
+            chat__pb2.AttachmentChunk.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
     @staticmethod
     def DeleteMessages(request,
                        target,
@@ -399,3 +759,30 @@ class ChatService(object):
             timeout,
             metadata,
             _registered_method=True)
+
+    @staticmethod
+    def Session(request_iterator,
+                target,
+                options=(),
+                channel_credentials=None,
+                call_credentials=None,
+                insecure=False,
+                compression=None,
+                wait_for_ready=None,
+                timeout=None,
+                metadata=None):
+        return grpc.experimental.stream_stream(
+            request_iterator,
+            target,
+            '/edu.harvard.ChatService/Session',
+            chat__pb2.SessionRequest.SerializeToString,
+            chat__pb2.SessionResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
@@ -0,0 +1,118 @@
+"""
+Benchmark of request compression: bytes on the wire and SendMessage latency per
+message size, with no compression, gzip and deflate.
+
+Needs a running server (configured in config.json, like the integration tests).
+Run from client/tests:
+
+    python benchmark_compression.py [--calls N]
+"""
+import argparse
+import gzip
+import os
+import random
+import statistics
+import sys
+import time
+import zlib
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.abspath(os.path.join(current_dir, '..')))
+
+from network import ChatClient  # noqa: E402
+from proto import chat_pb2  # noqa: E402
+import config  # noqa: E402
+
+# Message sizes (characters) to measure, up to the maximum message length
+MESSAGE_SIZES = (16, 256, 1024, 4096, 16384, 65535)
+ALGORITHMS = ("none", "gzip", "deflate")
+# Vocabulary for chat-like text (compresses far less than repeated characters)
+WORDS = ["the", "a", "meeting", "tomorrow", "at", "noon", "sounds", "good", "see", "you", "there",
+         "did", "finish", "problem", "set", "lecture", "notes", "server", "client", "thanks",
+         "lunch", "library", "maybe", "later", "tonight", "deadline", "was", "moved", "friday"]
+PASSWORD = "benchmark_password"
+
+
+def chat_text(length, rng):
+    """
+    :param length: Number of characters
+    :param rng: random.Random
+    :return: Chat-like text of exactly length characters
+    """
+    words = []
+    size = 0
+    while size < length:
+        word = rng.choice(WORDS)
+        words.append(word)
+        size += len(word) + 1
+    return " ".join(words)[:length]
+
+
+def wire_size(request, algorithm):
+    """
+    Size of the request's message body as sent (compressed with the same codec gRPC uses).
+
+    :param request: The protobuf request
+    :param algorithm: "none", "gzip" or "deflate"
+    :return: Bytes
+    """
+    payload = request.SerializeToString()
+    if algorithm == "gzip":
+        return len(gzip.compress(payload))
+    if algorithm == "deflate":
+        return len(zlib.compress(payload))
+    return len(payload)
+
+
+def connect(client_config, username, algorithm):
+    """
+    Log in (or create) a benchmark account with a client using the algorithm for every request.
+
+    :return: ChatClient
+    """
+    client = ChatClient(client_config["host"], client_config["port"], client_config["max_msg"],
+                        client_config["max_users"], compression=algorithm, compression_threshold=0)
+    client.account_lookup(username)
+    if client.bcrypt_prefix is None:
+        client.create_account(username, PASSWORD)
+    else:
+        client.login(username, PASSWORD)
+    return client
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--calls", type=int, default=50, help="SendMessage calls per size and algorithm")
+    args = parser.parse_args()
+
+    client_config = config.get_config("../../config.json")
+    rng = random.Random(262)
+    clients = {algorithm: connect(client_config, f"bench_{algorithm}", algorithm)
+               for algorithm in ALGORITHMS}
+
+    print(f"{'size':>6} {'algorithm':>9} {'bytes':>7} {'ratio':>6} {'p50 ms':>8} {'mean ms':>8}")
+    for size in MESSAGE_SIZES:
+        message = chat_text(size, rng)
+        request = chat_pb2.SendMessageRequest(recipient="bench_none", message=message)
+        uncompressed = wire_size(request, "none")
+        for algorithm in ALGORITHMS:
+            client = clients[algorithm]
+            # Users cannot message themselves
+            recipient = "bench_gzip" if algorithm == "none" else "bench_none"
+            client.send_message(recipient, message)  # Warm up
+            latencies = []
+            for _ in range(args.calls):
+                started = time.perf_counter()
+                client.send_message(recipient, message)
+                latencies.append((time.perf_counter() - started) * 1000)
+            compressed = wire_size(request, algorithm)
+            print(f"{size:>6} {algorithm:>9} {compressed:>7} {compressed / uncompressed:>6.2f} "
+                  f"{statistics.median(latencies):>8.3f} {statistics.mean(latencies):>8.3f}")
+
+    # The accounts are kept (deleted usernames stay claimed), so reruns log back in
+    for client in clients.values():
+        client.stop_polling_messages()
+
+
+if __name__ == "__main__":
+    main()
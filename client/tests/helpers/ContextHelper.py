@@ -11,7 +11,9 @@ class ContextHelper:
 
     def clear(self):
         self.messages = []
+        self.batches = []  # Every batch received, in order
 
     def message_callback(self, msgs):
         print(f"[CALLBACK] Received messages: {msgs}")
         self.messages = msgs
+        self.batches.append(msgs)
@@ -1,6 +1,11 @@
 import time
 import sys
+import threading
 import os
+import hashlib
+import io
+import asyncio
+import uuid
 import pytest
 from contextlib import contextmanager
 from helpers.ContextHelper import ContextHelper
@@ -13,8 +18,22 @@ client_root = os.path.abspath(os.path.join(current_dir, '..'))
 sys.path.insert(0, client_root)
 
 # Create symlinks or copy proto files if needed
+import network
 from network import ChatClient
+from async_network import AsyncChatClient
+from PollScheduler import PollScheduler
+from PrefixCache import PrefixCache
+from MessageHistory import MessageHistory
+from MessageIterator import MessageIterator
+from SessionPool import SessionPool
+from SessionStore import SessionStore
+from SessionMetadataInterceptor import SESSION_METADATA_KEY, session_token
+import BytesTrackingInterceptor
+import bcrypt
 import config
+import grpc
+from concurrent import futures
+from proto import chat_pb2, chat_pb2_grpc
 
 # -----------------------------------------------------------------------------
 # Helper Functions
@@ -30,9 +49,31 @@ def test_context():
 
 
 @contextmanager
-def client_connection():
+def client_connection(use_subscription=False, use_session_stream=False, deadlines=None, hedge_requests=False,
+                      use_outbox=False, compact_sender=False, session_metadata=True, compression="gzip",
+                      prefix_cache_file=None, session_file=None, endpoints=None, failover_after=10,
+                      rpc_concurrency=None, rpc_rate=network.DEFAULT_RATE, rpc_burst=network.DEFAULT_BURST,
+                      manual_ack=True, count_wire_bytes=False):
     """
     Set up a ChatClient instance and connect to the server.
+
+    :param use_subscription: Receive messages over the server stream instead of polling
+    :param use_session_stream: Send commands over the multiplexed Session stream
+    :param deadlines: Per-RPC deadlines overriding the defaults
+    :param hedge_requests: Hedge idempotent calls
+    :param use_outbox: Queue sent messages in the outbox
+    :param compact_sender: Receive message senders as account IDs
+    :param session_metadata: Send the session as call metadata instead of in requests
+    :param compression: Algorithm for requests above the size threshold
+    :param prefix_cache_file: File caching bcrypt prefixes across clients
+    :param session_file: File saving the session across clients
+    :param endpoints: Servers to probe and choose from instead of the configured one
+    :param failover_after: Seconds of channel failure before switching endpoints
+    :param rpc_concurrency: Calls in flight allowed per priority class
+    :param rpc_rate: Calls per second allowed by the scheduler
+    :param rpc_burst: Burst size of the scheduler's rate limit
+    :param manual_ack: Acknowledge messages after the callback instead of on delivery
+    :param count_wire_bytes: Count framing, headers and compressed sizes in the byte counts
     """
     client_config = config.get_config("../../config.json")
     host = client_config["host"]
@@ -41,12 +82,21 @@ def client_connection():
     max_users = client_config["max_users"]
 
     # Create a client based on the protocol
-    client = ChatClient(host, port, max_msg, max_users)
+    client = ChatClient(host, port, max_msg, max_users,
+                        use_subscription=use_subscription, use_session_stream=use_session_stream,
+                        deadlines=deadlines, hedge_requests=hedge_requests, use_outbox=use_outbox,
+                        compact_sender=compact_sender, session_metadata=session_metadata,
+                        compression=compression, prefix_cache_file=prefix_cache_file,
+                        session_file=session_file, endpoints=endpoints, failover_after=failover_after,
+                        rpc_concurrency=rpc_concurrency, rpc_rate=rpc_rate, rpc_burst=rpc_burst,
+                        manual_ack=manual_ack, count_wire_bytes=count_wire_bytes)
 
     try:
         yield client
     finally:
         client.stop_polling_messages()
+        client.close_session_stream()
+        client.close_outbox()
         time.sleep(1)  # Wait for server to close connection
 
 
@@ -60,6 +110,14 @@ def test_server_connection():
     with client_connection() as client:
         client.start_polling_messages()
         assert client.running == True, "Client failed to connect to server"
+        assert client.get_poll_rate() > 0, "Client should report its poll rate"
+
+        # Connection state is reported once the channel connects
+        states = []
+        client.set_connection_state_callback(states.append)
+        client.account_lookup("any_user")
+        assert wait_for_condition(
+            lambda: states and states[-1] == "READY"), "Client should report a ready connection"
 
 
 def test_lookup_nonexistent_user():
@@ -73,6 +131,10 @@ def test_lookup_nonexistent_user():
         exists = sender_client.account_lookup(username)
         assert not exists, "Lookup should fail for nonexistent user"
         assert sender_client.bcrypt_prefix is None, "Lookup should fail for nonexistent user"
+        # The call is timed into the latency metrics
+        metrics = sender_client.get_metrics()["AccountLookup"]
+        assert metrics["calls"] == 1 and metrics["errors"] == 0, "Lookup should be counted once, without errors"
+        assert 0 < metrics["p50"] <= metrics["max"], "Lookup latency should be recorded"
         bytes_sent = sender_client.bytes_sent
         bytes_received = sender_client.bytes_received
         protocol_type = "grpc"
@@ -99,6 +161,11 @@ def test_create_account():
 
         assert exists, "Lookup should succeed for created user"
         assert sender_client.bcrypt_prefix is not None, "Lookup should succeed for created user"
+
+        # Bytes are also tracked per method
+        stats = sender_client.interceptor.get_method_stats()
+        assert stats["CreateAccount"]["calls"] == 1, "CreateAccount call not counted"
+        assert stats["AccountLookup"]["bytes_received"] > 0, "AccountLookup response not counted"
         bytes_sent = sender_client.bytes_sent
         bytes_received = sender_client.bytes_received
         protocol_type = "grpc"
@@ -136,6 +203,280 @@ def test_login():
                  bytes_received, bytes_sent, time_elapsed)
 
 
+def test_prefix_cache(tmp_path):
+    """
+    Test if a cached bcrypt prefix lets a later client log in without an AccountLookup,
+    and that a stale cached prefix is refreshed when login fails.
+    """
+    start_time = time.time()
+    cache_file = str(tmp_path / "prefixes.json")
+    username = "cached_user"
+    password = "test_password"
+
+    with client_connection(prefix_cache_file=cache_file) as client:
+        client.create_account(username, password)
+
+    with client_connection(prefix_cache_file=cache_file) as client:
+        assert client.cached_account_lookup(username), "Cached account should exist"
+        assert client.login(username, password), "Login with the cached prefix should succeed"
+        assert "AccountLookup" not in client.interceptor.get_method_stats(), \
+            "Login with a cached prefix should not look the account up"
+        real_prefix = client.bcrypt_prefix
+
+    # Replace the cached prefix with a stale one (as if the account had been recreated)
+    PrefixCache(cache_file).put(client.server, username, bcrypt.gensalt().decode())
+    with client_connection(prefix_cache_file=cache_file) as client:
+        assert client.cached_account_lookup(username), "Cached account should exist"
+        assert client.login(username, password), "Login should recover from a stale prefix"
+        assert client.interceptor.get_method_stats()["AccountLookup"]["calls"] == 1, \
+            "Stale prefix should be looked up once"
+        assert PrefixCache(cache_file).get(client.server, username) == real_prefix, \
+            "Stale prefix should be replaced in the cache"
+        bytes_sent = client.bytes_sent
+        bytes_received = client.bytes_received
+        protocol_type = "grpc"
+
+    time_elapsed = time.time() - start_time
+    write_to_log("test_prefix_cache", protocol_type,
+                 bytes_received, bytes_sent, time_elapsed)
+
+
+def test_resume_session(tmp_path):
+    """
+    Test if a later client resumes a saved session without logging in, and that an
+    invalid saved session is forgotten.
+    """
+    start_time = time.time()
+    session_file = str(tmp_path / "session.json")
+    username = "resume_user"
+    password = "test_password"
+
+    with client_connection(session_file=session_file) as client:
+        assert not client.resume_session(), "There should be no session to resume yet"
+        client.create_account(username, password)
+
+    with client_connection(session_file=session_file) as client:
+        assert client.resume_session(), "Saved session should be resumed"
+        assert client.username == username, "Resumed session should restore the username"
+        assert "Login" not in client.interceptor.get_method_stats(), "Resuming should not log in"
+        assert username in [account[1] for account in client.list_accounts(username)], \
+            "Resumed session should authenticate requests"
+        bytes_sent = client.bytes_sent
+        bytes_received = client.bytes_received
+        protocol_type = "grpc"
+
+    # A session the server does not know is forgotten
+    SessionStore(session_file).save(client.server, username, str(uuid.uuid4()), time.time() * 1000 + 60000)
+    with client_connection(session_file=session_file) as client:
+        assert not client.resume_session(), "Invalid session should not be resumed"
+        assert SessionStore(session_file).load(client.server) is None, "Invalid session should be forgotten"
+
+    time_elapsed = time.time() - start_time
+    write_to_log("test_resume_session", protocol_type,
+                 bytes_received, bytes_sent, time_elapsed)
+
+
+def test_bulk_accounts():
+    """
+    Test if many accounts are created and logged into at once, with per-account results.
+    """
+    start_time = time.time()
+    accounts = [(f"bulk_member{i}", f"password{i}") for i in range(6)]
+    with client_connection() as client:
+        keys = client.bulk_create_accounts(accounts, processes=2, max_in_flight=2)
+        assert all(keys[username] for username, _ in accounts), "Every account should be created"
+        assert len(set(keys.values())) == len(accounts), "Every account should get its own session"
+        assert client.session_key is None, "The client's own session should not change"
+
+        keys = client.bulk_login(accounts[:3] + [("bulk_member3", "wrong"), ("no_such_user", "password")],
+                                 processes=2, max_in_flight=2)
+        assert all(keys[username] for username, _ in accounts[:3]), "Every login should succeed"
+        assert keys["bulk_member3"] is None, "Login with the wrong password should fail"
+        assert keys["no_such_user"] is None, "Login to a nonexistent account should fail"
+        assert client.interceptor.get_method_stats()["CreateAccount"]["calls"] == len(accounts), \
+            "Every account should be created with one call"
+        bytes_sent = client.bytes_sent
+        bytes_received = client.bytes_received
+        protocol_type = "grpc"
+
+    time_elapsed = time.time() - start_time
+    write_to_log("test_bulk_accounts", protocol_type,
+                 bytes_received, bytes_sent, time_elapsed)
+
+
+def test_session_pool():
+    """
+    Test if one pool polls many sessions over a single channel, delivering each
+    session's messages to its own callback.
+    """
+    start_time = time.time()
+    accounts = [(f"pool_member{i}", "test_password") for i in range(3)]
+    received = {username: [] for username, _ in accounts}
+    with client_connection() as sender, client_connection() as host:
+        sender.create_account("pool_sender", "test_password")
+        keys = host.bulk_create_accounts(accounts, processes=2)
+
+        callback_threads = set()
+
+        def callback(messages, username):
+            callback_threads.add(threading.current_thread().name)
+            received[username].extend(messages)
+
+        pool = SessionPool(host, tick=0.01, poll_interval=0.2)
+        for username, key in keys.items():
+            pool.add(key, lambda messages, username=username: callback(messages, username))
+        assert len(pool) == len(accounts), "Every session should be pooled"
+
+        for username, _ in accounts:
+            sender.send_message(username, f"Hello {username}")
+
+        def check_messages():
+            return all([message[2] for message in messages] == [f"Hello {username}"]
+                       for username, messages in received.items())
+
+        try:
+            assert wait_for_condition(check_messages, timeout=10), \
+                "Each session should receive only its own messages"
+            assert all(message[1] == "pool_sender" for messages in received.values() for message in messages), \
+                "Messages should keep their sender"
+            assert all(name.startswith("chat-client") for name in callback_threads), \
+                "Callbacks should run on the client's thread pool, not on gRPC's callback thread"
+            assert wait_for_condition(
+                lambda: host.get_scheduler_stats()["background"]["admitted"] >= len(accounts), timeout=5), \
+                "Pooled acknowledgements should go through the client's scheduler"
+        finally:
+            pool.close()
+
+        # A pool on a client with no session of its own looks up compact senders as each
+        # pooled session, and a batch whose callback failed is delivered again
+        with client_connection(compact_sender=True) as compact_host:
+            calls = []
+
+            def fail_once(messages):
+                calls.append([message[1:3] for message in messages])
+                if len(calls) == 1:
+                    raise RuntimeError("Failed to handle the messages")
+
+            username, key = next(iter(keys.items()))
+            pool = SessionPool(compact_host, tick=0.01, poll_interval=0.2)
+            try:
+                pool.add(key, fail_once)
+                sender.send_message(username, "Compact")
+                assert wait_for_condition(lambda: len(calls) >= 2, timeout=10), \
+                    "A pooled session should be polled again after its callback failed"
+                assert calls[:2] == [[("pool_sender", "Compact")]] * 2, \
+                    "The failed batch should be delivered again, with its sender resolved"
+            finally:
+                pool.close()
+            bytes_sent = compact_host.bytes_sent
+            bytes_received = compact_host.bytes_received
+        bytes_sent += sender.bytes_sent + host.bytes_sent
+        bytes_received += sender.bytes_received + host.bytes_received
+        protocol_type = "grpc"
+
+    time_elapsed = time.time() - start_time
+    write_to_log("test_session_pool", protocol_type,
+                 bytes_received, bytes_sent, time_elapsed)
+
+
+def test_endpoint_failover():
+    """
+    Test if the client picks a reachable endpoint, and fails over to another one
+    when the server it uses goes away.
+    """
+    start_time = time.time()
+    client_config = config.get_config("../../config.json")
+    live = f"{client_config['host']}:{client_config['port']}"
+    dead = "localhost:1"
+
+    class StandbyServicer(chat_pb2_grpc.ChatServiceServicer):
+        def AccountLookup(self, request, context):
+            return chat_pb2.AccountLookupResponse(exists=False)
+
+    standby_server = grpc.server(futures.ThreadPoolExecutor(max_workers=2))
+    chat_pb2_grpc.add_ChatServiceServicer_to_server(StandbyServicer(), standby_server)
+    standby = f"localhost:{standby_server.add_insecure_port('localhost:0')}"
+    standby_server.start()
+    try:
+        with client_connection(endpoints=[dead, live], failover_after=0.5) as client:
+            assert client.server == live, "The unreachable endpoint should not be chosen"
+            assert client.endpoints == [live, dead], "Unreachable endpoints should be ranked last"
+            if not client.account_lookup("failover_user"):
+                client.create_account("failover_user", "test_password")
+
+            # Move to the standby, then take it down
+            client.endpoints = [standby, live]
+            client.connect(standby)
+            assert not client.account_lookup("failover_user"), "The standby should answer lookups"
+            standby_server.stop(0)
+            with pytest.raises(grpc.RpcError):
+                client.account_lookup("failover_user")  # Prompts the channel to notice
+
+            assert wait_for_condition(lambda: client.server == live, timeout=10), \
+                "The client should fail over to the live endpoint"
+            assert client.endpoints == [live, standby], "The failed endpoint should become the last resort"
+            assert wait_for_condition(lambda: client.account_lookup("failover_user"), timeout=5), \
+                "Calls should reach the live endpoint after failover"
+            bytes_sent = client.bytes_sent
+            bytes_received = client.bytes_received
+            protocol_type = "grpc"
+    finally:
+        standby_server.stop(0)
+
+    time_elapsed = time.time() - start_time
+    write_to_log("test_endpoint_failover", protocol_type,
+                 bytes_received, bytes_sent, time_elapsed)
+
+
+def test_rpc_scheduler():
+    """
+    Test if interactive calls go ahead of queued polls, and if calls are rate limited.
+    """
+    start_time = time.time()
+    with client_connection(rpc_concurrency={"background": 1}) as client:
+        if not client.account_lookup("scheduler_user"):
+            client.create_account("scheduler_user", "test_password")
+        else:
+            client.login("scheduler_user", "test_password")
+        client.stop_polling_messages()
+
+        # Hold the only background slot, as a parked long poll would
+        client.scheduler.acquire(network.BACKGROUND)
+        poll = client.submit(client.request_messages)
+        assert wait_for_condition(lambda: client.get_scheduler_stats()["background"]["queued"] == 1, timeout=5), \
+            "The poll should wait for a background slot"
+        assert client.account_lookup("scheduler_user"), "Interactive calls should not wait behind polls"
+        assert not poll.done(), "The poll should still be queued"
+        client.scheduler.release(network.BACKGROUND)
+        assert isinstance(poll.result(timeout=5), list), "The poll should run once the slot is free"
+
+        stats = client.get_scheduler_stats()
+        assert stats["background"]["queued"] == 0 and stats["background"]["in_flight"] == 0
+        assert stats["background"]["wait_ms"]["max"] > 0, "The poll's wait should be recorded"
+        assert stats["interactive"]["admitted"] >= 2
+        bytes_sent = client.bytes_sent
+        bytes_received = client.bytes_received
+
+    with client_connection(rpc_rate=10, rpc_burst=1) as client:
+        started = time.monotonic()
+        for _ in range(4):
+            client.account_lookup("scheduler_user")
+        assert time.monotonic() - started >= 0.25, "Calls beyond the burst should wait for tokens"
+        # With a burst of 1, the background reserve must not exceed what the bucket holds
+        admitted = threading.Event()
+        threading.Thread(target=lambda: (client.scheduler.acquire(network.BACKGROUND), admitted.set()),
+                         daemon=True).start()
+        assert admitted.wait(5), "Background calls should still get tokens with a small burst"
+        client.scheduler.release(network.BACKGROUND)
+        bytes_sent += client.bytes_sent
+        bytes_received += client.bytes_received
+        protocol_type = "grpc"
+
+    time_elapsed = time.time() - start_time
+    write_to_log("test_rpc_scheduler", protocol_type,
+                 bytes_received, bytes_sent, time_elapsed)
+
+
 def test_list_accounts():
     """
     Test if the client can request a list of accounts from the server.
@@ -195,6 +536,67 @@ def test_list_accounts():
                  bytes_received, bytes_sent, time_elapsed)
 
 
+def test_session_metadata():
+    """
+    Test that the session sent as call metadata authenticates requests, and that it
+    makes them smaller than carrying the session key in every request.
+    """
+    start_time = time.time()
+    username = "metadata_user"
+    password = "test_password"
+    request_sizes = []
+    for session_metadata in (False, True):
+        with client_connection(session_metadata=session_metadata) as client:
+            client.account_lookup(username)
+            if client.bcrypt_prefix is None:
+                client.create_account(username, password)
+            else:
+                client.login(username, password)
+            accounts = client.list_accounts(username)
+            assert username in [account[1] for account in accounts], "Authenticated request should succeed"
+            stats = client.interceptor.get_method_stats()["ListAccounts"]
+            request_sizes.append(stats["bytes_sent"] / stats["calls"])
+            session_field_size = chat_pb2.ListAccountsRequest(session_key=client.session_key).ByteSize()
+            bytes_sent = client.bytes_sent
+            bytes_received = client.bytes_received
+            protocol_type = "grpc"
+
+    # Each request trades the session key field for the 16-byte token in its metadata
+    token_size = len(SESSION_METADATA_KEY) + 16
+    assert request_sizes[0] - request_sizes[1] == session_field_size - token_size, \
+        "Requests should carry the session token as metadata instead of the session key"
+    assert request_sizes[1] < request_sizes[0], "Requests should be smaller with the session as metadata"
+
+    time_elapsed = time.time() - start_time
+    write_to_log("test_session_metadata", protocol_type,
+                 bytes_received, bytes_sent, time_elapsed)
+
+
+def test_deadlines_and_hedging(monkeypatch):
+    """
+    Test that deadlines are applied per RPC and that hedged lookups return the right answer.
+    """
+    start_time = time.time()
+    # Hedge right away, so every lookup sends a second attempt
+    monkeypatch.setattr(network, "HEDGE_DEFAULT_DELAY_S", 0)
+    with client_connection(deadlines={"AccountLookup": 2}, hedge_requests=True) as client:
+        # Configured deadlines override the defaults
+        assert client.deadlines["AccountLookup"] == 2, "Configured deadline should be used"
+        assert client.deadlines["SendMessage"] == network.DEFAULT_DEADLINES["SendMessage"], \
+            "Other RPCs should keep their default deadlines"
+
+        assert client.account_lookup("user1"), "Hedged lookup should find existing user"
+        assert not client.account_lookup("no_such_user"), "Hedged lookup should not find nonexistent user"
+        assert client.get_metrics()["AccountLookup"]["calls"] >= 2, "Hedged lookups should be timed"
+        bytes_sent = client.bytes_sent
+        bytes_received = client.bytes_received
+        protocol_type = "grpc"
+
+    time_elapsed = time.time() - start_time
+    write_to_log("test_deadlines_and_hedging", protocol_type,
+                 bytes_received, bytes_sent, time_elapsed)
+
+
 def test_send_receive_message(test_context):
     """
     Test if the client can send and receive messages (synchronously).
@@ -258,8 +660,9 @@ def test_send_receive_message(test_context):
         # receiver.request_messages()
 
         # Check if messages were received
+        # (a full page is followed immediately by a poll for the rest of the backlog)
         def check_messages():
-            return len(test_context.messages) == receiver.max_msg and all([msg[1] == "test_sender" for msg in test_context.messages])
+            return any(len(batch) == receiver.max_msg and all([msg[1] == "test_sender" for msg in batch]) for batch in test_context.batches)
 
         assert wait_for_condition(
             check_messages), "(3) Async messages not received in time"
@@ -281,6 +684,583 @@ def test_send_receive_message(test_context):
                  bytes_received, bytes_sent, time_elapsed)
 
 
+def test_subscribe_messages(test_context):
+    """
+    Test if messages are pushed to a client with an open message stream.
+
+    :param test_context: TestContext instance
+    """
+    start_time = time.time()
+    with client_connection() as sender, client_connection(use_subscription=True) as receiver:
+        receiver.set_message_update_callback(test_context.message_callback)
+
+        sender.create_account("stream_sender", "test_password")
+        receiver.create_account("stream_receiver", "test_password")
+
+        sender.send_message("stream_receiver", "Pushed!")
+
+        # Should arrive well within the base poll interval
+        def check_message():
+            return len(test_context.messages) == 1 and test_context.messages[0][1] == "stream_sender" and test_context.messages[0][2] == "Pushed!"
+
+        assert wait_for_condition(
+            check_message, timeout=2), "Pushed message not received in time"
+
+        bytes_sent = sender.bytes_sent + receiver.bytes_sent
+        bytes_received = sender.bytes_received + receiver.bytes_received
+        protocol_type = "grpc"
+
+    time_elapsed = time.time() - start_time
+    write_to_log("test_subscribe_messages", protocol_type,
+                 bytes_received, bytes_sent, time_elapsed)
+
+
+def test_subscription_per_device():
+    """
+    Test if each of a user's devices keeps its own message stream, and if a client
+    subscribes again when the server ends its stream.
+    """
+    start_time = time.time()
+
+    class EndingStreamServicer(chat_pb2_grpc.ChatServiceServicer):
+        def __init__(self):
+            self.subscriptions = 0
+
+        def SubscribeMessages(self, request, context):
+            # End the first stream right away, as when a newer one replaces it
+            self.subscriptions += 1
+            if self.subscriptions > 1:
+                yield chat_pb2.RequestMessagesResponse(
+                    messages=[chat_pb2.ChatMessage(id=1, sender="server", message="Resumed")])
+                while context.is_active():
+                    time.sleep(0.05)
+
+    servicer = EndingStreamServicer()
+    stream_server = grpc.server(futures.ThreadPoolExecutor(max_workers=2))
+    chat_pb2_grpc.add_ChatServiceServicer_to_server(servicer, stream_server)
+    target = f"localhost:{stream_server.add_insecure_port('localhost:0')}"
+    stream_server.start()
+    try:
+        with client_connection() as sender, client_connection(use_subscription=True) as laptop, \
+                client_connection(use_subscription=True) as phone:
+            sender.create_account("device_sender", "test_password")
+            laptop.create_account("device_receiver", "test_password")
+            phone.account_lookup("device_receiver")
+            phone.login("device_receiver", "test_password")
+            received = {"laptop": [], "phone": []}
+            laptop.set_message_update_callback(lambda messages: received["laptop"].extend(messages))
+            phone.set_message_update_callback(lambda messages: received["phone"].extend(messages))
+            laptop.start_receiving_messages()
+            time.sleep(0.5)
+            phone.start_receiving_messages()
+            time.sleep(0.5)
+
+            sender.send_message("device_receiver", "To every device")
+            assert wait_for_condition(lambda: received["laptop"] and received["phone"], timeout=5), \
+                "Both devices should keep receiving after the second one subscribes"
+            assert received["laptop"][0][2] == received["phone"][0][2] == "To every device"
+            assert laptop.running and phone.running
+
+            bytes_sent = sender.bytes_sent + laptop.bytes_sent + phone.bytes_sent
+            bytes_received = sender.bytes_received + laptop.bytes_received + phone.bytes_received
+            protocol_type = "grpc"
+
+        with client_connection(use_subscription=True, manual_ack=False) as client:
+            client.connect(target)
+            client.session_key = str(uuid.uuid4())
+            resumed = []
+            client.set_message_update_callback(resumed.extend)
+            client.start_receiving_messages()
+            assert wait_for_condition(lambda: resumed, timeout=10), \
+                "The client should subscribe again after the server ends its stream"
+            assert resumed[0][2] == "Resumed" and servicer.subscriptions == 2
+            client.stop_polling_messages()
+    finally:
+        stream_server.stop(0)
+
+    time_elapsed = time.time() - start_time
+    write_to_log("test_subscription_per_device", protocol_type,
+                 bytes_received, bytes_sent, time_elapsed)
+
+
+def test_session_stream(test_context):
+    """
+    Test if commands sent over the multiplexed Session stream work like unary calls,
+    and take fewer bytes per operation than the same commands as unary calls.
+
+    :param test_context: TestContext instance
+    """
+    start_time = time.time()
+    with client_connection(use_session_stream=True) as sender, client_connection() as receiver:
+        receiver.set_message_update_callback(test_context.message_callback)
+        receiver.start_polling_messages()
+
+        sender.create_account("session_sender", "test_password")
+        receiver.create_account("session_receiver", "test_password")
+        assert sender.session_stream is not None, "Session stream not opened"
+        sender.stop_polling_messages()  # Only the commands below go over the stream
+
+        def operation_bytes(client, operations, methods):
+            """
+            :return: Bytes sent and received per operation by the given methods while running operations
+            """
+            def total():
+                stats = client.interceptor.get_method_stats()
+                return sum(stats[method]["bytes_sent"] + stats[method]["bytes_received"]
+                           for method in methods if method in stats)
+            before = total()
+            count = operations()
+            return (total() - before) / count
+
+        # Several commands on the same stream
+        def stream_operations():
+            for i in range(3):
+                assert sender.send_message(
+                    "session_receiver", f"Session {i}"), f"Message {i} not sent"
+            accounts = sender.list_accounts("session_")
+            assert len(accounts) == 2, "List of accounts should contain both session users"
+            return 4
+        stream_bytes = operation_bytes(sender, stream_operations, ["Session"])
+
+        # The same commands as unary calls
+        def unary_operations():
+            for i in range(3):
+                assert receiver.send_message("session_sender", f"Unary {i}"), f"Message {i} not sent"
+            receiver.list_accounts("session_")
+            return 4
+        unary_bytes = operation_bytes(receiver, unary_operations, ["SendMessage", "ListAccounts"])
+        assert 0 < stream_bytes < unary_bytes, \
+            f"Stream commands ({stream_bytes} bytes each) should be smaller than unary calls ({unary_bytes})"
+
+        def check_messages():
+            received = [msg for batch in test_context.batches for msg in batch]
+            return len(received) == 3 and all(msg[1] == "session_sender" for msg in received)
+
+        assert wait_for_condition(
+            check_messages, timeout=10), "Messages sent over the session stream not received"
+
+        bytes_sent = sender.bytes_sent + receiver.bytes_sent
+        bytes_received = sender.bytes_received + receiver.bytes_received
+        protocol_type = "grpc"
+
+    time_elapsed = time.time() - start_time
+    write_to_log("test_session_stream", protocol_type,
+                 bytes_received, bytes_sent, time_elapsed)
+
+
+def test_send_many(test_context):
+    """
+    Test if a batch of messages is sent in one call, with failures reported per message.
+
+    :param test_context: TestContext instance
+    """
+    start_time = time.time()
+    with client_connection() as sender, client_connection() as receiver:
+        receiver.set_message_update_callback(test_context.message_callback)
+        receiver.start_polling_messages()
+
+        sender.create_account("batch_sender", "test_password")
+        receiver.create_account("batch_receiver", "test_password")
+
+        ids = sender.send_many([("batch_receiver", "Batch 0"), ("no_such_user", "Lost"),
+                                ("batch_receiver", "Batch 1")], batch_size=2)
+        assert len(ids) == 3, "Every message should get a result"
+        assert ids[0] is not None and ids[2] is not None, "Valid messages should be sent"
+        assert ids[1] is None, "Message to a nonexistent user should fail"
+        assert sender.interceptor.get_method_stats()["SendMessages"]["calls"] == 2, \
+            "Batch should be split by batch_size"
+
+        def check_messages():
+            received = [msg[2] for batch in test_context.batches for msg in batch]
+            return received == ["Batch 0", "Batch 1"]
+
+        assert wait_for_condition(
+            check_messages, timeout=10), "Batched messages not received"
+
+        bytes_sent = sender.bytes_sent + receiver.bytes_sent
+        bytes_received = sender.bytes_received + receiver.bytes_received
+        protocol_type = "grpc"
+
+    time_elapsed = time.time() - start_time
+    write_to_log("test_send_many", protocol_type,
+                 bytes_received, bytes_sent, time_elapsed)
+
+
+def test_iter_messages():
+    """
+    Test if messages can be consumed one at a time from a bounded buffer, with the
+    sync and async iterators.
+    """
+    start_time = time.time()
+    with client_connection() as sender, client_connection() as receiver:
+        sender.create_account("iter_sender", "test_password")
+        receiver.create_account("iter_receiver", "test_password")
+        receiver.stop_polling_messages()
+
+        sender.send_many([("iter_receiver", f"Backlog {i}") for i in range(12)])
+        received = [message[2] for message in receiver.iter_messages(buffer_size=4, follow=False)]
+        assert received == [f"Backlog {i}" for i in range(12)], "The whole backlog should be yielded in order"
+
+        # A consumer that stops reading leaves at most buffer_size messages fetched
+        sender.send_many([("iter_receiver", f"Slow {i}") for i in range(10)])
+        with MessageIterator(receiver, buffer_size=4, follow=False) as iterator:
+            assert next(iterator)[2] == "Slow 0"
+            time.sleep(0.5)
+            assert len(iterator.buffer) <= 4, "Fetching should wait for the consumer"
+            assert [message[2] for message in iterator] == [f"Slow {i}" for i in range(1, 10)]
+
+        # Following waits for new messages
+        messages = receiver.iter_messages(wait_ms=1000)
+        sender.send_message("iter_receiver", "Live")
+        assert next(messages)[2] == "Live", "A followed iterator should yield new messages"
+        messages.close()
+
+        bytes_sent = sender.bytes_sent + receiver.bytes_sent
+        bytes_received = sender.bytes_received + receiver.bytes_received
+
+    with client_connection() as sender:
+        sender.account_lookup("iter_sender")
+        sender.login("iter_sender", "test_password")
+        sender.send_many([("iter_receiver", f"Async {i}") for i in range(6)])
+        bytes_sent += sender.bytes_sent
+        bytes_received += sender.bytes_received
+
+    client_config = config.get_config("../../config.json")
+
+    async def run():
+        receiver = AsyncChatClient(
+            client_config["host"], client_config["port"], client_config["max_msg"], client_config["max_users"])
+        try:
+            await receiver.account_lookup("iter_receiver")
+            await receiver.login("iter_receiver", "test_password")
+            return [message[2] async for message in receiver.iter_messages(buffer_size=4, follow=False)]
+        finally:
+            await receiver.close()
+
+    assert asyncio.run(run()) == [f"Async {i}" for i in range(6)], "The async iterator should yield the backlog"
+    protocol_type = "grpc"
+
+    time_elapsed = time.time() - start_time
+    write_to_log("test_iter_messages", protocol_type,
+                 bytes_received, bytes_sent, time_elapsed)
+
+
+def test_manual_ack(tmp_path):
+    """
+    Test if messages fetched but not handled are delivered again when the session is
+    resumed, and if each session of an account keeps its own cursor.
+    """
+    start_time = time.time()
+    session_file = str(tmp_path / "session.json")
+    expected = [f"Ack {i}" for i in range(3)]
+
+    with client_connection() as sender:
+        with client_connection(session_file=session_file) as receiver:
+            receiver.create_account("ack_receiver", "test_password")
+            receiver.stop_polling_messages()
+            sender.create_account("ack_sender", "test_password")
+            sender.send_many([("ack_receiver", message) for message in expected])
+
+            # The client crashes while handling the batch, so it is never acknowledged
+            crashed = []
+            def crash(messages):
+                crashed.append([message[2] for message in messages])
+                raise RuntimeError("Crashed before handling the messages")
+            receiver.set_message_update_callback(crash)
+            with pytest.raises(RuntimeError):
+                receiver.request_messages()
+            # A failed callback rewinds the session, so the next poll gets the batch again
+            with pytest.raises(RuntimeError):
+                receiver.request_messages()
+            assert crashed == [expected, expected], "A batch whose callback failed should be delivered again"
+            bytes_sent = receiver.bytes_sent
+            bytes_received = receiver.bytes_received
+
+        with client_connection(session_file=session_file) as restarted, client_connection() as other_device:
+            received = []
+            restarted.set_message_update_callback(received.extend)
+            assert restarted.resume_session() == (True, 3), "Unacknowledged messages should still be unread"
+            assert wait_for_condition(lambda: [message[2] for message in received] == expected), \
+                "Unacknowledged messages should be delivered again after resuming"
+            assert wait_for_condition(lambda: "AckMessages" in restarted.interceptor.get_method_stats()), \
+                "Handled messages should be acknowledged"
+
+            # Another device starts past the acknowledged messages, and both get new ones
+            other_received = []
+            other_device.set_message_update_callback(other_received.extend)
+            other_device.account_lookup("ack_receiver")
+            assert other_device.login("ack_receiver", "test_password") == (True, 0)
+            sender.send_message("ack_receiver", "Both devices")
+            assert wait_for_condition(lambda: [message[2] for message in other_received] == ["Both devices"],
+                                      timeout=15), \
+                "A second session should get new messages"
+            assert wait_for_condition(lambda: received[-1][2] == "Both devices", timeout=15), \
+                "The first session should get them too"
+
+            bytes_sent += restarted.bytes_sent + other_device.bytes_sent
+            bytes_received += restarted.bytes_received + other_device.bytes_received
+    protocol_type = "grpc"
+
+    time_elapsed = time.time() - start_time
+    write_to_log("test_manual_ack", protocol_type,
+                 bytes_received, bytes_sent, time_elapsed)
+
+
+def test_failing_callback():
+    """
+    Test if polling and the message stream keep running when the message callback
+    raises, and deliver the batch again once it succeeds.
+    """
+    start_time = time.time()
+    bytes_sent = bytes_received = 0
+    expected = [f"Retry {i}" for i in range(3)]
+
+    with client_connection() as sender:
+        sender.create_account("retry_sender", "test_password")
+        for use_subscription in (False, True):
+            username = f"retry_receiver_{int(use_subscription)}"
+            with client_connection(use_subscription=use_subscription) as receiver:
+                calls = []
+                def fail_once(messages):
+                    calls.append([message[2] for message in messages])
+                    if len(calls) == 1:
+                        raise RuntimeError("Failed to handle the messages")
+                receiver.set_message_update_callback(fail_once)
+                receiver.create_account(username, "test_password")
+                sender.send_many([(username, message) for message in expected])
+
+                assert wait_for_condition(lambda: len(calls) >= 2, timeout=15), \
+                    "Receiving should continue after the callback failed"
+                assert calls[:2] == [expected, expected], "The failed batch should be delivered again"
+                assert receiver.thread.is_alive(), "The receiving thread should survive the failure"
+
+                sender.send_message(username, "Later")
+                assert wait_for_condition(lambda: calls[-1] == ["Later"], timeout=15), \
+                    "Later messages should still be received"
+                bytes_sent += receiver.bytes_sent
+                bytes_received += receiver.bytes_received
+        bytes_sent += sender.bytes_sent
+        bytes_received += sender.bytes_received
+    protocol_type = "grpc"
+
+    time_elapsed = time.time() - start_time
+    write_to_log("test_failing_callback", protocol_type,
+                 bytes_received, bytes_sent, time_elapsed)
+
+
+def test_message_history():
+    """
+    Test if the message history pages backwards through read and unread messages,
+    keeping a bounded number of pages and prefetching the next older one.
+    """
+    start_time = time.time()
+    with client_connection() as sender, client_connection() as receiver:
+        sender.create_account("history_sender", "test_password")
+        receiver.create_account("history_receiver", "test_password")
+        sender.send_many([("history_receiver", f"History {i}") for i in range(25)])
+        assert wait_for_condition(lambda: receiver.list_messages(maximum_number=1)[0][2] == "History 24")
+
+        history = MessageHistory(receiver, page_size=10, max_pages=2)
+        assert [message[2] for message in history.get_page(0)] == [f"History {i}" for i in range(15, 25)], \
+            "The newest page should come first, oldest message first"
+        assert wait_for_condition(lambda: 1 in history.pages), "The next older page should be prefetched"
+        assert [message[2] for message in history.get_page(1)] == [f"History {i}" for i in range(5, 15)]
+        assert [message[2] for message in history.get_page(2)] == [f"History {i}" for i in range(5)]
+        assert not history.has_page(3), "A short page should be the oldest"
+        assert len(history.pages) <= 2, "Only max_pages pages should be kept"
+        assert history.get_page(0)[0][2] == "History 15", "An evicted page should be fetched again"
+
+        # New messages only move the newest page
+        sender.send_message("history_receiver", "History 25")
+        history.refresh()
+        assert history.get_page(0)[-1][2] == "History 25"
+        assert history.get_page(1)[0][2] == "History 6", "Older pages should line up with the new newest page"
+
+        # Oldest first, like ListAccounts
+        assert receiver.list_messages(offset_message_id=history.get_page(1)[0][0], maximum_number=2,
+                                      newest_first=False)[0][2] == "History 7"
+
+        bytes_sent = sender.bytes_sent + receiver.bytes_sent
+        bytes_received = sender.bytes_received + receiver.bytes_received
+    protocol_type = "grpc"
+
+    time_elapsed = time.time() - start_time
+    write_to_log("test_message_history", protocol_type,
+                 bytes_received, bytes_sent, time_elapsed)
+
+
+def test_attachments():
+    """
+    Test if attachments upload in chunks, are stored once per content, arrive with
+    their message and download intact.
+    """
+    start_time = time.time()
+    with client_connection() as sender, client_connection() as receiver:
+        sender.create_account("attachment_sender", "test_password")
+        receiver.create_account("attachment_receiver", "test_password")
+
+        content = os.urandom(1024 * 1024 + 1)
+        attachment_id = sender.upload_attachment(io.BytesIO(content))
+        assert attachment_id == hashlib.sha256(content).hexdigest(), "Attachments should be named by content"
+        assert sender.upload_attachment(io.BytesIO(content), chunk_size=1000) == attachment_id, \
+            "The same content should get the same ID however it is chunked"
+
+        sender.send_message("attachment_receiver", "With a file", [attachment_id])
+        sender.send_message("attachment_receiver", "Without")
+        messages = receiver.request_messages()
+        assert [message[1:] for message in messages] == [
+            ("attachment_sender", "With a file", [attachment_id]), ("attachment_sender", "Without")]
+
+        downloaded = io.BytesIO()
+        assert receiver.download_attachment(attachment_id, downloaded) == len(content)
+        assert downloaded.getvalue() == content
+
+        with pytest.raises(grpc.RpcError) as error:
+            receiver.download_attachment("0" * 64, io.BytesIO())
+        assert error.value.code() == grpc.StatusCode.NOT_FOUND
+        with pytest.raises(grpc.RpcError):
+            sender.send_message("attachment_receiver", "Missing", ["0" * 64])
+
+        bytes_sent = sender.bytes_sent + receiver.bytes_sent
+        bytes_received = sender.bytes_received + receiver.bytes_received
+    protocol_type = "grpc"
+
+    time_elapsed = time.time() - start_time
+    write_to_log("test_attachments", protocol_type,
+                 bytes_received, bytes_sent, time_elapsed)
+
+
+def test_compression(test_context):
+    """
+    Test if only requests above the size threshold are compressed, that both
+    algorithms deliver messages intact, and that wire byte counts reflect compression.
+
+    :param test_context: TestContext instance
+    """
+    start_time = time.time()
+    with client_connection(compression="deflate", count_wire_bytes=True) as sender, \
+            client_connection() as receiver:
+        receiver.set_message_update_callback(test_context.message_callback)
+        receiver.start_polling_messages()
+
+        sender.create_account("compress_sender", "test_password")
+        receiver.create_account("compress_receiver", "test_password")
+
+        large = "compressible " * 1000
+        sender.send_message("compress_receiver", "small")
+        assert sender.compression_interceptor.compressed_calls == 0, "Small requests should not be compressed"
+        sender.send_message("compress_receiver", large)
+        assert sender.compression_interceptor.compressed_calls == 1, "Large requests should be compressed"
+        # Wire bytes count the compressed request, plus the headers including the session token
+        sent = sender.interceptor.get_method_stats()["SendMessage"]["bytes_sent"]
+        token_header = BytesTrackingInterceptor.headers_size(
+            [(SESSION_METADATA_KEY, session_token(sender.session_key))])
+        assert 2 * token_header < sent < len(large) / 4, "The large request should be counted compressed"
+        receiver.send_message("compress_sender", large)
+        assert receiver.compression_interceptor.compressed_calls == 1, "Large requests should be compressed"
+
+        def check_messages():
+            received = [msg[2] for batch in test_context.batches for msg in batch]
+            return received == ["small", large]
+
+        assert wait_for_condition(
+            check_messages, timeout=10), "Compressed messages not received intact"
+
+        bytes_sent = sender.bytes_sent + receiver.bytes_sent
+        bytes_received = sender.bytes_received + receiver.bytes_received
+        protocol_type = "grpc"
+
+    time_elapsed = time.time() - start_time
+    write_to_log("test_compression", protocol_type,
+                 bytes_received, bytes_sent, time_elapsed)
+
+
+def test_outbox(test_context):
+    """
+    Test if queued messages are sent in coalesced batches, in order, with their IDs.
+
+    :param test_context: TestContext instance
+    """
+    start_time = time.time()
+    with client_connection(use_outbox=True) as sender, client_connection() as receiver:
+        receiver.set_message_update_callback(test_context.message_callback)
+        receiver.start_polling_messages()
+
+        sender.create_account("outbox_sender", "test_password")
+        receiver.create_account("outbox_receiver", "test_password")
+
+        # send_message returns at once; the futures resolve to the message IDs
+        futures = [sender.send_message("outbox_receiver", f"Outbox {i}") for i in range(20)]
+        ids = [future.result(timeout=5) for future in futures]
+        assert ids == sorted(ids), "Messages should be stored in the order they were sent"
+        assert sender.interceptor.get_method_stats()["SendMessages"]["calls"] < 20, \
+            "Messages should be coalesced into fewer calls"
+
+        # Failures are reported through the future
+        failed = sender.send_message("no_such_user", "Lost")
+        assert failed.exception(timeout=5) is not None, "Message to a nonexistent user should fail"
+
+        def check_messages():
+            received = [msg[2] for batch in test_context.batches for msg in batch]
+            return received == [f"Outbox {i}" for i in range(20)]
+
+        assert wait_for_condition(
+            check_messages, timeout=10), "Queued messages not received in order"
+
+        # A message cancelled while queued is dropped, and the flusher keeps going
+        sender.outbox.flush_window = 0.5
+        kept = sender.send_message("outbox_receiver", "Kept")
+        cancelled = sender.send_message("outbox_receiver", "Cancelled")
+        assert cancelled.cancel(), "A queued message should be cancellable"
+        assert kept.result(timeout=5)
+        assert sender.send_message("outbox_receiver", "After").result(timeout=5), \
+            "The flusher should survive a cancelled message"
+        assert wait_for_condition(lambda: [msg[2] for batch in test_context.batches for msg in batch][20:] ==
+                                  ["Kept", "After"], timeout=10), "A cancelled message should not be sent"
+
+        bytes_sent = sender.bytes_sent + receiver.bytes_sent
+        bytes_received = sender.bytes_received + receiver.bytes_received
+        protocol_type = "grpc"
+
+    time_elapsed = time.time() - start_time
+    write_to_log("test_outbox", protocol_type,
+                 bytes_received, bytes_sent, time_elapsed)
+
+
+def test_compact_sender(test_context):
+    """
+    Test if senders received as account IDs are resolved to usernames, with one lookup per new sender.
+
+    :param test_context: TestContext instance
+    """
+    start_time = time.time()
+    with client_connection() as sender, client_connection(compact_sender=True) as receiver:
+        receiver.set_message_update_callback(test_context.message_callback)
+        receiver.start_polling_messages()
+
+        sender.create_account("compact_sender", "test_password")
+        receiver.create_account("compact_receiver", "test_password")
+
+        for i in range(3):
+            sender.send_message("compact_receiver", f"Compact {i}")
+            # Wait for each message, so they arrive in separate batches
+            assert wait_for_condition(lambda: any(
+                msg[2] == f"Compact {i}" for batch in test_context.batches for msg in batch), timeout=15), f"Message {i} not received"
+
+        received = [msg for batch in test_context.batches for msg in batch]
+        assert all(msg[1] == "compact_sender" for msg in received), "Sender IDs should be resolved to usernames"
+        assert receiver.interceptor.get_method_stats()["LookupUsernames"]["calls"] == 1, \
+            "A cached sender should not be looked up again"
+
+        bytes_sent = sender.bytes_sent + receiver.bytes_sent
+        bytes_received = sender.bytes_received + receiver.bytes_received
+        protocol_type = "grpc"
+
+    time_elapsed = time.time() - start_time
+    write_to_log("test_compact_sender", protocol_type,
+                 bytes_received, bytes_sent, time_elapsed)
+
+
 def test_delete_message(test_context):
     """
     Test if the client can delete a message.
@@ -346,3 +1326,146 @@ def test_delete_account():
     time_elapsed = time.time() - start_time
     write_to_log("test_delete_account", protocol_type,
                  bytes_received, bytes_sent, time_elapsed)
+
+
+def test_async_send_receive_message():
+    """
+    Test if the asyncio client can send many messages concurrently and receive them.
+    """
+    start_time = time.time()
+    client_config = config.get_config("../../config.json")
+
+    async def run():
+        sender = AsyncChatClient(
+            client_config["host"], client_config["port"], client_config["max_msg"], client_config["max_users"])
+        receiver = AsyncChatClient(
+            client_config["host"], client_config["port"], client_config["max_msg"], client_config["max_users"])
+        try:
+            assert await sender.create_account("async_sender", "test_password"), "Async sender account not created"
+            assert await receiver.create_account("async_receiver", "test_password"), "Async receiver account not created"
+            await receiver.stop_polling_messages()
+
+            # Keep all sends in flight at once on one event loop
+            num_messages = 5
+            results = await asyncio.gather(
+                *[sender.send_message("async_receiver", f"Async {i}") for i in range(num_messages)])
+            assert all(results), "Not all async messages were sent"
+
+            receiver.max_msg = num_messages
+            messages = await receiver.request_messages()
+            assert len(messages) == num_messages, "Async messages not received"
+            assert all(msg[1] == "async_sender" for msg in messages)
+
+            return sender.bytes_sent + receiver.bytes_sent, sender.bytes_received + receiver.bytes_received
+        finally:
+            await sender.close()
+            await receiver.close()
+
+    bytes_sent, bytes_received = asyncio.run(run())
+    protocol_type = "grpc"
+
+    time_elapsed = time.time() - start_time
+    write_to_log("test_async_send_receive_message", protocol_type,
+                 bytes_received, bytes_sent, time_elapsed)
+
+
+def test_async_poll_survives_errors():
+    """
+    Test if the asyncio client keeps polling after failed polls, backing off in between.
+    """
+    start_time = time.time()
+    client_config = config.get_config("../../config.json")
+
+    class FailingStub:
+        """Fails the first polls as if the server were unavailable, then delivers a message."""
+
+        def __init__(self):
+            self.polls = 0
+
+        async def RequestMessages(self, request, timeout=None):
+            self.polls += 1
+            if self.polls <= 2:
+                raise grpc.aio.AioRpcError(grpc.StatusCode.UNAVAILABLE, grpc.aio.Metadata(),
+                                           grpc.aio.Metadata(), "Server unavailable")
+            if self.polls == 3:
+                return chat_pb2.RequestMessagesResponse(
+                    messages=[chat_pb2.ChatMessage(id=1, sender="async_sender", message="Recovered")])
+            return chat_pb2.RequestMessagesResponse()
+
+    async def run():
+        client = AsyncChatClient(
+            client_config["host"], client_config["port"], client_config["max_msg"], client_config["max_users"])
+        client.stub = FailingStub()
+        client.session_key = str(uuid.uuid4())
+        client.reconnect_scheduler = PollScheduler(base_interval=0.05, max_interval=0.2)
+        received = []
+        client.set_message_update_callback(received.extend)
+        try:
+            client.start_polling_messages(poll_interval=0.05)
+            for _ in range(100):
+                if received:
+                    break
+                await asyncio.sleep(0.05)
+            assert [message[2] for message in received] == ["Recovered"], \
+                "Polling should continue after failed polls"
+            assert not client.poll_task.done(), "The polling task should still be running"
+            return client.stub.polls
+        finally:
+            await client.close()
+
+    polls = asyncio.run(run())
+    assert polls >= 3
+    protocol_type = "grpc"
+
+    time_elapsed = time.time() - start_time
+    write_to_log("test_async_poll_survives_errors", protocol_type, 0, 0, time_elapsed)
+
+
+def test_async_deadlines():
+    """
+    Test if the asyncio client gives every call the same per-RPC deadline as the blocking client.
+    """
+    start_time = time.time()
+    client_config = config.get_config("../../config.json")
+
+    class RecordingStub:
+        """Records the deadline of each call and answers it with an empty response."""
+
+        def __init__(self):
+            self.timeouts = {}
+
+        def __getattr__(self, method):
+            async def call(request, timeout=None):
+                self.timeouts[method] = timeout
+                if method == "RequestMessages":
+                    return chat_pb2.RequestMessagesResponse()
+                if method == "SendMessage":
+                    return chat_pb2.SendMessageResponse(id=1)
+                return chat_pb2.ListAccountsResponse()
+            return call
+
+    async def run():
+        client = AsyncChatClient(client_config["host"], client_config["port"], client_config["max_msg"],
+                                 client_config["max_users"], deadlines={"SendMessage": 2})
+        client.stub = RecordingStub()
+        client.session_key = str(uuid.uuid4())
+        try:
+            await client.send_message("someone", "Hi")
+            await client.list_accounts()
+            await client.fetch_messages(10)
+            short_poll = client.stub.timeouts["RequestMessages"]
+            await client.fetch_messages(10, wait_ms=3000)
+            return client.stub.timeouts, short_poll
+        finally:
+            await client.close()
+
+    timeouts, short_poll = asyncio.run(run())
+    assert timeouts["SendMessage"] == 2, "Configured deadlines should override the defaults"
+    assert timeouts["ListAccounts"] == network.DEFAULT_DEADLINES["ListAccounts"]
+    assert short_poll == network.DEFAULT_DEADLINES["RequestMessages"]
+    assert timeouts["RequestMessages"] == 3 + network.LONG_POLL_GRACE_S, \
+        "Long polls should get their wait plus a margin"
+    protocol_type = "grpc"
+
+    time_elapsed = time.time() - start_time
+    write_to_log("test_async_deadlines", protocol_type, 0, 0, time_elapsed)
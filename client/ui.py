@@ -1,8 +1,18 @@
 import math
+import os
+import grpc
 import tkinter as tk
-from tkinter import messagebox
-import threading
-
+from tkinter import filedialog, messagebox
+from MessageHistory import MessageHistory
+
+# How each channel connectivity state is shown (text, color)
+CONNECTION_STATES = {
+    "IDLE": ("Idle", "gray"),
+    "CONNECTING": ("Connecting...", "orange"),
+    "READY": ("Connected", "green"),
+    "TRANSIENT_FAILURE": ("Reconnecting...", "red"),
+    "SHUTDOWN": ("Disconnected", "red"),
+}
 
 class ChatUI:
     """
@@ -21,21 +31,27 @@ class ChatUI:
 
         # Keep track of current pages for list accounts and messages
         self.current_user_page = 0
-        self.current_msg_page = 0
+        self.current_msg_page = 0  # Page of the message history shown (0 for the newest)
 
         self.all_users = []
-        self.all_messages = []
+        self.history = MessageHistory(client, client.max_msg)  # Received messages, loaded a page at a time
+        self.visible_messages = []  # Messages on the current page, oldest first
 
         self.unread_count = 0
 
         self.prev_search = ""  # Store previous search text for user list
 
-        # Set callback
+        self.connection_state = "IDLE"  # Latest channel connectivity state
+        self.connection_label = None  # Shows the connection state on the chat screen
+
+        # Set callbacks
         self.client.set_message_update_callback(self.message_callback)
+        self.client.set_connection_state_callback(self.connection_callback)
 
-        # Start on the login screen
+        # Start on the login screen, skipping it if a saved session can be resumed
         self.root.title("Login")
         self.create_login_screen()
+        self.client.submit(self.resume_session_async)
 
     ### LOGIN + ACCOUNT CREATION WORKFLOW ###
     def create_login_screen(self):
@@ -63,6 +79,23 @@ class ChatUI:
         self.username_entry.bind(
             "<Return>", lambda event: self.check_button.invoke())
 
+    def resume_session_async(self):
+        """
+        Try to resume the saved session in a background thread.
+        """
+        response = self.client.resume_session()
+        if isinstance(response, tuple):
+            self.root.after(0, lambda: self.handle_resume_result(response[1]))
+
+    def handle_resume_result(self, unread_count):
+        """
+        Go straight to the chat screen after resuming a session.
+
+        :param unread_count: The number of unread messages
+        """
+        self.unread_count = unread_count
+        self.create_chat_screen()
+
     def check_username(self):
         """
         Checks if the username exists and prompts for the next step.
@@ -74,8 +107,7 @@ class ChatUI:
             return
 
         # Run lookup in a background thread
-        threading.Thread(target=self.lookup_username_async,
-                         args=(username,), daemon=True).start()
+        self.client.submit(self.lookup_username_async, username)
 
     def lookup_username_async(self, username):
         """
@@ -83,7 +115,7 @@ class ChatUI:
 
         :param username: The username to look up
         """
-        exists = self.client.account_lookup(username)
+        exists = self.client.cached_account_lookup(username)
         self.root.after(0, lambda: self.handle_lookup_result(exists))
 
     def handle_lookup_result(self, lookup_result):
@@ -141,8 +173,7 @@ class ChatUI:
             return
 
         # Run login or account creation in a background thread
-        threading.Thread(target=self.handle_credentials, args=(
-            username, password, login), daemon=True).start()
+        self.client.submit(self.handle_credentials, username, password, login)
 
     def handle_credentials(self, username, password, login):
         """
@@ -224,9 +255,12 @@ class ChatUI:
         settings_frame.grid(row=0, column=0, columnspan=2, sticky="we")
 
         tk.Button(settings_frame, text="Log out", fg="red",
-                  command=self.disconnect).pack(side=tk.LEFT, padx=5, pady=5)
+                  command=self.log_out).pack(side=tk.LEFT, padx=5, pady=5)
         tk.Button(settings_frame, text="Delete Account", fg="red",
                   command=self.confirm_delete_account).pack(side=tk.RIGHT, padx=5, pady=5)
+        self.connection_label = tk.Label(settings_frame)
+        self.connection_label.pack(side=tk.LEFT, padx=5, pady=5)
+        self.update_connection_state(self.connection_state)
 
         # Container to hold both sidebar and chat frame
         container = tk.Frame(self.root)
@@ -291,14 +325,14 @@ class ChatUI:
 
         self.prev_msg_button = tk.Button(self.pagination_frame, text="Older Messages",
                                          command=lambda: self.change_msg_page(
-                                             -1),
+                                             1),
                                          state=tk.DISABLED)
         self.prev_msg_button.pack(side=tk.LEFT, padx=5)
 
         self.next_msg_button = tk.Button(self.pagination_frame, text="Newer Messages",
                                          command=lambda: self.change_msg_page(
-                                             1),
-                                         state=tk.NORMAL if len(self.all_messages) > self.unread_count else tk.DISABLED)
+                                             -1),
+                                         state=tk.DISABLED)
         self.next_msg_button.pack(side=tk.LEFT, padx=5)
 
         # "Delete Selected" button (RIGHT side)
@@ -314,7 +348,10 @@ class ChatUI:
         self.root.bind("<Configure>", self.on_resize)  # Bind resize event
 
         self.load_user_list()
-        self.root.after(0, lambda: self.update_messages([]))  # Load messages
+        # Load the newest messages
+        self.history.reset()
+        self.current_msg_page = 0
+        self.load_msg_page(0)
 
     def on_resize(self, event=None):
         """
@@ -353,7 +390,7 @@ class ChatUI:
         """
         if reset_pages:
             self.current_user_page = 0  # Reset to first page when loading users
-        threading.Thread(target=self.fetch_users, daemon=True).start()
+        self.client.submit(self.fetch_users)
 
     def fetch_users(self):
         """
@@ -453,26 +490,59 @@ class ChatUI:
         :param messages: The list of messages to display
         """
         print("[DEBUG] Got new messages")
-        self.root.after(0, lambda: self.update_messages(messages))
+        self.root.after(0, self.handle_new_messages)
+
+    def handle_new_messages(self):
+        """
+        Reload the newest page when new messages arrive (if it is shown; otherwise it is
+        reloaded when the user returns to it).
+        """
+        self.history.refresh()
+        if self.current_msg_page == 0:
+            self.load_msg_page(0)
+
+    def load_msg_page(self, page):
+        """
+        Start a thread to fetch and display a page of the message history.
+
+        :param page: Page number (0 for the newest messages)
+        """
+        self.client.submit(self.fetch_msg_page, page)
+
+    def fetch_msg_page(self, page):
+        """
+        Fetch a page of the message history in a background thread (the next older
+        page is then prefetched).
+
+        :param page: Page number
+        """
+        messages = self.history.get_page(page)
+        self.root.after(0, lambda: self.handle_msg_page(page, messages))
+
+    def handle_msg_page(self, page, messages):
+        """
+        Handle the results of a message history fetch.
+
+        :param page: Page number
+        :param messages: The page's messages, oldest first
+        """
+        if not messages and page > 0:
+            messagebox.showinfo("No Older Messages", "No more messages to load.")
+            self.update_messages(self.visible_messages)  # Update pagination buttons
+            return
+        self.current_msg_page = page
+        self.update_messages(messages)
 
     def update_messages(self, messages):
         """
-        Update the chat display with messages.
+        Update the chat display with a page of messages.
 
         :param messages: The list of messages to display
         """
         print("[DEBUG] Updating messages")
-        # Make sure only messages with new IDs are added
-        new_messages = [msg for msg in messages if msg[0]
-                        not in self.all_messages]
-        self.all_messages += new_messages  # Append to existing messages
-
-        print(f"[DEBUG] All messages: {self.all_messages}")
-
-        visible_messages = self.all_messages[self.current_msg_page * self.client.max_msg:(
-            self.current_msg_page + 1) * self.client.max_msg]
+        self.visible_messages = messages
 
-        print(f"[DEBUG] Visible messages: {visible_messages}")
+        print(f"[DEBUG] Visible messages: {messages}")
 
         if self.chat_display == None:
             return
@@ -484,7 +554,7 @@ class ChatUI:
         self.message_selection = {}  # Dictionary to store selected messages
 
         # Add message checkboxes for selection
-        for idx, (msg_id, sender, message) in enumerate(visible_messages):
+        for idx, (msg_id, sender, message, *attachments) in enumerate(messages):
             frame = tk.Frame(self.chat_display)
             frame.pack(fill=tk.X, padx=5, pady=2)
 
@@ -502,6 +572,11 @@ class ChatUI:
                            justify="left", wraplength=self.message_wrap_length)
             lbl.pack(side=tk.LEFT, fill=tk.X, expand=True)
 
+            # One save button per attachment
+            for number, attachment_id in enumerate(attachments[0] if attachments else (), start=1):
+                tk.Button(frame, text=f"Attachment {number}", command=lambda attachment_id=attachment_id:
+                          self.save_attachment(attachment_id)).pack(side=tk.RIGHT)
+
             # Bind double click to fill recipient
             lbl.bind("<Double-1>", lambda event,
                      sender=sender: self.open_new_message_window(sender))
@@ -511,13 +586,10 @@ class ChatUI:
 
         # Update pagination buttons
         self.prev_msg_button.config(
+            state=tk.NORMAL if self.history.has_page(self.current_msg_page + 1) else tk.DISABLED)
+        self.next_msg_button.config(
             state=tk.NORMAL if self.current_msg_page > 0 else tk.DISABLED)
 
-        # Calculate total pages
-        total_pages = math.ceil(len(self.all_messages) / self.client.max_msg)
-        self.next_msg_button.config(state=tk.NORMAL if self.current_msg_page < total_pages -
-                                    1 or len(self.all_messages) < self.unread_count else tk.DISABLED)
-
         # Force focus back to chat display
         self.chat_display.focus_set()
 
@@ -533,23 +605,15 @@ class ChatUI:
         """
         Paginate through messages.
 
-        :param direction: The direction to move in the message list
+        :param direction: The direction to move in the message history (1 for older, -1 for newer)
         """
         print("[DEBUG] Changing message page:", direction)
         new_page = self.current_msg_page + direction
         if new_page < 0:
             return
 
-        num_messages = max(len(self.all_messages), self.unread_count)
-        # Calculate total pages
-        total_pages = math.ceil(num_messages / self.client.max_msg)
-        if new_page >= total_pages:
-            return
-
-        self.current_msg_page = new_page
-        print(f"Changing message page to {self.current_msg_page}")
-
-        self.update_messages([])
+        print(f"Changing message page to {new_page}")
+        self.load_msg_page(new_page)
 
     ### SEND MESSAGE WORKFLOW ###
     def fill_recipient(self, event):
@@ -579,7 +643,7 @@ class ChatUI:
 
         new_msg_window = tk.Toplevel(self.root)
         new_msg_window.title("New Message")
-        new_msg_window.geometry("400x250")
+        new_msg_window.geometry("400x300")
 
         # Add padding around the frame
         frame = tk.Frame(new_msg_window, padx=10, pady=20)
@@ -597,20 +661,35 @@ class ChatUI:
         message_entry = tk.Text(new_msg_window, height=5)
         message_entry.pack(fill=tk.BOTH, padx=10, pady=5)
 
+        # Files to upload and attach when the message is sent
+        attachment_paths = []
+        attachment_label = tk.Label(new_msg_window, text="No attachments")
+
+        def add_attachment():
+            path = filedialog.askopenfilename(parent=new_msg_window)
+            if path:
+                attachment_paths.append(path)
+                attachment_label.config(
+                    text=", ".join(os.path.basename(path) for path in attachment_paths))
+
+        tk.Button(new_msg_window, text="Attach File...", command=add_attachment).pack()
+        attachment_label.pack()
+
         tk.Button(new_msg_window, text="Send", command=lambda: self.send_message(
-            recipient_entry, message_entry)).pack(pady=10)
+            recipient_entry, message_entry, attachment_paths)).pack(pady=10)
 
         self.new_msg_window = new_msg_window
 
         # Set focus to recipient entry
         recipient_entry.focus_set()
 
-    def send_message(self, recipient_entry, message_entry):
+    def send_message(self, recipient_entry, message_entry, attachment_paths=()):
         """
         Handles sending the message.
 
         :param recipient_entry: The entry field for the recipient
         :param message_entry: The text field for the message
+        :param attachment_paths: Paths of files to attach
         """
         recipient = recipient_entry.get().strip()
         message = message_entry.get("1.0", tk.END).strip()
@@ -630,9 +709,20 @@ class ChatUI:
             messagebox.showerror("Error", "Recipient not found.")
             return
 
+        if attachment_paths:
+            # Upload the files first; the message is then sent directly
+            self.client.submit(self.process_send_attachments, recipient, message, list(attachment_paths))
+            return
+
+        if self.client.outbox:
+            # The outbox sends in the background: update the UI once the server has the message
+            future = self.client.send_message(recipient, message)
+            future.add_done_callback(lambda f: self.root.after(
+                0, lambda: self.handle_send_message_result(f.exception() is None)))
+            return
+
         # Start thread to send message
-        threading.Thread(target=self.process_send_message, args=(
-            recipient, message), daemon=True).start()
+        self.client.submit(self.process_send_message, recipient, message)
 
     def process_send_message(self, recipient, message):
         """
@@ -644,6 +734,24 @@ class ChatUI:
         success = self.client.send_message(recipient, message)
         self.root.after(0, lambda: self.handle_send_message_result(success))
 
+    def process_send_attachments(self, recipient, message, attachment_paths):
+        """
+        Upload the attachments and send the message in a background thread.
+
+        :param recipient: The recipient of the message
+        :param message: The message to send
+        :param attachment_paths: Paths of files to attach
+        """
+        try:
+            attachment_ids = []
+            for path in attachment_paths:
+                with open(path, "rb") as file:
+                    attachment_ids.append(self.client.upload_attachment(file))
+            success = self.client.send_message(recipient, message, attachment_ids)
+        except (OSError, grpc.RpcError) as e:
+            success = self.client.log_error(f"Sending attachments failed: {e}", False)
+        self.root.after(0, lambda: self.handle_send_message_result(success))
+
     def handle_send_message_result(self, success):
         """
         Handle UI update after sending a message.
@@ -656,6 +764,43 @@ class ChatUI:
         else:
             messagebox.showerror("Error", "Failed to send message.")
 
+    ### ATTACHMENT WORKFLOW ###
+    def save_attachment(self, attachment_id):
+        """
+        Ask where to save an attachment, then download it there.
+
+        :param attachment_id: The attachment's ID
+        """
+        path = filedialog.asksaveasfilename(parent=self.root)
+        if path:
+            self.client.submit(self.process_save_attachment, attachment_id, path)
+
+    def process_save_attachment(self, attachment_id, path):
+        """
+        Download an attachment in a background thread.
+
+        :param attachment_id: The attachment's ID
+        :param path: Where to save it
+        """
+        try:
+            with open(path, "wb") as file:
+                self.client.download_attachment(attachment_id, file)
+            success = True
+        except (OSError, grpc.RpcError) as e:
+            success = self.client.log_error(f"Downloading attachment failed: {e}", False)
+        self.root.after(0, lambda: self.handle_save_attachment_result(success))
+
+    def handle_save_attachment_result(self, success):
+        """
+        Handle UI update after downloading an attachment.
+
+        :param success: Whether the attachment was saved successfully
+        """
+        if success:
+            messagebox.showinfo("Success", "Attachment saved successfully")
+        else:
+            messagebox.showerror("Error", "Failed to save attachment.")
+
     ### DELETE MESSAGE WORKFLOW ###
     def delete_selected_messages(self):
         """
@@ -670,8 +815,7 @@ class ChatUI:
             return
 
         # Start thread to delete messages
-        threading.Thread(target=self.process_delete_messages,
-                         args=(selected_msg_ids,), daemon=True).start()
+        self.client.submit(self.process_delete_messages, selected_msg_ids)
 
     def process_delete_messages(self, selected_msg_ids):
         """
@@ -691,19 +835,10 @@ class ChatUI:
         if success:
             messagebox.showinfo("Success", "Messages deleted successfully")
 
-            # Remove deleted messages from current list
-            deleted_ids = [msg_id for msg_id,
-                           var in self.message_selection.items() if var.get()]
-            self.all_messages = [
-                msg for msg in self.all_messages if msg[0] not in deleted_ids]
-
-            # Update unread count if necessary
-            if len(self.all_messages) < self.unread_count:
-                self.unread_count = len(self.all_messages)
-
-            # Update UI with remaining messages
-            self.current_msg_page = 0  # Reset to first page
-            self.update_messages([])
+            # Page boundaries have moved, so reload the history from the newest page
+            self.history.reset()
+            self.current_msg_page = 0
+            self.load_msg_page(0)
 
             # Disable delete button
             self.delete_msg_button.config(state=tk.DISABLED)
@@ -719,7 +854,7 @@ class ChatUI:
             "Confirm", "Are you sure you want to delete your account?")
         if confirm:
             # Start thread to delete account
-            threading.Thread(target=self.delete_account, daemon=True).start()
+            self.client.submit(self.delete_account)
 
     def delete_account(self):
         """
@@ -742,12 +877,40 @@ class ChatUI:
         else:
             messagebox.showerror("Error", "Failed to delete account")
 
+    ### CONNECTION STATE ###
+    def connection_callback(self, state):
+        """
+        Callback to show connection state changes (called from a gRPC thread).
+
+        :param state: Connectivity state name (e.g., "READY")
+        """
+        self.root.after(0, lambda: self.update_connection_state(state))
+
+    def update_connection_state(self, state):
+        """
+        Show the connection state on the chat screen.
+
+        :param state: Connectivity state name (e.g., "READY")
+        """
+        self.connection_state = state
+        if self.connection_label and self.connection_label.winfo_exists():
+            text, color = CONNECTION_STATES.get(state, (state, "gray"))
+            self.connection_label.config(text=text, fg=color)
+
     ### HELPER METHODS ###
+    def log_out(self):
+        """
+        Forget the saved session (so the next launch asks for a password), then disconnect.
+        """
+        self.client.forget_session()
+        self.disconnect()
+
     def disconnect(self):
         """
         Disconnect from the server.
         """
         self.client.stop_polling_messages()
+        self.client.close_outbox(timeout=5)
         self.root.destroy()
 
     def clear_window(self):
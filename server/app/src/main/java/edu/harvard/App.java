@@ -5,30 +5,69 @@ package edu.harvard;
 
 import java.io.FileInputStream;
 import java.io.IOException;
+import java.io.InputStream;
+import java.nio.file.Path;
+import java.util.ArrayDeque;
+import java.util.Iterator;
 import java.util.Properties;
+import java.util.Queue;
+import java.util.Set;
+import java.util.concurrent.ConcurrentHashMap;
+import java.util.concurrent.Executors;
+import java.util.concurrent.ScheduledExecutorService;
+import java.util.concurrent.ScheduledFuture;
+import java.util.concurrent.TimeUnit;
 
+import com.google.protobuf.ByteString;
+
+import io.grpc.Codec;
+import io.grpc.CompressorRegistry;
+import io.grpc.DecompressorRegistry;
 import io.grpc.Grpc;
 import io.grpc.InsecureServerCredentials;
 import io.grpc.Server;
+import io.grpc.ServerInterceptors;
 import io.grpc.Status;
+import io.grpc.stub.ServerCallStreamObserver;
 import io.grpc.stub.StreamObserver;
 
+import edu.harvard.Data.Data.Session;
+import edu.harvard.Logic.AttachmentStore;
 import edu.harvard.Logic.Database;
 import edu.harvard.Logic.OperationHandler;
 import edu.harvard.Logic.OperationHandler.HandleException;
 
 import edu.harvard.Chat.AccountLookupRequest;
 import edu.harvard.Chat.AccountLookupResponse;
+import edu.harvard.Chat.AckMessagesRequest;
+import edu.harvard.Chat.AckMessagesResponse;
+import edu.harvard.Chat.AttachmentChunk;
 import edu.harvard.Chat.DeleteAccountRequest;
 import edu.harvard.Chat.DeleteMessagesRequest;
+import edu.harvard.Chat.DownloadAttachmentRequest;
 import edu.harvard.Chat.ListAccountsRequest;
 import edu.harvard.Chat.ListAccountsResponse;
+import edu.harvard.Chat.ListMessagesRequest;
+import edu.harvard.Chat.ListMessagesResponse;
 import edu.harvard.Chat.LoginCreateRequest;
 import edu.harvard.Chat.LoginCreateResponse;
+import edu.harvard.Chat.LookupUsernamesRequest;
+import edu.harvard.Chat.LookupUsernamesResponse;
 import edu.harvard.Chat.RequestMessagesRequest;
 import edu.harvard.Chat.RequestMessagesResponse;
+import edu.harvard.Chat.ResumeSessionRequest;
+import edu.harvard.Chat.ResumeSessionResponse;
 import edu.harvard.Chat.SendMessageRequest;
 import edu.harvard.Chat.SendMessageResponse;
+import edu.harvard.Chat.SendMessagesRequest;
+import edu.harvard.Chat.SendMessagesResponse;
+import edu.harvard.Chat.SendMessagesResult;
+import edu.harvard.Chat.SessionError;
+import edu.harvard.Chat.SessionRequest;
+import edu.harvard.Chat.SessionResponse;
+import edu.harvard.Chat.SubscribeMessagesRequest;
+import edu.harvard.Chat.UploadAttachmentRequest;
+import edu.harvard.Chat.UploadAttachmentResponse;
 import edu.harvard.Chat.Empty;
 
 public class App {
@@ -37,7 +76,13 @@ public class App {
 		try (FileInputStream input = new FileInputStream("../config.properties")) {
 			prop.load(input);
 			String port = prop.getProperty("port");
-			startServer(Integer.parseInt(port));
+			String compression_threshold = prop.getProperty("compression_threshold",
+					String.valueOf(CompressionInterceptor.DEFAULT_THRESHOLD));
+			// Attachments go to a temporary directory unless one is configured
+			String attachment_dir = prop.getProperty("attachment_dir");
+			AttachmentStore attachments = attachment_dir != null ? new AttachmentStore(Path.of(attachment_dir))
+					: AttachmentStore.temporary();
+			startServer(Integer.parseInt(port), Integer.parseInt(compression_threshold), attachments);
 		} catch (IOException ex) {
 			System.err.println("Unhandled I/O failure!");
 			System.err.println(ex.getMessage());
@@ -48,9 +93,26 @@ public class App {
 	}
 
 	static void startServer(int port) throws IOException {
+		startServer(port, CompressionInterceptor.DEFAULT_THRESHOLD, AttachmentStore.temporary());
+	}
+
+	/*
+	 * Responses of at least compression_threshold bytes are compressed (with gzip
+	 * or deflate, whichever the client accepts); requests in either are accepted.
+	 */
+	static void startServer(int port, int compression_threshold, AttachmentStore attachments) throws IOException {
 		Database db = new Database();
+		DeflateCodec deflate = new DeflateCodec();
+		CompressorRegistry compressors = CompressorRegistry.newEmptyInstance();
+		compressors.register(Codec.Identity.NONE);
+		compressors.register(new Codec.Gzip());
+		compressors.register(deflate);
 		Server server = Grpc.newServerBuilderForPort(port, InsecureServerCredentials.create())
-				.addService(new ChatService(db)).build();
+				.compressorRegistry(compressors)
+				.decompressorRegistry(DecompressorRegistry.getDefaultInstance().with(deflate, true))
+				.addService(ServerInterceptors.intercept(new ChatService(db, attachments), new SessionInterceptor(db),
+						new CompressionInterceptor(compression_threshold)))
+				.build();
 		server.start();
 		try {
 			System.out.println("Running!");
@@ -61,10 +123,78 @@ public class App {
 	}
 
 	private static class ChatService extends ChatServiceGrpc.ChatServiceImplBase {
+		// Maximum number of messages pushed in one frame of a message stream
+		private static final int STREAM_BATCH_SIZE = 100;
+
+		// Upper bound on how long a long-poll RequestMessages call may be parked
+		private static final int MAX_WAIT_MS = 60000;
+
 		private final OperationHandler handler;
+		private final AttachmentStore attachments;
+
+		// Open message streams per user, by session key. Only the most recent stream
+		// per session is kept, so each of a user's devices keeps its own stream.
+		private final ConcurrentHashMap<Integer, ConcurrentHashMap<String, ServerCallStreamObserver<RequestMessagesResponse>>> subscribers = new ConcurrentHashMap<>();
+		// Open message streams that asked for compact_sender
+		private final Set<ServerCallStreamObserver<RequestMessagesResponse>> compactSubscribers = ConcurrentHashMap.newKeySet();
+		// Sessions of the open message streams that asked for manual_ack
+		private final ConcurrentHashMap<ServerCallStreamObserver<RequestMessagesResponse>, Session> ackSubscribers = new ConcurrentHashMap<>();
+
+		// Parked long-poll calls per user, oldest first. Guarded by the queue's lock.
+		private final ConcurrentHashMap<Integer, Queue<ParkedPoll>> parkedPolls = new ConcurrentHashMap<>();
+		// Completes parked calls whose wait has expired
+		private final ScheduledExecutorService pollTimer = Executors.newSingleThreadScheduledExecutor(r -> {
+			Thread t = new Thread(r, "long-poll-timer");
+			t.setDaemon(true);
+			return t;
+		});
+
+		// A RequestMessages call waiting for a message, holding no thread
+		private static class ParkedPoll {
+			final StreamObserver<RequestMessagesResponse> response;
+			final int maximum_number;
+			final boolean compact_sender;
+			// The poll's session if it asked for manual_ack, and null otherwise
+			final Session session;
+			// Inbox version the poll found empty, reported back if the wait expires
+			long inbox_version;
+			ScheduledFuture<?> timeout;
+
+			ParkedPoll(StreamObserver<RequestMessagesResponse> response, int maximum_number, boolean compact_sender,
+					Session session) {
+				this.response = response;
+				this.maximum_number = maximum_number;
+				this.compact_sender = compact_sender;
+				this.session = session;
+			}
+		}
+
+		ChatService(Database db, AttachmentStore attachments) {
+			this.handler = new OperationHandler(db, attachments);
+			this.attachments = attachments;
+			db.addUnreadListener(this::wakeParkedPolls);
+		}
+
+		/*
+		 * The caller's account. Every method that needs a session is only reached
+		 * once SessionInterceptor has authenticated the call.
+		 */
+		private static int userId() {
+			return SessionInterceptor.USER_ID.get();
+		}
 
-		ChatService(Database db) {
-			this.handler = new OperationHandler(db);
+		/*
+		 * The caller's session record (for its message cursors), failing the call
+		 * with UNAUTHENTICATED if the session has expired since the call was
+		 * authenticated.
+		 */
+		private Session authenticateSession(StreamObserver<?> response) {
+			Session session = handler.lookupSessionRecord(SessionInterceptor.SESSION.get());
+			if (session == null) {
+				Status status = Status.UNAUTHENTICATED.withDescription("Invalid session key");
+				response.onError(status.asRuntimeException());
+			}
+			return session;
 		}
 
 		@Override
@@ -81,6 +211,12 @@ public class App {
 			response.onCompleted();
 		}
 
+		@Override
+		public void resumeSession(ResumeSessionRequest request, StreamObserver<ResumeSessionResponse> response) {
+			response.onNext(handler.resumeSession(request.getSessionKey()));
+			response.onCompleted();
+		}
+
 		@Override
 		public void createAccount(LoginCreateRequest request, StreamObserver<LoginCreateResponse> response) {
 			try {
@@ -95,72 +231,513 @@ public class App {
 
 		@Override
 		public void listAccounts(ListAccountsRequest request, StreamObserver<ListAccountsResponse> response) {
-			Integer id = handler.lookupSession(request.getSessionKey());
-			if (id == null) {
-				Status status = Status.UNAUTHENTICATED.withDescription("Invalid session key");
-				response.onError(status.asRuntimeException());
-			} else {
-				ListAccountsResponse listResponse = handler.listAccounts(request);
-				response.onNext(listResponse);
-				response.onCompleted();
-			}
+			ListAccountsResponse listResponse = handler.listAccounts(request);
+			response.onNext(listResponse);
+			response.onCompleted();
+		}
+
+		@Override
+		public void listMessages(ListMessagesRequest request, StreamObserver<ListMessagesResponse> response) {
+			int id = userId();
+			response.onNext(handler.listMessages(id, request));
+			response.onCompleted();
+		}
+
+		@Override
+		public void lookupUsernames(LookupUsernamesRequest request, StreamObserver<LookupUsernamesResponse> response) {
+			response.onNext(handler.lookupUsernames(request.getIdList()));
+			response.onCompleted();
 		}
 
 		@Override
 		public void sendMessage(SendMessageRequest request, StreamObserver<SendMessageResponse> response) {
-			Integer user_id = handler.lookupSession(request.getSessionKey());
-			if (user_id == null) {
-				Status status = Status.UNAUTHENTICATED.withDescription("Invalid session key");
+			int user_id = userId();
+			try {
+				int message_id = handler.sendMessage(user_id, request);
+				response.onNext(SendMessageResponse.newBuilder().setId(message_id).build());
+				response.onCompleted();
+				pushToRecipient(message_id);
+			} catch (HandleException e) {
+				Status status = Status.INVALID_ARGUMENT.withDescription(e.getMessage());
 				response.onError(status.asRuntimeException());
-			} else {
-				try {
-					int message_id = handler.sendMessage(user_id, request);
-					response.onNext(SendMessageResponse.newBuilder().setId(message_id).build());
-					response.onCompleted();
-				} catch (HandleException e) {
-					Status status = Status.INVALID_ARGUMENT.withDescription(e.getMessage());
-					response.onError(status.asRuntimeException());
+			}
+		}
+
+		@Override
+		public void sendMessages(SendMessagesRequest request, StreamObserver<SendMessagesResponse> response) {
+			int user_id = userId();
+			try {
+				SendMessagesResponse results = handler.sendMessages(user_id, request.getMessagesList());
+				response.onNext(results);
+				response.onCompleted();
+				if (!subscribers.isEmpty()) {
+					for (SendMessagesResult result : results.getResultsList()) {
+						if (result.hasId()) {
+							pushToRecipient(result.getId());
+						}
+					}
 				}
+			} catch (HandleException e) {
+				Status status = Status.INVALID_ARGUMENT.withDescription(e.getMessage());
+				response.onError(status.asRuntimeException());
 			}
 		}
 
 		@Override
 		public void requestMessages(RequestMessagesRequest request, StreamObserver<RequestMessagesResponse> response) {
-			Integer id = handler.lookupSession(request.getSessionKey());
-			if (id == null) {
-				Status status = Status.UNAUTHENTICATED.withDescription("Invalid session key");
-				response.onError(status.asRuntimeException());
+			int id = userId();
+			// Manual acknowledgement fetches past the session's own cursor
+			Session session = null;
+			if (request.getManualAck()) {
+				session = authenticateSession(response);
+				if (session == null) {
+					return;
+				}
+			}
+			if (request.getWaitMs() > 0) {
+				parkPoll(id, session, request, (ServerCallStreamObserver<RequestMessagesResponse>) response);
+			} else if (handler.inboxUnchanged(id, request.getInboxVersion())) {
+				// Nothing new: answer without touching the database lock
+				response.onNext(RequestMessagesResponse.newBuilder().setUnchanged(true)
+						.setInboxVersion(request.getInboxVersion()).build());
+				response.onCompleted();
 			} else {
-				RequestMessagesResponse messagesResponse = handler.requestMessages(id, request.getMaximumNumber());
+				RequestMessagesResponse messagesResponse = handler.requestMessages(id, session, request.getMaximumNumber(),
+						request.getCompactSender());
 				response.onNext(messagesResponse);
 				response.onCompleted();
 			}
 		}
 
 		@Override
-		public void deleteMessages(DeleteMessagesRequest request, StreamObserver<Empty> response) {
-			Integer id = handler.lookupSession(request.getSessionKey());
-			if (id == null) {
-				Status status = Status.UNAUTHENTICATED.withDescription("Invalid session key");
-				response.onError(status.asRuntimeException());
-			} else {
-				handler.deleteMessages(id, request.getIdList());
-				response.onNext(Empty.newBuilder().build());
-				response.onCompleted();
+		public void ackMessages(AckMessagesRequest request, StreamObserver<AckMessagesResponse> response) {
+			Session session = authenticateSession(response);
+			if (session == null) {
+				return;
+			}
+			response.onNext(handler.ackMessages(session, request.getUpToId(), request.getRewind()));
+			response.onCompleted();
+		}
+
+		/*
+		 * Long poll: answers immediately if there are unread messages, and otherwise
+		 * parks the call until a message arrives or the wait expires.
+		 * Checking and parking happen under the queue's lock, as does waking, so a
+		 * message stored in between cannot be missed.
+		 */
+		private void parkPoll(int user_id, Session session, RequestMessagesRequest request,
+				ServerCallStreamObserver<RequestMessagesResponse> response) {
+			ParkedPoll poll = new ParkedPoll(response, request.getMaximumNumber(), request.getCompactSender(), session);
+			Queue<ParkedPoll> queue = parkedPolls.computeIfAbsent(user_id, k -> new ArrayDeque<>());
+			// Must be set before this method returns
+			response.setOnCancelHandler(() -> {
+				synchronized (queue) {
+					queue.remove(poll);
+				}
+				if (poll.timeout != null) {
+					poll.timeout.cancel(false);
+				}
+			});
+			synchronized (queue) {
+				// An unchanged inbox has nothing to fetch, so park straight away
+				poll.inbox_version = request.getInboxVersion();
+				if (!handler.inboxUnchanged(user_id, poll.inbox_version)) {
+					RequestMessagesResponse messagesResponse = handler.requestMessages(user_id, poll.session,
+							poll.maximum_number, poll.compact_sender);
+					if (messagesResponse.getMessagesCount() > 0) {
+						completePoll(poll, messagesResponse);
+						return;
+					}
+					poll.inbox_version = messagesResponse.getInboxVersion();
+				}
+				queue.add(poll);
+				long wait_ms = Math.min(request.getWaitMs(), MAX_WAIT_MS);
+				poll.timeout = pollTimer.schedule(() -> expirePoll(user_id, queue, poll), wait_ms,
+						TimeUnit.MILLISECONDS);
+			}
+		}
+
+		/*
+		 * Hands new unread messages to a user's parked calls, oldest first. Every
+		 * call is tried, since calls with manual_ack fetch past their own session's
+		 * cursor rather than taking from the shared unread list.
+		 */
+		private void wakeParkedPolls(int user_id) {
+			Queue<ParkedPoll> queue = parkedPolls.get(user_id);
+			if (queue == null) {
+				return;
+			}
+			synchronized (queue) {
+				Iterator<ParkedPoll> polls = queue.iterator();
+				while (polls.hasNext()) {
+					ParkedPoll poll = polls.next();
+					RequestMessagesResponse messagesResponse = handler.requestMessages(user_id, poll.session,
+							poll.maximum_number, poll.compact_sender);
+					if (messagesResponse.getMessagesCount() > 0) {
+						polls.remove();
+						poll.timeout.cancel(false);
+						completePoll(poll, messagesResponse);
+					}
+				}
+			}
+		}
+
+		private void expirePoll(int user_id, Queue<ParkedPoll> queue, ParkedPoll poll) {
+			synchronized (queue) {
+				if (queue.remove(poll)) {
+					RequestMessagesResponse.Builder expired = RequestMessagesResponse.newBuilder();
+					if (handler.inboxUnchanged(user_id, poll.inbox_version)) {
+						expired.setUnchanged(true).setInboxVersion(poll.inbox_version);
+					}
+					completePoll(poll, expired.build());
+				}
+			}
+		}
+
+		private void completePoll(ParkedPoll poll, RequestMessagesResponse messagesResponse) {
+			try {
+				poll.response.onNext(messagesResponse);
+				poll.response.onCompleted();
+			} catch (RuntimeException e) {
+				// The call was cancelled by the client
+			}
+		}
+
+		@Override
+		public void subscribeMessages(SubscribeMessagesRequest request,
+				StreamObserver<RequestMessagesResponse> response) {
+			int id = userId();
+			Session session = null;
+			if (request.getManualAck()) {
+				session = authenticateSession(response);
+				if (session == null) {
+					return;
+				}
+			}
+			String session_key = SessionInterceptor.SESSION.get();
+			ServerCallStreamObserver<RequestMessagesResponse> stream = (ServerCallStreamObserver<RequestMessagesResponse>) response;
+			stream.setOnCancelHandler(() -> {
+				removeSubscriber(id, session_key, stream);
+				compactSubscribers.remove(stream);
+				ackSubscribers.remove(stream);
+			});
+			if (request.getCompactSender()) {
+				compactSubscribers.add(stream);
+			}
+			if (session != null) {
+				ackSubscribers.put(stream, session);
+			}
+			ServerCallStreamObserver<RequestMessagesResponse> previous = subscribers
+					.computeIfAbsent(id, k -> new ConcurrentHashMap<>()).put(session_key, stream);
+			if (previous != null) {
+				closeStream(previous);
+			}
+			// Deliver anything that arrived before the stream was opened
+			deliverMessages(id, session_key, stream);
+		}
+
+		// Forget a stream, and the user's entry once they have no streams left
+		private void removeSubscriber(int user_id, String session_key,
+				ServerCallStreamObserver<RequestMessagesResponse> stream) {
+			subscribers.computeIfPresent(user_id, (k, streams) -> {
+				streams.remove(session_key, stream);
+				return streams.isEmpty() ? null : streams;
+			});
+		}
+
+		// Push a new message if its recipient has an open stream
+		private void pushToRecipient(int message_id) {
+			Integer recipient_id = handler.getMessageRecipient(message_id);
+			if (recipient_id != null) {
+				deliverMessages(recipient_id);
+			}
+		}
+
+		// Pushes new messages to each of a user's open streams, if any
+		private void deliverMessages(int user_id) {
+			ConcurrentHashMap<String, ServerCallStreamObserver<RequestMessagesResponse>> streams = subscribers.get(user_id);
+			if (streams == null) {
+				return;
+			}
+			streams.forEach((session_key, stream) -> deliverMessages(user_id, session_key, stream));
+		}
+
+		/*
+		 * Pushes all of a user's new messages to one stream: those past its session's
+		 * cursor with manual_ack, and otherwise the unread ones (which streams without
+		 * manual_ack share, like polls). Holding the stream's lock keeps batches in
+		 * order and serializes onNext calls.
+		 */
+		private void deliverMessages(int user_id, String session_key,
+				ServerCallStreamObserver<RequestMessagesResponse> stream) {
+			boolean compact_sender = compactSubscribers.contains(stream);
+			Session session = ackSubscribers.get(stream);
+			synchronized (stream) {
+				try {
+					while (!stream.isCancelled()) {
+						RequestMessagesResponse batch = handler.requestMessages(user_id, session, STREAM_BATCH_SIZE,
+								compact_sender);
+						if (batch.getMessagesCount() == 0) {
+							break;
+						}
+						stream.onNext(batch);
+					}
+				} catch (RuntimeException e) {
+					// The stream has failed; the client will fall back to polling
+					removeSubscriber(user_id, session_key, stream);
+				}
+			}
+		}
+
+		private void closeStream(ServerCallStreamObserver<RequestMessagesResponse> stream) {
+			compactSubscribers.remove(stream);
+			ackSubscribers.remove(stream);
+			synchronized (stream) {
+				try {
+					if (!stream.isCancelled()) {
+						stream.onCompleted();
+					}
+				} catch (RuntimeException e) {
+					// Already closed
+				}
+			}
+		}
+
+		/*
+		 * Multiplexed session: commands arrive as tagged frames and each result is
+		 * sent back with the same correlation ID. The call's session metadata, or
+		 * else the first frame's session key, authenticates the whole stream (see
+		 * SessionInterceptor).
+		 * Long polling is not supported here (wait_ms is ignored), since frames are
+		 * handled in order and a parked fetch would hold up the stream.
+		 */
+		@Override
+		public StreamObserver<SessionRequest> session(StreamObserver<SessionResponse> response) {
+			return new StreamObserver<SessionRequest>() {
+				private Integer user_id = null;
+				// The stream's session, for manual acknowledgement
+				private Session session = null;
+				private boolean closed = false;
+
+				@Override
+				public void onNext(SessionRequest request) {
+					if (closed) {
+						return;
+					}
+					if (user_id == null) {
+						user_id = userId();
+						session = handler.lookupSessionRecord(SessionInterceptor.SESSION.get());
+					}
+					response.onNext(handleSessionCommand(user_id, session, request));
+				}
+
+				@Override
+				public void onError(Throwable t) {
+					closed = true;
+				}
+
+				@Override
+				public void onCompleted() {
+					if (!closed) {
+						closed = true;
+						response.onCompleted();
+					}
+				}
+			};
+		}
+
+		private SessionResponse handleSessionCommand(int user_id, Session session, SessionRequest request) {
+			SessionResponse.Builder result = SessionResponse.newBuilder().setCorrelationId(request.getCorrelationId());
+			try {
+				switch (request.getCommandCase()) {
+					case SEND_MESSAGE:
+						int message_id = handler.sendMessage(user_id, request.getSendMessage());
+						result.setSendMessage(SendMessageResponse.newBuilder().setId(message_id));
+						pushToRecipient(message_id);
+						break;
+					case LIST_ACCOUNTS:
+						result.setListAccounts(handler.listAccounts(request.getListAccounts()));
+						break;
+					case LIST_MESSAGES:
+						result.setListMessages(handler.listMessages(user_id, request.getListMessages()));
+						break;
+					case DELETE_MESSAGES:
+						handler.deleteMessages(user_id, request.getDeleteMessages().getIdList());
+						result.setDeleteMessages(Empty.newBuilder());
+						break;
+					case REQUEST_MESSAGES:
+						RequestMessagesRequest messagesRequest = request.getRequestMessages();
+						if (messagesRequest.getManualAck() && session == null) {
+							result.setError(sessionError(Status.Code.UNAUTHENTICATED, "Session has expired"));
+						} else if (handler.inboxUnchanged(user_id, messagesRequest.getInboxVersion())) {
+							result.setRequestMessages(RequestMessagesResponse.newBuilder().setUnchanged(true)
+									.setInboxVersion(messagesRequest.getInboxVersion()));
+						} else {
+							result.setRequestMessages(handler.requestMessages(user_id,
+									messagesRequest.getManualAck() ? session : null, messagesRequest.getMaximumNumber(),
+									messagesRequest.getCompactSender()));
+						}
+						break;
+					case ACK_MESSAGES:
+						if (session == null) {
+							result.setError(sessionError(Status.Code.UNAUTHENTICATED, "Session has expired"));
+						} else {
+							AckMessagesRequest ackRequest = request.getAckMessages();
+							result.setAckMessages(handler.ackMessages(session, ackRequest.getUpToId(), ackRequest.getRewind()));
+						}
+						break;
+					default:
+						result.setError(sessionError(Status.Code.INVALID_ARGUMENT, "Unknown command"));
+				}
+			} catch (HandleException e) {
+				result.setError(sessionError(Status.Code.INVALID_ARGUMENT, e.getMessage()));
+			}
+			return result.build();
+		}
+
+		private SessionError sessionError(Status.Code code, String description) {
+			return SessionError.newBuilder().setCode(code.value()).setDescription(description).build();
+		}
+
+		/*
+		 * Client-streaming upload: the call's session metadata (or the first chunk's
+		 * session key, see SessionInterceptor) authenticates the upload, and each
+		 * chunk is written to the store as it arrives. Answers with the content's ID once the client
+		 * completes the stream.
+		 */
+		@Override
+		public StreamObserver<UploadAttachmentRequest> uploadAttachment(
+				StreamObserver<UploadAttachmentResponse> response) {
+			return new StreamObserver<UploadAttachmentRequest>() {
+				private AttachmentStore.Upload upload = null;
+				private boolean closed = false;
+
+				@Override
+				public void onNext(UploadAttachmentRequest request) {
+					if (closed) {
+						return;
+					}
+					try {
+						if (upload == null) {
+							upload = attachments.startUpload();
+						}
+						upload.write(request.getData().toByteArray());
+					} catch (AttachmentStore.TooLargeException e) {
+						fail(Status.RESOURCE_EXHAUSTED.withDescription(e.getMessage()));
+					} catch (IOException e) {
+						fail(Status.INTERNAL.withDescription("Could not store attachment"));
+					}
+				}
+
+				@Override
+				public void onError(Throwable t) {
+					closed = true;
+					if (upload != null) {
+						upload.abort();
+					}
+				}
+
+				@Override
+				public void onCompleted() {
+					if (closed) {
+						return;
+					}
+					try {
+						// An empty upload sends no chunks, so may only be authenticated by metadata
+						if (upload == null) {
+							upload = attachments.startUpload();
+						}
+						closed = true;
+						String id = upload.finish();
+						response.onNext(UploadAttachmentResponse.newBuilder().setAttachmentId(id).setSize(upload.size()).build());
+						response.onCompleted();
+					} catch (IOException e) {
+						fail(Status.INTERNAL.withDescription("Could not store attachment"));
+					}
+				}
+
+				private void fail(Status status) {
+					closed = true;
+					if (upload != null) {
+						upload.abort();
+					}
+					response.onError(status.asRuntimeException());
+				}
+			};
+		}
+
+		/*
+		 * Server-streaming download in chunks of AttachmentStore.CHUNK_SIZE. Chunks
+		 * are only read from disk while the call is ready for more, so a slow client
+		 * does not make the server buffer the attachment.
+		 */
+		@Override
+		public void downloadAttachment(DownloadAttachmentRequest request, StreamObserver<AttachmentChunk> response) {
+			InputStream in;
+			try {
+				in = attachments.open(request.getAttachmentId());
+			} catch (IOException e) {
+				response.onError(Status.INTERNAL.withDescription("Could not read attachment").asRuntimeException());
+				return;
+			}
+			if (in == null) {
+				response.onError(Status.NOT_FOUND.withDescription("Attachment does not exist!").asRuntimeException());
+				return;
+			}
+			ServerCallStreamObserver<AttachmentChunk> stream = (ServerCallStreamObserver<AttachmentChunk>) response;
+			stream.setOnCancelHandler(() -> closeQuietly(in));
+			stream.setOnReadyHandler(new Runnable() {
+				private final byte[] buffer = new byte[AttachmentStore.CHUNK_SIZE];
+				private boolean done = false;
+
+				@Override
+				public synchronized void run() {
+					try {
+						while (!done && stream.isReady()) {
+							int length = in.readNBytes(buffer, 0, buffer.length);
+							if (length == 0) {
+								done = true;
+								in.close();
+								stream.onCompleted();
+								return;
+							}
+							stream.onNext(AttachmentChunk.newBuilder().setData(ByteString.copyFrom(buffer, 0, length)).build());
+						}
+					} catch (IOException e) {
+						done = true;
+						closeQuietly(in);
+						stream.onError(Status.INTERNAL.withDescription("Could not read attachment").asRuntimeException());
+					}
+				}
+			});
+		}
+
+		private static void closeQuietly(InputStream in) {
+			try {
+				in.close();
+			} catch (IOException e) {
+				// Already closed or unreadable; nothing to release
 			}
 		}
 
+		@Override
+		public void deleteMessages(DeleteMessagesRequest request, StreamObserver<Empty> response) {
+			int id = userId();
+			handler.deleteMessages(id, request.getIdList());
+			response.onNext(Empty.newBuilder().build());
+			response.onCompleted();
+		}
+
 		@Override
 		public void deleteAccount(DeleteAccountRequest request, StreamObserver<Empty> response) {
-			Integer id = handler.lookupSession(request.getSessionKey());
-			if (id == null) {
-				Status status = Status.UNAUTHENTICATED.withDescription("Invalid session key");
-				response.onError(status.asRuntimeException());
-			} else {
-				handler.deleteAccount(id);
-				response.onNext(Empty.newBuilder().build());
-				response.onCompleted();
+			int id = userId();
+			handler.deleteAccount(id);
+			ConcurrentHashMap<String, ServerCallStreamObserver<RequestMessagesResponse>> streams = subscribers.remove(id);
+			if (streams != null) {
+				streams.values().forEach(this::closeStream);
 			}
+			response.onNext(Empty.newBuilder().build());
+			response.onCompleted();
 		}
 	}
 }
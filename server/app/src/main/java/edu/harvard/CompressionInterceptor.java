@@ -0,0 +1,81 @@
+package edu.harvard;
+
+import com.google.protobuf.MessageLite;
+
+import io.grpc.ForwardingServerCall;
+import io.grpc.Metadata;
+import io.grpc.ServerCall;
+import io.grpc.ServerCallHandler;
+import io.grpc.ServerInterceptor;
+
+/*
+ * Compresses responses of at least `threshold` serialized bytes, so small
+ * responses (e.g. empty polls) skip the compression cost.
+ * The encoding is chosen once per call: the one the client compressed its
+ * request with, or else the first of SUPPORTED_ENCODINGS the client accepts.
+ * Each message is then compressed or not depending on its size.
+ */
+class CompressionInterceptor implements ServerInterceptor {
+	// Responses smaller than this (bytes) are sent uncompressed by default
+	static final int DEFAULT_THRESHOLD = 1024;
+
+	// Response encodings, in order of preference
+	static final String[] SUPPORTED_ENCODINGS = { "gzip", "deflate" };
+
+	private static final Metadata.Key<String> ENCODING = Metadata.Key.of("grpc-encoding",
+			Metadata.ASCII_STRING_MARSHALLER);
+	private static final Metadata.Key<String> ACCEPT_ENCODING = Metadata.Key.of("grpc-accept-encoding",
+			Metadata.ASCII_STRING_MARSHALLER);
+
+	private final int threshold;
+
+	CompressionInterceptor(int threshold) {
+		this.threshold = threshold;
+	}
+
+	@Override
+	public <ReqT, RespT> ServerCall.Listener<ReqT> interceptCall(ServerCall<ReqT, RespT> call, Metadata headers,
+			ServerCallHandler<ReqT, RespT> next) {
+		String encoding = chooseEncoding(headers.get(ENCODING), headers.get(ACCEPT_ENCODING));
+		if (encoding == null) {
+			return next.startCall(call, headers);
+		}
+		return next.startCall(new ForwardingServerCall.SimpleForwardingServerCall<ReqT, RespT>(call) {
+			@Override
+			public void sendHeaders(Metadata responseHeaders) {
+				setCompression(encoding);
+				super.sendHeaders(responseHeaders);
+			}
+
+			@Override
+			public void sendMessage(RespT message) {
+				setMessageCompression(!(message instanceof MessageLite)
+						|| ((MessageLite) message).getSerializedSize() >= threshold);
+				super.sendMessage(message);
+			}
+		}, headers);
+	}
+
+	/*
+	 * Response encoding for a call, or null to leave responses uncompressed.
+	 */
+	static String chooseEncoding(String request_encoding, String accept_encoding) {
+		if (accept_encoding == null) {
+			return null;
+		}
+		String accepted = "," + accept_encoding.replace(" ", "") + ",";
+		if (request_encoding != null && accepted.contains("," + request_encoding + ",")) {
+			for (String encoding : SUPPORTED_ENCODINGS) {
+				if (encoding.equals(request_encoding)) {
+					return encoding;
+				}
+			}
+		}
+		for (String encoding : SUPPORTED_ENCODINGS) {
+			if (accepted.contains("," + encoding + ",")) {
+				return encoding;
+			}
+		}
+		return null;
+	}
+}
@@ -1,5 +1,7 @@
 package edu.harvard.Data;
 
+import java.util.List;
+
 public class Data {
   // Internal data types (stored in database)
   public static class Account {
@@ -15,5 +17,17 @@ public class Data {
     public int recipient_id;
     public String message;
     public boolean read;
+    // IDs of the message's attachments (see AttachmentStore)
+    public List<String> attachment_ids = List.of();
+  }
+
+  public static class Session {
+    public int account_id;
+    // Milliseconds since the epoch; extended when the session is resumed
+    public volatile long expires_at;
+    // Message cursors (guarded by the database lock): the last message ID
+    // fetched by this session, and the last one it acknowledged
+    public int fetched;
+    public int acked;
   }
 }
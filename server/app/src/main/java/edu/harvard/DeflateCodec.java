@@ -0,0 +1,30 @@
+package edu.harvard;
+
+import java.io.IOException;
+import java.io.InputStream;
+import java.io.OutputStream;
+import java.util.zip.DeflaterOutputStream;
+import java.util.zip.InflaterInputStream;
+
+import io.grpc.Codec;
+
+/*
+ * The "deflate" message encoding (zlib format), which grpc-java does not
+ * register by default but gRPC clients in other languages may use.
+ */
+class DeflateCodec implements Codec {
+	@Override
+	public String getMessageEncoding() {
+		return "deflate";
+	}
+
+	@Override
+	public OutputStream compress(OutputStream os) throws IOException {
+		return new DeflaterOutputStream(os);
+	}
+
+	@Override
+	public InputStream decompress(InputStream is) throws IOException {
+		return new InflaterInputStream(is);
+	}
+}
@@ -0,0 +1,135 @@
+package edu.harvard.Logic;
+
+import java.io.IOException;
+import java.io.InputStream;
+import java.io.OutputStream;
+import java.nio.file.FileAlreadyExistsException;
+import java.nio.file.Files;
+import java.nio.file.NoSuchFileException;
+import java.nio.file.Path;
+import java.security.MessageDigest;
+import java.security.NoSuchAlgorithmException;
+import java.util.HexFormat;
+import java.util.regex.Pattern;
+
+/*
+ * Content-addressed attachment storage: each attachment is a file named by the
+ * SHA-256 of its content, so identical uploads are stored once. Uploads are
+ * hashed while they are written to a temporary file, and downloads are read
+ * from disk, so memory use does not depend on attachment size.
+ */
+public class AttachmentStore {
+  // Size of each chunk of a transfer
+  public static final int CHUNK_SIZE = 64 * 1024;
+  // Default largest attachment accepted
+  public static final long MAX_SIZE = 1L << 30;
+
+  // Attachment IDs are hex SHA-256 digests (checked before touching the disk)
+  private static final Pattern ID_PATTERN = Pattern.compile("[0-9a-f]{64}");
+
+  // Thrown when an upload passes the store's maximum size
+  public static class TooLargeException extends IOException {
+    public TooLargeException() {
+      super("Attachment is too large!");
+    }
+  }
+
+  private final Path directory;
+  private final long max_size;
+
+  public AttachmentStore(Path directory) throws IOException {
+    this(directory, MAX_SIZE);
+  }
+
+  public AttachmentStore(Path directory, long max_size) throws IOException {
+    this.directory = Files.createDirectories(directory);
+    this.max_size = max_size;
+  }
+
+  // A store in a new temporary directory, for servers without one configured
+  public static AttachmentStore temporary() throws IOException {
+    return new AttachmentStore(Files.createTempDirectory("chat-attachments"));
+  }
+
+  public Upload startUpload() throws IOException {
+    return new Upload();
+  }
+
+  public boolean exists(String id) {
+    return ID_PATTERN.matcher(id).matches() && Files.isRegularFile(directory.resolve(id));
+  }
+
+  /*
+   * Opens an attachment for reading. Returns null if there is no attachment
+   * with this ID.
+   */
+  public InputStream open(String id) throws IOException {
+    if (!ID_PATTERN.matcher(id).matches()) {
+      return null;
+    }
+    try {
+      return Files.newInputStream(directory.resolve(id));
+    } catch (NoSuchFileException e) {
+      return null;
+    }
+  }
+
+  /*
+   * An attachment being uploaded, written chunk by chunk. Not thread-safe; the
+   * chunks of one upload arrive in order on its call.
+   */
+  public class Upload {
+    private final Path file;
+    private final OutputStream out;
+    private final MessageDigest digest;
+    private long size = 0;
+
+    private Upload() throws IOException {
+      try {
+        digest = MessageDigest.getInstance("SHA-256");
+      } catch (NoSuchAlgorithmException e) {
+        throw new IOException(e);
+      }
+      file = Files.createTempFile(directory, "upload", ".part");
+      out = Files.newOutputStream(file);
+    }
+
+    public void write(byte[] data) throws IOException {
+      size += data.length;
+      if (size > max_size) {
+        throw new TooLargeException();
+      }
+      digest.update(data);
+      out.write(data);
+    }
+
+    public long size() {
+      return size;
+    }
+
+    /*
+     * Completes the upload and returns the attachment's ID. If the same content
+     * is already stored, the new copy is discarded.
+     */
+    public String finish() throws IOException {
+      out.close();
+      String id = HexFormat.of().formatHex(digest.digest());
+      try {
+        Files.move(file, directory.resolve(id));
+      } catch (FileAlreadyExistsException e) {
+        Files.delete(file);
+      }
+      return id;
+    }
+
+    // Discards a failed or cancelled upload
+    public void abort() {
+      try {
+        out.close();
+        Files.deleteIfExists(file);
+      } catch (IOException e) {
+        // Nothing more can be done; the file is only a leftover
+      }
+    }
+  }
+}
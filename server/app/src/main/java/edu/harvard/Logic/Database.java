@@ -5,12 +5,18 @@ import java.util.Arrays;
 import java.util.Collection;
 import java.util.Collections;
 import java.util.HashMap;
+import java.util.LinkedHashSet;
 import java.util.List;
 import java.util.Map;
+import java.util.Set;
 import java.util.UUID;
+import java.util.concurrent.ConcurrentHashMap;
+import java.util.concurrent.CopyOnWriteArrayList;
+import java.util.function.IntConsumer;
 
 import edu.harvard.Data.Data.Account;
 import edu.harvard.Data.Data.Message;
+import edu.harvard.Data.Data.Session;
 
 /*
  * Properly-synchronized in-memory datastore.
@@ -18,22 +24,48 @@ import edu.harvard.Data.Data.Message;
  * Higher-level application logic will take place outside the database.
  */
 public class Database {
+  // Sessions expire this long after they are created or last resumed
+  public static final long SESSION_TTL_MS = 7L * 24 * 60 * 60 * 1000;
+
   private Map<Integer, Account> accountMap;
   private Map<String, Integer> accountUsernameMap;
   private Map<Integer, Message> messageMap;
+  // Highest message ID ever assigned. IDs are never reused, even after the
+  // newest message is deleted, since session cursors are message IDs.
+  private int lastMessageId = 0;
 
   // Optimization for getting unread messages
   private Map<Integer, ArrayList<Integer>> unreadMessagesPerAccount;
+  // Every message received per account, read or not, in ID order (for fetching
+  // past a session's cursor)
+  private Map<Integer, ArrayList<Integer>> inboxPerAccount;
 
   // Session keys for currently logged in users.
-  private Map<String, Integer> sessions;
+  // Concurrent so sessions can be looked up without the database lock.
+  private Map<String, Session> sessions;
+  private final long sessionTtlMs;
+
+  // Inbox version per account, bumped whenever the account gains an unread
+  // message. Written under the database lock, readable without it.
+  private Map<Integer, Long> inboxVersions;
+
+  // Notified with a user ID whenever that user gains an unread message.
+  // Called outside the database lock.
+  private List<IntConsumer> unreadListeners = new CopyOnWriteArrayList<>();
 
   public Database() {
+    this(SESSION_TTL_MS);
+  }
+
+  public Database(long session_ttl_ms) {
+    sessionTtlMs = session_ttl_ms;
     accountMap = new HashMap<>();
     accountUsernameMap = new HashMap<>();
     messageMap = new HashMap<>();
     unreadMessagesPerAccount = new HashMap<>();
-    sessions = new HashMap<>();
+    inboxPerAccount = new HashMap<>();
+    sessions = new ConcurrentHashMap<>();
+    inboxVersions = new ConcurrentHashMap<>();
   }
 
   public synchronized Account lookupAccount(int id) {
@@ -46,12 +78,71 @@ public class Database {
 
   public synchronized String createSession(int id) {
     String key = UUID.randomUUID().toString();
-    sessions.put(key, id);
+    Session session = new Session();
+    session.account_id = id;
+    session.expires_at = System.currentTimeMillis() + sessionTtlMs;
+    session.fetched = startCursor(id);
+    session.acked = session.fetched;
+    sessions.put(key, session);
     return key;
   }
 
-  public synchronized Integer getSession(String key) {
-    return sessions.get(key);
+  /*
+   * Where a new session's cursors start: just before the account's oldest unread
+   * message, or after its newest message if all are read.
+   * Must be called with the lock held.
+   */
+  private int startCursor(int user_id) {
+    ArrayList<Integer> unreads = unreadMessagesPerAccount.get(user_id);
+    if (unreads != null && unreads.size() > 0) {
+      return unreads.get(0) - 1;
+    }
+    ArrayList<Integer> inbox = inboxPerAccount.get(user_id);
+    return inbox == null || inbox.size() == 0 ? 0 : inbox.get(inbox.size() - 1);
+  }
+
+  // Lock-free (see sessions)
+  public Integer getSession(String key) {
+    Session session = getSessionRecord(key);
+    return session == null ? null : session.account_id;
+  }
+
+  /*
+   * The session for a key, or null if there is none or it has expired (expired
+   * sessions are dropped when found). Lock-free (see sessions).
+   */
+  public Session getSessionRecord(String key) {
+    Session session = sessions.get(key);
+    if (session != null && session.expires_at <= System.currentTimeMillis()) {
+      sessions.remove(key, session);
+      return null;
+    }
+    return session;
+  }
+
+  /*
+   * Extends an unexpired session to the full TTL from now. Returns the session,
+   * or null if there is none. Lock-free (see sessions).
+   */
+  public Session refreshSession(String key) {
+    Session session = getSessionRecord(key);
+    if (session != null) {
+      session.expires_at = System.currentTimeMillis() + sessionTtlMs;
+    }
+    return session;
+  }
+
+  /*
+   * Moves a session's fetch cursor back to its last acknowledgement, so the
+   * messages it fetched but did not acknowledge are fetched again.
+   */
+  public synchronized void rewindSession(Session session) {
+    session.fetched = session.acked;
+  }
+
+  // Lock-free (see inboxVersions). Versions start at 1.
+  public long getInboxVersion(int user_id) {
+    return inboxVersions.getOrDefault(user_id, 1L);
   }
 
   /*
@@ -68,18 +159,103 @@ public class Database {
     return next_id;
   }
 
+  /*
+   * Looks up several accounts by ID under one acquisition of the lock.
+   * IDs without an account are left out of the result.
+   */
+  public synchronized List<Account> lookupAccounts(Collection<Integer> ids) {
+    List<Account> accounts = new ArrayList<>(ids.size());
+    for (Integer id : ids) {
+      Account account = accountMap.get(id);
+      if (account != null) {
+        accounts.add(account);
+      }
+    }
+    return accounts;
+  }
+
+  /*
+   * Looks up several accounts under one acquisition of the lock.
+   * Usernames without an account are left out of the result.
+   */
+  public synchronized Map<String, Account> lookupAccountsByUsername(Collection<String> usernames) {
+    Map<String, Account> accounts = new HashMap<>();
+    for (String username : usernames) {
+      Account account = accountMap.get(accountUsernameMap.get(username));
+      if (account != null) {
+        accounts.put(username, account);
+      }
+    }
+    return accounts;
+  }
+
   public synchronized Collection<Account> getAllAccounts() {
     return accountMap.values();
   }
 
+  public void addUnreadListener(IntConsumer listener) {
+    unreadListeners.add(listener);
+  }
+
   /*
    * Adds a message to the database.
-   * If message.read is false, also adds it to a user's unread list.
+   * If message.read is false, also adds it to a user's unread list and notifies
+   * unread listeners.
+   */
+  public int createMessage(Message message) {
+    int id = insertMessage(message);
+    if (!message.read) {
+      for (IntConsumer listener : unreadListeners) {
+        listener.accept(message.recipient_id);
+      }
+    }
+    return id;
+  }
+
+  /*
+   * Adds several messages under one acquisition of the lock, then notifies unread
+   * listeners once per recipient. Returns the message IDs, in order.
    */
-  public synchronized int createMessage(Message message) {
-    Integer next_id = messageMap.size() == 0 ? 1 : Collections.max(messageMap.keySet()) + 1;
+  public int[] createMessages(List<Message> messages) {
+    int[] ids = insertMessages(messages);
+    Set<Integer> recipients = new LinkedHashSet<>();
+    for (Message message : messages) {
+      if (!message.read) {
+        recipients.add(message.recipient_id);
+      }
+    }
+    for (int recipient_id : recipients) {
+      for (IntConsumer listener : unreadListeners) {
+        listener.accept(recipient_id);
+      }
+    }
+    return ids;
+  }
+
+  private synchronized int[] insertMessages(List<Message> messages) {
+    int[] ids = new int[messages.size()];
+    int next_id = nextMessageId();
+    for (int i = 0; i < ids.length; i++) {
+      ids[i] = storeMessage(messages.get(i), next_id++);
+    }
+    return ids;
+  }
+
+  private synchronized int insertMessage(Message message) {
+    return storeMessage(message, nextMessageId());
+  }
+
+  // Must be called with the lock held
+  private int nextMessageId() {
+    return lastMessageId + 1;
+  }
+
+  // Must be called with the lock held
+  private int storeMessage(Message message, int next_id) {
     message.id = next_id;
+    lastMessageId = Math.max(lastMessageId, next_id);
     messageMap.put(next_id, message);
+    inboxPerAccount.computeIfAbsent(message.recipient_id, k -> new ArrayList<>()).add(next_id);
     if (!message.read) {
       List<Integer> unreads = unreadMessagesPerAccount.get(message.recipient_id);
       if (unreads != null) {
@@ -87,6 +263,7 @@ public class Database {
       } else {
         unreadMessagesPerAccount.put(message.recipient_id, new ArrayList<>(Arrays.asList(next_id)));
       }
+      inboxVersions.put(message.recipient_id, getInboxVersion(message.recipient_id) + 1);
     }
     return next_id;
   }
@@ -125,6 +302,78 @@ public class Database {
     return list;
   }
 
+  /*
+   * Gets up to [number] messages of the session's account past its fetch cursor,
+   * and moves the cursor past them. The messages stay unread until acknowledged.
+   */
+  public synchronized List<Message> getMessagesPastCursor(Session session, int number) {
+    ArrayList<Message> list = new ArrayList<>(number);
+    ArrayList<Integer> inbox = inboxPerAccount.get(session.account_id);
+    if (inbox == null) {
+      return list;
+    }
+    int index = firstIndexFrom(inbox, session.fetched + 1);
+    for (; index < inbox.size() && list.size() < number; index++) {
+      list.add(messageMap.get(inbox.get(index)));
+    }
+    if (list.size() > 0) {
+      session.fetched = list.get(list.size() - 1).id;
+    }
+    return list;
+  }
+
+  /*
+   * Gets a page of up to [number] messages received by a user, read or not,
+   * without marking them read. Oldest first, with IDs above offset_id; or, with
+   * newest_first, newest first with IDs below offset_id (0 for the newest).
+   */
+  public synchronized List<Message> getInboxPage(int user_id, int offset_id, int number, boolean newest_first) {
+    ArrayList<Message> list = new ArrayList<>(number);
+    ArrayList<Integer> inbox = inboxPerAccount.get(user_id);
+    if (inbox == null) {
+      return list;
+    }
+    if (newest_first) {
+      int index = offset_id == 0 ? inbox.size() : firstIndexFrom(inbox, offset_id);
+      for (index--; index >= 0 && list.size() < number; index--) {
+        list.add(messageMap.get(inbox.get(index)));
+      }
+    } else {
+      for (int index = firstIndexFrom(inbox, offset_id + 1); index < inbox.size() && list.size() < number; index++) {
+        list.add(messageMap.get(inbox.get(index)));
+      }
+    }
+    return list;
+  }
+
+  // IDs are in order, so find the first one at or above id by binary search
+  private static int firstIndexFrom(List<Integer> ids, int id) {
+    int index = Collections.binarySearch(ids, id);
+    return index < 0 ? -index - 1 : index;
+  }
+
+  /*
+   * Acknowledges the session's messages up to up_to_id (capped at what it has
+   * fetched): its cursor moves past them and they are marked read for the
+   * account. Other sessions' cursors are unaffected. Returns the account's
+   * remaining unread count.
+   */
+  public synchronized int acknowledgeMessages(Session session, int up_to_id) {
+    session.acked = Math.max(session.acked, Math.min(up_to_id, session.fetched));
+    ArrayList<Integer> unreads = unreadMessagesPerAccount.get(session.account_id);
+    if (unreads == null) {
+      return 0;
+    }
+    // Unread IDs are in order, so the acknowledged ones are a prefix
+    int acknowledged = 0;
+    while (acknowledged < unreads.size() && unreads.get(acknowledged) <= session.acked) {
+      messageMap.get(unreads.get(acknowledged)).read = true;
+      acknowledged++;
+    }
+    unreads.subList(0, acknowledged).clear();
+    return unreads.size();
+  }
+
   /*
    * Verification that the user can delete this message must take place in
    * higher-level logic.
@@ -136,6 +385,10 @@ public class Database {
       if (!m.read) {
         unreadMessagesPerAccount.get(m.recipient_id).remove((Integer) id);
       }
+      ArrayList<Integer> inbox = inboxPerAccount.get(m.recipient_id);
+      if (inbox != null) {
+        inbox.remove((Integer) id);
+      }
       messageMap.remove(id);
     }
   }
@@ -145,6 +398,9 @@ public class Database {
    */
   public synchronized void deleteAccount(int id) {
     unreadMessagesPerAccount.remove(id);
+    inboxPerAccount.remove(id);
     accountMap.remove(id);
+    // Persisted session keys must not outlive the account
+    sessions.values().removeIf(session -> session.account_id == id);
   }
 }
@@ -2,20 +2,33 @@ package edu.harvard.Logic;
 
 import java.util.ArrayList;
 import java.util.Collection;
+import java.util.HashMap;
 import java.util.List;
+import java.util.Map;
 
 import at.favre.lib.crypto.bcrypt.BCrypt;
 import edu.harvard.Data.Data.Account;
 import edu.harvard.Data.Data.Message;
+import edu.harvard.Data.Data.Session;
 import edu.harvard.Chat;
 import edu.harvard.Chat.AccountLookupResponse;
+import edu.harvard.Chat.AckMessagesResponse;
 import edu.harvard.Chat.LoginCreateRequest;
 import edu.harvard.Chat.LoginCreateResponse;
 import edu.harvard.Chat.RequestMessagesResponse;
+import edu.harvard.Chat.ResumeSessionResponse;
 import edu.harvard.Chat.ListAccountsRequest;
 import edu.harvard.Chat.ListAccountsResponse;
+import edu.harvard.Chat.ListMessagesRequest;
+import edu.harvard.Chat.ListMessagesResponse;
+import edu.harvard.Chat.LookupUsernamesResponse;
 import edu.harvard.Chat.ChatMessage;
 import edu.harvard.Chat.SendMessageRequest;
+import edu.harvard.Chat.OutgoingMessage;
+import edu.harvard.Chat.SendMessagesResponse;
+import edu.harvard.Chat.SendMessagesResult;
+import edu.harvard.Chat.SessionError;
+import io.grpc.Status;
 
 /*
  * Higher-level logic for all operations.
@@ -29,15 +42,27 @@ public class OperationHandler {
   }
 
   private Database db;
+  // Null if attachments are not supported
+  private AttachmentStore attachments;
 
   public OperationHandler(Database db) {
+    this(db, null);
+  }
+
+  public OperationHandler(Database db, AttachmentStore attachments) {
     this.db = db;
+    this.attachments = attachments;
   }
 
   public Integer lookupSession(String key) {
     return db.getSession(key);
   }
 
+  // The session for a key, or null if there is none (see Database.getSessionRecord)
+  public Session lookupSessionRecord(String key) {
+    return db.getSessionRecord(key);
+  }
+
   public AccountLookupResponse lookupAccount(String username) {
     AccountLookupResponse.Builder response = AccountLookupResponse.newBuilder();
     Account account = db.lookupAccountByUsername(username);
@@ -62,7 +87,8 @@ public class OperationHandler {
     int id = db.createAccount(account);
     if (id != 0) {
       String key = db.createSession(account.id);
-      return LoginCreateResponse.newBuilder().setSuccess(true).setUnreadMessages(0).setSessionKey(key).build();
+      return LoginCreateResponse.newBuilder().setSuccess(true).setUnreadMessages(0).setSessionKey(key)
+          .setSessionExpiresAtMs(db.getSessionRecord(key).expires_at).build();
     } else {
       return LoginCreateResponse.newBuilder().setSuccess(false).build();
     }
@@ -86,6 +112,29 @@ public class OperationHandler {
     response.setSuccess(true);
     response.setUnreadMessages(unreadCount);
     response.setSessionKey(key);
+    response.setSessionExpiresAtMs(db.getSessionRecord(key).expires_at);
+    return response.build();
+  }
+
+  /*
+   * Resumes a session saved by a client, without any password check: extends its
+   * expiry and reports what a login would. Fails if the session has expired or
+   * its account was deleted.
+   */
+  public ResumeSessionResponse resumeSession(String key) {
+    ResumeSessionResponse.Builder response = ResumeSessionResponse.newBuilder();
+    Session session = db.refreshSession(key);
+    Account account = session == null ? null : db.lookupAccount(session.account_id);
+    if (account == null) {
+      response.setSuccess(false);
+      return response.build();
+    }
+    // The client restarted, so anything it fetched but did not acknowledge was lost
+    db.rewindSession(session);
+    response.setSuccess(true);
+    response.setUsername(account.username);
+    response.setUnreadMessages(db.getUnreadMessageCount(account.id));
+    response.setSessionExpiresAtMs(session.expires_at);
     return response.build();
   }
 
@@ -114,6 +163,14 @@ public class OperationHandler {
     return ListAccountsResponse.newBuilder().addAllAccounts(responseList).build();
   }
 
+  public LookupUsernamesResponse lookupUsernames(List<Integer> ids) {
+    LookupUsernamesResponse.Builder response = LookupUsernamesResponse.newBuilder();
+    for (Account a : db.lookupAccounts(ids)) {
+      response.addAccounts(Chat.Account.newBuilder().setId(a.id).setUsername(a.username).build());
+    }
+    return response.build();
+  }
+
   public int sendMessage(int sender_id, SendMessageRequest request) throws HandleException {
     // Look up sender
     Account sender = db.lookupAccount(sender_id);
@@ -128,9 +185,16 @@ public class OperationHandler {
     if (account.id == sender_id) {
       throw new HandleException("You cannot message yourself!");
     }
+    // Attachments must have been uploaded first
+    for (String attachment_id : request.getAttachmentIdsList()) {
+      if (attachments == null || !attachments.exists(attachment_id)) {
+        throw new HandleException("Attachment does not exist!");
+      }
+    }
     // Build Message
     Message m = new Message();
     m.message = request.getMessage();
+    m.attachment_ids = List.copyOf(request.getAttachmentIdsList());
     m.recipient_id = account.id;
     m.sender_id = sender_id;
     m.read = false;
@@ -138,17 +202,155 @@ public class OperationHandler {
     return id;
   }
 
+  /*
+   * Sends a batch of messages: recipients are looked up together and all valid
+   * messages are stored in one pass. Invalid items get an error result instead of
+   * failing the batch. Results are in request order.
+   */
+  public SendMessagesResponse sendMessages(int sender_id, List<OutgoingMessage> outgoing) throws HandleException {
+    // Look up sender
+    Account sender = db.lookupAccount(sender_id);
+    if (sender == null) {
+      throw new HandleException("Sender does not exist!");
+    }
+    // Look up recipients
+    List<String> usernames = new ArrayList<>(outgoing.size());
+    for (OutgoingMessage item : outgoing) {
+      usernames.add(item.getRecipient());
+    }
+    Map<String, Account> recipients = db.lookupAccountsByUsername(usernames);
+    // Build Messages, remembering which items failed
+    SendMessagesResult[] results = new SendMessagesResult[outgoing.size()];
+    List<Message> messages = new ArrayList<>(outgoing.size());
+    for (int i = 0; i < results.length; i++) {
+      OutgoingMessage item = outgoing.get(i);
+      Account account = recipients.get(item.getRecipient());
+      if (account == null) {
+        results[i] = sendError("Recipient does not exist!");
+      } else if (account.id == sender_id) {
+        results[i] = sendError("You cannot message yourself!");
+      } else {
+        Message m = new Message();
+        m.message = item.getMessage();
+        m.recipient_id = account.id;
+        m.sender_id = sender_id;
+        m.read = false;
+        messages.add(m);
+      }
+    }
+    int[] ids = db.createMessages(messages);
+    // Fill in the IDs of the stored messages, in order
+    SendMessagesResponse.Builder response = SendMessagesResponse.newBuilder();
+    int next = 0;
+    for (SendMessagesResult result : results) {
+      if (result == null) {
+        result = SendMessagesResult.newBuilder().setId(ids[next++]).build();
+      }
+      response.addResults(result);
+    }
+    return response.build();
+  }
+
+  private SendMessagesResult sendError(String description) {
+    SessionError error = SessionError.newBuilder().setCode(Status.Code.INVALID_ARGUMENT.value())
+        .setDescription(description).build();
+    return SendMessagesResult.newBuilder().setError(error).build();
+  }
+
+  // Returns the recipient of a message, or null if it does not exist
+  public Integer getMessageRecipient(int message_id) {
+    Message m = db.getMessage(message_id);
+    if (m == null) {
+      return null;
+    }
+    return m.recipient_id;
+  }
+
+  /*
+   * True if the user has gained no unread messages since the given inbox version
+   * was returned. Does not take the database lock.
+   */
+  public boolean inboxUnchanged(int user_id, long inbox_version) {
+    return inbox_version != 0 && db.getInboxVersion(user_id) == inbox_version;
+  }
+
   public RequestMessagesResponse requestMessages(int user_id, int maximum_number) {
-    List<Message> unreadMessages = db.getUnreadMessages(user_id, maximum_number);
-    ArrayList<ChatMessage> responseMessages = new ArrayList<>(unreadMessages.size());
-    for (Message message : unreadMessages) {
+    return requestMessages(user_id, maximum_number, false);
+  }
+
+  /*
+   * With compact_sender, messages carry sender_id instead of the sender's username,
+   * which the client resolves itself (see lookupUsernames).
+   */
+  public RequestMessagesResponse requestMessages(int user_id, int maximum_number, boolean compact_sender) {
+    return requestMessages(user_id, null, maximum_number, compact_sender);
+  }
+
+  /*
+   * With a session (manual acknowledgement), returns the messages past the
+   * session's cursor, which stay unread until acknowledged. Without one, returns
+   * the unread messages and marks them read.
+   */
+  public RequestMessagesResponse requestMessages(int user_id, Session session, int maximum_number,
+      boolean compact_sender) {
+    // Read the version first: a message arriving during the fetch moves it on
+    long inbox_version = db.getInboxVersion(user_id);
+    List<Message> messages = session != null ? db.getMessagesPastCursor(session, maximum_number)
+        : db.getUnreadMessages(user_id, maximum_number);
+    RequestMessagesResponse.Builder response = RequestMessagesResponse.newBuilder()
+        .addAllMessages(chatMessages(messages, compact_sender));
+    // A short page means the unread list (or the session's backlog) was emptied,
+    // so the version can be reused
+    if (messages.size() < maximum_number) {
+      response.setInboxVersion(inbox_version);
+    }
+    return response.build();
+  }
+
+  /*
+   * Pages through the messages a user has received, read or not, without marking
+   * them read (see Database.getInboxPage).
+   */
+  public ListMessagesResponse listMessages(int user_id, ListMessagesRequest request) {
+    List<Message> messages = db.getInboxPage(user_id, request.getOffsetMessageId(), request.getMaximumNumber(),
+        request.getNewestFirst());
+    return ListMessagesResponse.newBuilder().addAllMessages(chatMessages(messages, request.getCompactSender())).build();
+  }
+
+  private List<ChatMessage> chatMessages(List<Message> messages, boolean compact_sender) {
+    ArrayList<ChatMessage> responseMessages = new ArrayList<>(messages.size());
+    // Look up each sender once per batch
+    Map<Integer, String> senders = new HashMap<>();
+    for (Message message : messages) {
       ChatMessage.Builder messageResponse = ChatMessage.newBuilder();
       messageResponse.setId(message.id);
       messageResponse.setMessage(message.message);
-      messageResponse.setSender(db.lookupAccount(message.sender_id).username);
+      messageResponse.addAllAttachmentIds(message.attachment_ids);
+      String sender = compact_sender ? null : senders.computeIfAbsent(message.sender_id, id -> {
+        Account account = db.lookupAccount(id);
+        return account == null ? null : account.username;
+      });
+      if (sender != null) {
+        messageResponse.setSender(sender);
+      } else {
+        // Compact, or the sender's account was deleted (history keeps its messages)
+        messageResponse.setSenderId(message.sender_id);
+      }
       responseMessages.add(messageResponse.build());
     }
-    return RequestMessagesResponse.newBuilder().addAllMessages(responseMessages).build();
+    return responseMessages;
+  }
+
+  /*
+   * Acknowledges a session's messages up to up_to_id, marking them read. With
+   * rewind, the messages it fetched past them are fetched again.
+   */
+  public AckMessagesResponse ackMessages(Session session, int up_to_id, boolean rewind) {
+    int unread = db.acknowledgeMessages(session, up_to_id);
+    if (rewind) {
+      db.rewindSession(session);
+    }
+    return AckMessagesResponse.newBuilder().setUnreadMessages(unread).build();
   }
 
   // returns success boolean
@@ -0,0 +1,185 @@
+package edu.harvard;
+
+import java.nio.ByteBuffer;
+import java.util.Set;
+import java.util.UUID;
+
+import com.google.protobuf.Descriptors.FieldDescriptor;
+import com.google.protobuf.Message;
+
+import io.grpc.Context;
+import io.grpc.Contexts;
+import io.grpc.ForwardingServerCallListener;
+import io.grpc.Metadata;
+import io.grpc.ServerCall;
+import io.grpc.ServerCallHandler;
+import io.grpc.ServerInterceptor;
+import io.grpc.Status;
+
+import edu.harvard.Logic.Database;
+
+/*
+ * Authenticates every call that needs a session, so handlers can read the
+ * caller from USER_ID and SESSION instead of checking it themselves.
+ * The session is the one sent as call metadata ("session-bin": the 16 bytes of
+ * the session key's UUID), resolved once per call, or else the session_key of
+ * the call's first request (for streams, its first frame). Calls without a
+ * valid session are failed with UNAUTHENTICATED before reaching the handler.
+ * The methods in PUBLIC_METHODS, which create or restore sessions, are passed
+ * through untouched.
+ */
+class SessionInterceptor implements ServerInterceptor {
+	// Account ID of the call's session
+	static final Context.Key<Integer> USER_ID = Context.key("user-id");
+	// The call's session key
+	static final Context.Key<String> SESSION = Context.key("session");
+
+	static final Metadata.Key<byte[]> SESSION_KEY = Metadata.Key.of("session-bin",
+			Metadata.BINARY_BYTE_MARSHALLER);
+
+	// Methods that do not need a session
+	static final Set<String> PUBLIC_METHODS = Set.of(
+			ChatServiceGrpc.getAccountLookupMethod().getFullMethodName(),
+			ChatServiceGrpc.getLoginMethod().getFullMethodName(),
+			ChatServiceGrpc.getCreateAccountMethod().getFullMethodName(),
+			ChatServiceGrpc.getResumeSessionMethod().getFullMethodName());
+
+	private final Database db;
+
+	SessionInterceptor(Database db) {
+		this.db = db;
+	}
+
+	@Override
+	public <ReqT, RespT> ServerCall.Listener<ReqT> interceptCall(ServerCall<ReqT, RespT> call, Metadata headers,
+			ServerCallHandler<ReqT, RespT> next) {
+		if (PUBLIC_METHODS.contains(call.getMethodDescriptor().getFullMethodName())) {
+			return next.startCall(call, headers);
+		}
+		byte[] token = headers.get(SESSION_KEY);
+		if (token == null) {
+			// Authenticated by the first request once it arrives
+			return new RequestSessionListener<>(call, next.startCall(call, headers));
+		}
+		String key = sessionKey(token);
+		Context context = sessionContext(key);
+		if (context == null) {
+			reject(call);
+			return new ServerCall.Listener<ReqT>() {
+			};
+		}
+		return Contexts.interceptCall(context, call, headers, next);
+	}
+
+	/*
+	 * Context carrying a session's account ID and key, or null if the session is
+	 * invalid or has expired.
+	 */
+	private Context sessionContext(String key) {
+		Integer user_id = db.getSession(key);
+		if (user_id == null) {
+			return null;
+		}
+		return Context.current().withValues(USER_ID, user_id, SESSION, key);
+	}
+
+	private static void reject(ServerCall<?, ?> call) {
+		call.close(Status.UNAUTHENTICATED.withDescription("Invalid session key"), new Metadata());
+	}
+
+	/*
+	 * Holds back a call's events until its first request has authenticated it,
+	 * then delivers them (and every later one) in the session's context. A call
+	 * that ends without a request, or whose first request has no valid session
+	 * key, is rejected without its handler seeing any request.
+	 * gRPC delivers a call's events one at a time, so no locking is needed.
+	 */
+	private class RequestSessionListener<ReqT, RespT>
+			extends ForwardingServerCallListener.SimpleForwardingServerCallListener<ReqT> {
+		private final ServerCall<ReqT, RespT> call;
+		private Context context = null; // Set by the first request, if valid
+		private boolean rejected = false;
+
+		RequestSessionListener(ServerCall<ReqT, RespT> call, ServerCall.Listener<ReqT> delegate) {
+			super(delegate);
+			this.call = call;
+		}
+
+		@Override
+		public void onMessage(ReqT message) {
+			if (rejected) {
+				return;
+			}
+			if (context == null) {
+				context = sessionContext(requestSessionKey(message));
+				if (context == null) {
+					rejected = true;
+					reject(call);
+					return;
+				}
+			}
+			context.run(() -> super.onMessage(message));
+		}
+
+		@Override
+		public void onHalfClose() {
+			if (rejected) {
+				return;
+			}
+			if (context == null) {
+				rejected = true;
+				reject(call);
+				return;
+			}
+			context.run(super::onHalfClose);
+		}
+
+		@Override
+		public void onCancel() {
+			run(super::onCancel);
+		}
+
+		@Override
+		public void onComplete() {
+			run(super::onComplete);
+		}
+
+		@Override
+		public void onReady() {
+			run(super::onReady);
+		}
+
+		private void run(Runnable event) {
+			if (context != null) {
+				context.run(event);
+			} else {
+				event.run();
+			}
+		}
+	}
+
+	/*
+	 * The session_key field of a request, or "" (which matches no session) if it
+	 * has none.
+	 */
+	static String requestSessionKey(Object request) {
+		if (!(request instanceof Message)) {
+			return "";
+		}
+		Message message = (Message) request;
+		FieldDescriptor field = message.getDescriptorForType().findFieldByName("session_key");
+		return field == null ? "" : (String) message.getField(field);
+	}
+
+	/*
+	 * Session key string for a token, or "" (which matches no session) if the
+	 * token is malformed.
+	 */
+	static String sessionKey(byte[] token) {
+		if (token.length != 16) {
+			return "";
+		}
+		ByteBuffer buffer = ByteBuffer.wrap(token);
+		return new UUID(buffer.getLong(), buffer.getLong()).toString();
+	}
+}
@@ -12,10 +12,16 @@ import edu.harvard.Chat.LoginCreateResponse;
 import edu.harvard.ChatServiceGrpc.ChatServiceBlockingStub;
 import io.grpc.ManagedChannel;
 import io.grpc.ManagedChannelBuilder;
+import io.grpc.Metadata;
+import io.grpc.Status;
+import io.grpc.StatusRuntimeException;
+import io.grpc.stub.MetadataUtils;
 
 import static org.junit.jupiter.api.Assertions.*;
 
 import java.io.IOException;
+import java.nio.ByteBuffer;
+import java.util.UUID;
 
 class AppTest {
     static final int PORT = 58585;
@@ -31,6 +37,33 @@ class AppTest {
      * and two RPCs.
      * The client integration tests serve as a more comprehensive end-to-end test!
      */
+    @Test
+    void sessionTokenRoundTrips() {
+        UUID key = UUID.randomUUID();
+        byte[] token = ByteBuffer.allocate(16)
+                .putLong(key.getMostSignificantBits()).putLong(key.getLeastSignificantBits()).array();
+        assertEquals(key.toString(), SessionInterceptor.sessionKey(token));
+        assertEquals("", SessionInterceptor.sessionKey(new byte[3]));
+    }
+
+    @Test
+    void requestSessionKeyIsRead() {
+        assertEquals("key", SessionInterceptor.requestSessionKey(
+                ListAccountsRequest.newBuilder().setSessionKey("key").build()));
+        assertEquals("", SessionInterceptor.requestSessionKey(ListAccountsRequest.getDefaultInstance()));
+        assertEquals("", SessionInterceptor.requestSessionKey(LoginCreateRequest.getDefaultInstance()));
+    }
+
+    @Test
+    void compressionEncodingFollowsClient() {
+        // the request's own encoding wins, then the server's preference
+        assertEquals("deflate", CompressionInterceptor.chooseEncoding("deflate", "identity,deflate,gzip"));
+        assertEquals("gzip", CompressionInterceptor.chooseEncoding(null, "identity,deflate,gzip"));
+        assertEquals("deflate", CompressionInterceptor.chooseEncoding(null, "identity, deflate"));
+        assertNull(CompressionInterceptor.chooseEncoding(null, "identity"));
+        assertNull(CompressionInterceptor.chooseEncoding(null, null));
+    }
+
     @Test
     void grpcServerWorks() {
         Thread t = new Thread(new Runnable() {
@@ -64,6 +97,31 @@ class AppTest {
         assertEquals("june", list.getAccounts(0).getUsername());
         assertEquals(1, list.getAccounts(0).getId());
 
+        // list accounts again, with the session sent as call metadata instead
+        UUID key = UUID.fromString(createResponse.getSessionKey());
+        Metadata headers = new Metadata();
+        headers.put(SessionInterceptor.SESSION_KEY, ByteBuffer.allocate(16)
+                .putLong(key.getMostSignificantBits()).putLong(key.getLeastSignificantBits()).array());
+        ChatServiceBlockingStub sessionStub = stub.withInterceptors(MetadataUtils.newAttachHeadersInterceptor(headers));
+        list = sessionStub.listAccounts(ListAccountsRequest.newBuilder().setMaximumNumber(1).build());
+        assertEquals("june", list.getAccounts(0).getUsername());
+
+        // compressed requests are accepted
+        list = sessionStub.withCompression("gzip").listAccounts(ListAccountsRequest.newBuilder()
+                .setMaximumNumber(1).setFilterText("j".repeat(2000)).build());
+        assertEquals(0, list.getAccountsCount());
+
+        // calls without a valid session are rejected before reaching their handler
+        StatusRuntimeException e = assertThrows(StatusRuntimeException.class,
+                () -> stub.listAccounts(ListAccountsRequest.newBuilder().setMaximumNumber(1).build()));
+        assertEquals(Status.Code.UNAUTHENTICATED, e.getStatus().getCode());
+        Metadata invalid = new Metadata();
+        invalid.put(SessionInterceptor.SESSION_KEY, new byte[16]);
+        e = assertThrows(StatusRuntimeException.class, () -> stub
+                .withInterceptors(MetadataUtils.newAttachHeadersInterceptor(invalid))
+                .listAccounts(ListAccountsRequest.newBuilder().setMaximumNumber(1).build()));
+        assertEquals(Status.Code.UNAUTHENTICATED, e.getStatus().getCode());
+
         t.interrupt();
     }
 }
@@ -0,0 +1,66 @@
+package edu.harvard.Logic;
+
+import org.junit.jupiter.api.Test;
+import static org.junit.jupiter.api.Assertions.*;
+
+import java.io.IOException;
+import java.io.InputStream;
+import java.nio.charset.StandardCharsets;
+import java.nio.file.Files;
+
+public class AttachmentStoreTest {
+  String store(AttachmentStore store, String... chunks) throws IOException {
+    AttachmentStore.Upload upload = store.startUpload();
+    for (String chunk : chunks) {
+      upload.write(chunk.getBytes(StandardCharsets.UTF_8));
+    }
+    return upload.finish();
+  }
+
+  @Test
+  void uploadsAreContentAddressed() throws IOException {
+    AttachmentStore store = AttachmentStore.temporary();
+    String id = store(store, "hello ", "world");
+    // SHA-256 of "hello world"
+    assertEquals("b94d27b9934d3e08a52e52d7da7dabfac484efe37a5380ee9088f7ace2efcde9", id);
+    assertTrue(store.exists(id));
+    // same content in different chunks is stored once
+    assertEquals(id, store(store, "hello", " ", "world"));
+    assertNotEquals(id, store(store, "hello"));
+
+    try (InputStream in = store.open(id)) {
+      assertEquals("hello world", new String(in.readAllBytes(), StandardCharsets.UTF_8));
+    }
+  }
+
+  @Test
+  void unknownIdsAreRejected() throws IOException {
+    AttachmentStore store = AttachmentStore.temporary();
+    assertNull(store.open("0".repeat(64)));
+    assertFalse(store.exists("0".repeat(64)));
+    // not an ID, so never resolved against the directory
+    assertNull(store.open("../secret"));
+    assertFalse(store.exists(""));
+  }
+
+  @Test
+  void abortedUploadsAreNotStored() throws IOException {
+    AttachmentStore store = AttachmentStore.temporary();
+    AttachmentStore.Upload upload = store.startUpload();
+    upload.write("partial".getBytes(StandardCharsets.UTF_8));
+    assertEquals(7, upload.size());
+    upload.abort();
+    // the same content uploaded in full gets the ID it would have had
+    String id = store(store, "partial");
+    assertTrue(store.exists(id));
+  }
+
+  @Test
+  void oversizedUploadsFail() throws IOException {
+    AttachmentStore store = new AttachmentStore(Files.createTempDirectory("attachments"), 10);
+    AttachmentStore.Upload upload = store.startUpload();
+    upload.write(new byte[10]);
+    assertThrows(AttachmentStore.TooLargeException.class, () -> upload.write(new byte[1]));
+    upload.abort();
+  }
+}
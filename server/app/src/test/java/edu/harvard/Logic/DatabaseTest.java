@@ -3,6 +3,9 @@ package edu.harvard.Logic;
 import org.junit.jupiter.api.Test;
 import static org.junit.jupiter.api.Assertions.*;
 
+import java.util.ArrayList;
+import java.util.List;
+
 import edu.harvard.Data.Data;
 
 public class DatabaseTest {
@@ -95,4 +98,136 @@ public class DatabaseTest {
     assertNotNull(db.getMessage(id));
   }
 
+  @Test
+  void unreadListenersAreNotified() {
+    Database db = new Database();
+    List<Integer> notified = new ArrayList<>();
+    db.addUnreadListener(notified::add);
+    db.createMessage(buildMessage(1, 2, false, "message!"));
+    // Already-read messages do not notify
+    db.createMessage(buildMessage(1, 3, true, "message!"));
+    assertEquals(List.of(2), notified);
+  }
+
+  @Test
+  void batchedMessagesAreStoredInOrder() {
+    Database db = new Database();
+    List<Integer> notified = new ArrayList<>();
+    db.addUnreadListener(notified::add);
+    int[] ids = db.createMessages(List.of(buildMessage(1, 2, false, "one"),
+        buildMessage(1, 3, false, "two"), buildMessage(1, 2, false, "three")));
+    assertArrayEquals(new int[] { 1, 2, 3 }, ids);
+    assertEquals("three", db.getMessage(3).message);
+    assertEquals(2, db.getUnreadMessageCount(2));
+    // Each recipient is notified once per batch
+    assertEquals(List.of(2, 3), notified);
+    assertEquals(4, db.createMessage(buildMessage(1, 2, false, "four")));
+  }
+
+  @Test
+  void inboxVersionsIncrease() {
+    Database db = new Database();
+    assertEquals(1, db.getInboxVersion(2));
+    db.createMessage(buildMessage(1, 2, false, "message!"));
+    assertEquals(2, db.getInboxVersion(2));
+    // Reading does not change the version, and other inboxes are unaffected
+    db.getUnreadMessages(2, 10);
+    assertEquals(2, db.getInboxVersion(2));
+    assertEquals(1, db.getInboxVersion(1));
+    // Neither do already-read messages
+    db.createMessage(buildMessage(1, 2, true, "message!"));
+    assertEquals(2, db.getInboxVersion(2));
+  }
+
+  @Test
+  void sessionsExpireAndRefresh() {
+    Database db = new Database();
+    String key = db.createSession(1);
+    assertEquals(1, db.getSession(key));
+    long expiry = db.getSessionRecord(key).expires_at;
+    assertTrue(expiry > System.currentTimeMillis());
+    assertTrue(db.refreshSession(key).expires_at >= expiry);
+    assertNull(db.refreshSession("unknown"));
+    // Sessions of deleted accounts are dropped
+    Data.Account a1 = new Data.Account();
+    a1.username = "june";
+    a1.password_hash = "test1";
+    db.createAccount(a1);
+    db.deleteAccount(1);
+    assertNull(db.getSession(key));
+    // Expired sessions are neither found nor refreshed
+    Database expiring = new Database(0);
+    String expired = expiring.createSession(1);
+    assertNull(expiring.getSession(expired));
+    assertNull(expiring.refreshSession(expired));
+  }
+
+  @Test
+  void sessionCursorsAreIndependent() {
+    Database db = new Database();
+    db.createMessage(buildMessage(1, 2, false, "one"));
+    db.createMessage(buildMessage(1, 2, false, "two"));
+    Data.Session first = db.getSessionRecord(db.createSession(2));
+    Data.Session second = db.getSessionRecord(db.createSession(2));
+    // Fetching moves the session's cursor but leaves the messages unread
+    assertEquals(2, db.getMessagesPastCursor(first, 10).size());
+    assertEquals(0, db.getMessagesPastCursor(first, 10).size());
+    assertEquals(2, db.getUnreadMessageCount(2));
+    assertEquals(1, db.getMessagesPastCursor(second, 1).size());
+    // Acknowledging marks messages read, without moving other sessions' cursors
+    assertEquals(1, db.acknowledgeMessages(first, 1));
+    assertEquals("two", db.getMessagesPastCursor(second, 10).getFirst().message);
+    // Unacknowledged messages are fetched again after a rewind
+    db.rewindSession(first);
+    assertEquals(2, db.getMessagesPastCursor(first, 10).getFirst().id);
+    // Acknowledgements are capped at what the session has fetched
+    Data.Session third = db.getSessionRecord(db.createSession(2));
+    assertEquals(1, db.acknowledgeMessages(third, 100));
+    // New sessions start at the oldest unread message
+    assertEquals(2, db.getMessagesPastCursor(third, 10).getFirst().id);
+    assertEquals(0, db.acknowledgeMessages(third, 2));
+  }
+
+  @Test
+  void deletedMessageIdsAreNotReused() {
+    Database db = new Database();
+    db.createMessage(buildMessage(1, 2, false, "one"));
+    db.createMessage(buildMessage(1, 2, false, "two"));
+    Data.Session session = db.getSessionRecord(db.createSession(2));
+    assertEquals(2, db.getMessagesPastCursor(session, 10).size());
+    assertEquals(0, db.acknowledgeMessages(session, 2));
+    // Deleting the newest message must not free its ID, which is at the cursor
+    db.deleteMessage(2);
+    assertEquals(3, db.createMessage(buildMessage(1, 2, false, "three")));
+    List<Data.Message> fetched = db.getMessagesPastCursor(session, 10);
+    assertEquals(1, fetched.size());
+    assertEquals("three", fetched.getFirst().message);
+    assertEquals(1, db.getUnreadMessageCount(2));
+    assertEquals(0, db.acknowledgeMessages(session, 3));
+  }
+
+  @Test
+  void inboxPagesIncludeReadMessages() {
+    Database db = new Database();
+    for (int i = 1; i <= 5; i++) {
+      db.createMessage(buildMessage(1, 2, false, "message " + i));
+    }
+    db.createMessage(buildMessage(2, 1, false, "reply"));
+    db.getUnreadMessages(2, 2);
+    // Oldest first, past the offset
+    List<Data.Message> page = db.getInboxPage(2, 0, 2, false);
+    assertEquals(List.of(1, 2), List.of(page.get(0).id, page.get(1).id));
+    assertEquals(3, db.getInboxPage(2, 2, 2, false).getFirst().id);
+    // Newest first, below the offset
+    page = db.getInboxPage(2, 0, 2, true);
+    assertEquals(List.of(5, 4), List.of(page.get(0).id, page.get(1).id));
+    page = db.getInboxPage(2, 4, 10, true);
+    assertEquals(3, page.size());
+    assertEquals(1, page.get(2).id);
+    assertEquals(0, db.getInboxPage(2, 1, 10, true).size());
+    // Listing does not mark messages read
+    assertEquals(3, db.getUnreadMessageCount(2));
+    db.deleteMessage(5);
+    assertEquals(4, db.getInboxPage(2, 0, 1, true).getFirst().id);
+  }
 }
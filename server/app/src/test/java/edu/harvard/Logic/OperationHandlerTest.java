@@ -5,14 +5,20 @@ import org.junit.jupiter.api.Test;
 import edu.harvard.Chat.Account;
 import edu.harvard.Chat.AccountLookupResponse;
 import edu.harvard.Chat.ListAccountsRequest;
+import edu.harvard.Chat.ListMessagesRequest;
 import edu.harvard.Chat.LoginCreateRequest;
 import edu.harvard.Chat.LoginCreateResponse;
 import edu.harvard.Chat.ChatMessage;
+import edu.harvard.Chat.RequestMessagesResponse;
+import edu.harvard.Chat.ResumeSessionResponse;
 import edu.harvard.Chat.SendMessageRequest;
+import edu.harvard.Chat.OutgoingMessage;
+import edu.harvard.Chat.SendMessagesResponse;
 import edu.harvard.Logic.OperationHandler.HandleException;
 
 import static org.junit.jupiter.api.Assertions.*;
 
+import java.io.IOException;
 import java.util.Arrays;
 import java.util.List;
 
@@ -38,6 +44,13 @@ public class OperationHandlerTest {
       assertEquals(0, login.getUnreadMessages());
       assertTrue(login.getSessionKey().length() > 0);
       assertEquals(1, handler.lookupSession(login.getSessionKey()));
+      assertTrue(login.getSessionExpiresAtMs() > System.currentTimeMillis());
+      // Resume the session without a password
+      ResumeSessionResponse resumed = handler.resumeSession(login.getSessionKey());
+      assertTrue(resumed.getSuccess());
+      assertEquals("june", resumed.getUsername());
+      assertTrue(resumed.getSessionExpiresAtMs() >= login.getSessionExpiresAtMs());
+      assertFalse(handler.resumeSession("unknown").getSuccess());
       // List accounts
       ListAccountsRequest listRequest1 = ListAccountsRequest.newBuilder().setMaximumNumber(1).setOffsetAccountId(0)
           .setFilterText("").build();
@@ -55,6 +68,8 @@ public class OperationHandlerTest {
       // Send a message
       SendMessageRequest msg = SendMessageRequest.newBuilder().setRecipient("catherine").setMessage("Hi!").build();
       assertEquals(1, handler.sendMessage(1, msg));
+      assertEquals(2, handler.getMessageRecipient(1));
+      assertNull(handler.getMessageRecipient(100));
       SendMessageRequest msg2 = SendMessageRequest.newBuilder().setRecipient("june").setMessage("Hi!").build();
       assertThrows(HandleException.class, () -> handler.sendMessage(1, msg2));
       SendMessageRequest msg3 = SendMessageRequest.newBuilder().setRecipient("unknown").setMessage("Hi!").build();
@@ -62,7 +77,12 @@ public class OperationHandlerTest {
       // Receive a message
       LoginCreateResponse login2 = handler.login(u2);
       assertEquals(1, login2.getUnreadMessages());
-      ChatMessage m = handler.requestMessages(2, 5).getMessagesList().get(0);
+      assertFalse(handler.inboxUnchanged(2, 0));
+      RequestMessagesResponse received = handler.requestMessages(2, 5);
+      // The unread list was emptied, so the inbox version is returned
+      assertTrue(received.getInboxVersion() > 0);
+      assertTrue(handler.inboxUnchanged(2, received.getInboxVersion()));
+      ChatMessage m = received.getMessagesList().get(0);
       assertEquals(1, m.getId());
       assertEquals("june", m.getSender());
       assertEquals(msg.getMessage(), m.getMessage());
@@ -70,13 +90,90 @@ public class OperationHandlerTest {
       assertEquals(true, handler.deleteMessages(2, Arrays.asList(1)));
       // Send another message
       assertEquals(1, handler.sendMessage(1, msg));
+      assertFalse(handler.inboxUnchanged(2, received.getInboxVersion()));
       // Delete it
       assertEquals(false, handler.deleteMessages(3, Arrays.asList(1)));
       assertEquals(true, handler.deleteMessages(1, Arrays.asList(1)));
       // Verify that this worked
       assertEquals(0, handler.requestMessages(2, 5).getMessagesList().size());
+      // Send a batch: invalid items fail without failing the rest
+      SendMessagesResponse batch = handler.sendMessages(1, Arrays.asList(
+          OutgoingMessage.newBuilder().setRecipient("catherine").setMessage("One").build(),
+          OutgoingMessage.newBuilder().setRecipient("unknown").setMessage("Two").build(),
+          OutgoingMessage.newBuilder().setRecipient("june").setMessage("Three").build(),
+          OutgoingMessage.newBuilder().setRecipient("catherine").setMessage("Four").build()));
+      assertEquals(4, batch.getResultsCount());
+      assertTrue(batch.getResults(0).hasId());
+      assertEquals("Recipient does not exist!", batch.getResults(1).getError().getDescription());
+      assertEquals("You cannot message yourself!", batch.getResults(2).getError().getDescription());
+      assertEquals(batch.getResults(0).getId() + 1, batch.getResults(3).getId());
+      List<ChatMessage> batchReceived = handler.requestMessages(2, 5).getMessagesList();
+      assertEquals("One", batchReceived.get(0).getMessage());
+      assertEquals("Four", batchReceived.get(1).getMessage());
+      // Compact senders: only the sender ID is sent, and resolved separately
+      handler.sendMessage(1, msg);
+      ChatMessage compact = handler.requestMessages(2, 5, true).getMessages(0);
+      assertEquals("", compact.getSender());
+      assertEquals(1, compact.getSenderId());
+      List<Account> names = handler.lookupUsernames(Arrays.asList(1, 2, 100)).getAccountsList();
+      assertEquals(2, names.size());
+      assertEquals("june", names.get(0).getUsername());
+      assertEquals("catherine", names.get(1).getUsername());
+      // Manual acknowledgement: fetched messages stay unread until acknowledged,
+      // and are fetched again after the session resumes
+      String device = handler.login(u2).getSessionKey();
+      handler.sendMessage(1, msg);
+      RequestMessagesResponse fetched = handler.requestMessages(2, handler.lookupSessionRecord(device), 5, false);
+      assertEquals(1, fetched.getMessagesCount());
+      assertEquals(1, handler.resumeSession(device).getUnreadMessages());
+      int fetchedId = fetched.getMessages(0).getId();
+      assertEquals(fetchedId,
+          handler.requestMessages(2, handler.lookupSessionRecord(device), 5, false).getMessages(0).getId());
+      assertEquals(0, handler.ackMessages(handler.lookupSessionRecord(device), fetchedId, false).getUnreadMessages());
+      assertEquals(0, handler.requestMessages(2, handler.lookupSessionRecord(device), 5, false).getMessagesCount());
+      // History includes read messages, newest first
+      ListMessagesRequest history = ListMessagesRequest.newBuilder().setMaximumNumber(2).setNewestFirst(true).build();
+      List<ChatMessage> newest = handler.listMessages(2, history).getMessagesList();
+      assertEquals(2, newest.size());
+      assertEquals(fetchedId, newest.get(0).getId());
+      assertEquals("june", newest.get(0).getSender());
+      ListMessagesRequest older = history.toBuilder().setOffsetMessageId(newest.get(1).getId()).build();
+      assertTrue(handler.listMessages(2, older).getMessages(0).getId() < newest.get(1).getId());
       // Delete an account
       handler.deleteAccount(1);
+      // Messages from deleted accounts still list, with their sender ID
+      assertEquals(1, handler.listMessages(2, history).getMessages(0).getSenderId());
+    } catch (HandleException e) {
+      throw new RuntimeException(e.getMessage());
+    }
+  }
+
+  @Test
+  void attachmentTest() throws IOException {
+    try {
+      Database db = new Database();
+      AttachmentStore attachments = AttachmentStore.temporary();
+      OperationHandler handler = new OperationHandler(db, attachments);
+      LoginCreateRequest u1 = LoginCreateRequest.newBuilder().setUsername("june")
+          .setPasswordHash("passwordpasswordpasswordpasswordpasswordpasswordpassword").build();
+      LoginCreateRequest u2 = LoginCreateRequest.newBuilder().setUsername("catherine")
+          .setPasswordHash("password2passwordpasswordpasswordpasswordpasswordpassword").build();
+      handler.createAccount(u1);
+      handler.createAccount(u2);
+      // Attachments must be uploaded before they are sent
+      SendMessageRequest unknown = SendMessageRequest.newBuilder().setRecipient("catherine").setMessage("File")
+          .addAttachmentIds("0".repeat(64)).build();
+      assertThrows(HandleException.class, () -> handler.sendMessage(1, unknown));
+      AttachmentStore.Upload upload = attachments.startUpload();
+      upload.write(new byte[] { 1, 2, 3 });
+      String id = upload.finish();
+      SendMessageRequest msg = unknown.toBuilder().clearAttachmentIds().addAttachmentIds(id).build();
+      handler.sendMessage(1, msg);
+      ChatMessage received = handler.requestMessages(2, 5).getMessages(0);
+      assertEquals(List.of(id), received.getAttachmentIdsList());
+      // Without a store, no attachment exists
+      OperationHandler plain = new OperationHandler(db);
+      assertThrows(HandleException.class, () -> plain.sendMessage(1, msg));
     } catch (HandleException e) {
       throw new RuntimeException(e.getMessage());
     }